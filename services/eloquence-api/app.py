@@ -3,11 +3,20 @@ from fastapi.middleware.cors import CORSMiddleware
 import redis
 import json
 import uuid
+import time
 from datetime import datetime
-from typing import Dict, List, Optional, Any
+from typing import Dict, List, Optional, Any, Tuple
 import logging
 import asyncio
 import httpx
+import os
+
+# Signature locale des tokens LiveKit (module partagé avec le service de tokens):
+# supprime l'aller-retour HTTP vers livekit-token-service à chaque création de session
+try:
+    from livekit_tokens import mint_token
+except ImportError:  # module non copié dans l'image: repli sur le service HTTP
+    mint_token = None
 
 # Configuration
 app = FastAPI(
@@ -35,6 +44,183 @@ SERVICES = {
     "livekit_token": "http://livekit-token-service:8004"
 }
 
+# Clés LiveKit (mêmes valeurs que le service de tokens). Aucune valeur par défaut: sans
+# clés explicites, pas de signature locale (jamais avec la clé de dev publique), le
+# service de tokens reste la source des tokens
+LIVEKIT_API_KEY = os.getenv("LIVEKIT_API_KEY")
+LIVEKIT_API_SECRET = os.getenv("LIVEKIT_API_SECRET")
+if mint_token and not (LIVEKIT_API_KEY and LIVEKIT_API_SECRET):
+    logging.getLogger(__name__).warning(
+        "LIVEKIT_API_KEY/LIVEKIT_API_SECRET absents: tokens délégués à livekit-token-service"
+    )
+    mint_token = None
+
+# Index secondaires et agrégats analytics (entretenus à chaque transition de session)
+SESSION_TTL = 3600
+COMPLETED_SESSION_TTL = 86400
+ACTIVE_SESSIONS_KEY = "sessions:active"          # ZSET session_id -> dernière activité
+USERS_HLL_KEY = "analytics:users"                # HyperLogLog des utilisateurs
+SESSIONS_TOTAL_KEY = "analytics:sessions:total"
+TEMPLATE_COUNTERS_KEY = "analytics:templates"    # HASH "{template_id}:created|completed" -> compteur
+# Index par utilisateur bornés: sessions les plus récentes seulement, clés expirées si inactif
+USER_SESSIONS_MAX = 100
+USER_INDEX_TTL = 30 * 86400
+
+def _user_sessions_key(user_id: str) -> str:
+    return f"user:{user_id}:sessions"
+
+def _user_stats_key(user_id: str) -> str:
+    return f"user:{user_id}:stats"
+
+def _index_session_created(session: Dict[str, Any]):
+    """Indexe une nouvelle session: ZSET utilisateur et compteurs globaux/par template"""
+    user_id, template_id = session["user_id"], session["template_id"]
+    now = time.time()
+    pipe = redis_client.pipeline()
+    pipe.zadd(_user_sessions_key(user_id), {session["session_id"]: now})
+    pipe.zremrangebyscore(_user_sessions_key(user_id), "-inf", now - USER_INDEX_TTL)
+    pipe.zremrangebyrank(_user_sessions_key(user_id), 0, -(USER_SESSIONS_MAX + 1))
+    pipe.expire(_user_sessions_key(user_id), USER_INDEX_TTL)
+    pipe.hincrby(_user_stats_key(user_id), "total", 1)
+    pipe.hincrby(_user_stats_key(user_id), f"template:{template_id}", 1)
+    pipe.expire(_user_stats_key(user_id), USER_INDEX_TTL)
+    pipe.hincrby(TEMPLATE_COUNTERS_KEY, f"{template_id}:created", 1)
+    pipe.incr(SESSIONS_TOTAL_KEY)
+    pipe.pfadd(USERS_HLL_KEY, user_id)
+    pipe.execute()
+
+def _index_session_status(session: Dict[str, Any], previous_status: Optional[str], first_completion: bool):
+    """
+    Répercute un changement de statut sur l'ensemble actif et les compteurs de complétion.
+    
+    Les complétions ne sont comptées qu'au premier passage à "completed" (marqueur posé
+    par le script de mise à jour): completed -> active -> completed ne compte qu'une fois.
+    """
+    status = session.get("status")
+    if status == previous_status:
+        if status == "active":
+            redis_client.zadd(ACTIVE_SESSIONS_KEY, {session["session_id"]: time.time()})
+        return
+    
+    pipe = redis_client.pipeline()
+    if status == "active":
+        pipe.zadd(ACTIVE_SESSIONS_KEY, {session["session_id"]: time.time()})
+    else:
+        pipe.zrem(ACTIVE_SESSIONS_KEY, session["session_id"])
+    if status == "completed" and first_completion:
+        pipe.hincrby(_user_stats_key(session["user_id"]), "completed", 1)
+        pipe.expire(_user_stats_key(session["user_id"]), USER_INDEX_TTL)
+        pipe.hincrby(TEMPLATE_COUNTERS_KEY, f"{session['template_id']}:completed", 1)
+    pipe.execute()
+
+# === STOCKAGE DES SESSIONS (HASH REDIS) ===
+
+# Champs imbriqués stockés en JSON compact dans un champ du hash; les autres champs
+# sont des chaînes (valeurs typées refusées à l'écriture)
+SESSION_JSON_FIELDS = ("settings", "metrics")
+# Marqueur interne: complétion déjà comptée dans les agrégats (jamais renvoyé aux clients)
+SESSION_COMPLETION_MARKER = "_completion_counted"
+
+# Mise à jour partielle atomique: HSET + EXPIRE, retourne
+# (statut précédent, appliqué, première complétion, HGETALL).
+# ARGV[2] non vide: ne rien écrire si le statut courant vaut déjà cette valeur.
+_UPDATE_SESSION_LUA = """
+if redis.call('EXISTS', KEYS[1]) == 0 then
+    return nil
+end
+local previous = redis.call('HGET', KEYS[1], 'status') or ''
+if ARGV[2] ~= '' and previous == ARGV[2] then
+    return {previous, 0, 0, redis.call('HGETALL', KEYS[1])}
+end
+if #ARGV > 2 then
+    redis.call('HSET', KEYS[1], unpack(ARGV, 3))
+end
+local first_completion = 0
+if redis.call('HGET', KEYS[1], 'status') == 'completed' then
+    first_completion = redis.call('HSETNX', KEYS[1], '_completion_counted', '1')
+end
+redis.call('EXPIRE', KEYS[1], ARGV[1])
+return {previous, 1, first_completion, redis.call('HGETALL', KEYS[1])}
+"""
+update_session_script = redis_client.register_script(_UPDATE_SESSION_LUA)
+
+def _session_key(session_id: str) -> str:
+    return f"session:{session_id}"
+
+def _encode_session_fields(fields: Dict[str, Any]) -> Dict[str, str]:
+    return {
+        name: json.dumps(value, separators=(",", ":")) if name in SESSION_JSON_FIELDS else str(value)
+        for name, value in fields.items()
+        if value is not None
+    }
+
+def _decode_session(raw: Dict[str, str]) -> Dict[str, Any]:
+    session = dict(raw)
+    session.pop(SESSION_COMPLETION_MARKER, None)
+    for name in SESSION_JSON_FIELDS:
+        if name in session:
+            session[name] = json.loads(session[name])
+    return session
+
+def _migrate_legacy_session(session_id: str) -> bool:
+    """Convertit une session stockée en JSON (ancien format) en hash, TTL conservé"""
+    key = _session_key(session_id)
+    legacy = redis_client.get(key)
+    if not legacy:
+        return False
+    ttl = redis_client.ttl(key)
+    pipe = redis_client.pipeline()
+    pipe.delete(key)
+    pipe.hset(key, mapping=_encode_session_fields(json.loads(legacy)))
+    pipe.expire(key, ttl if ttl > 0 else SESSION_TTL)
+    pipe.execute()
+    return True
+
+def _store_session(session: Dict[str, Any], ttl: int):
+    key = _session_key(session["session_id"])
+    pipe = redis_client.pipeline()
+    pipe.hset(key, mapping=_encode_session_fields(session))
+    pipe.expire(key, ttl)
+    pipe.execute()
+
+def _load_session(session_id: str) -> Optional[Dict[str, Any]]:
+    try:
+        raw = redis_client.hgetall(_session_key(session_id))
+    except redis.ResponseError:
+        if not _migrate_legacy_session(session_id):
+            return None
+        raw = redis_client.hgetall(_session_key(session_id))
+    return _decode_session(raw) if raw else None
+
+def _update_session(
+    session_id: str,
+    fields: Dict[str, Any],
+    ttl: int,
+    skip_if_status: Optional[str] = None
+) -> Optional[Tuple[Dict[str, Any], str, bool, bool]]:
+    """
+    Écrit uniquement les champs modifiés en un aller-retour (script Lua).
+    
+    Retourne (session complète, statut précédent, écriture appliquée, première
+    complétion) ou None si la session n'existe pas.
+    """
+    args = [ttl, skip_if_status or ""]
+    for name, value in _encode_session_fields(fields).items():
+        args.extend([name, value])
+    
+    try:
+        result = update_session_script(keys=[_session_key(session_id)], args=args)
+    except redis.ResponseError:
+        if not _migrate_legacy_session(session_id):
+            return None
+        result = update_session_script(keys=[_session_key(session_id)], args=args)
+    
+    if result is None:
+        return None
+    previous_status, applied, first_completion, flat = result
+    session = _decode_session(dict(zip(flat[::2], flat[1::2])))
+    return session, previous_status or None, bool(applied), bool(first_completion)
+
 # === ENDPOINTS SANTÉ ===
 
 @app.get("/health")
@@ -167,26 +353,34 @@ async def create_exercise_session(session_data: Dict[str, Any]):
     session_id = f"session_{uuid.uuid4().hex[:10]}"
     livekit_room = f"exercise_{session_id}"
     
-    # Générer token LiveKit via le service dédié
+    # Générer token LiveKit (signature locale, sinon via le service dédié)
     try:
-        token_payload = {
-            "room_name": livekit_room,
-            "participant_name": user_id,
-            "grants": {
-                "roomJoin": True,
-                "canPublish": True,
-                "canSubscribe": True,
-                "canPublishData": True,
-            },
-            "metadata": {
-                "exercise_type": template_id,
-                "user_id": user_id
-            }
+        grants = {
+            "roomJoin": True,
+            "canPublish": True,
+            "canSubscribe": True,
+            "canPublishData": True,
+        }
+        metadata = {
+            "exercise_type": template_id,
+            "user_id": user_id
         }
-        async with httpx.AsyncClient(timeout=10.0) as client:
-            token_resp = await client.post(f"{SERVICES['livekit_token']}/generate-token", json=token_payload)
-            token_resp.raise_for_status()
-            livekit_token = token_resp.json().get("token")
+        if mint_token:
+            # Chaque session a sa propre room: un cache de tokens ne servirait jamais
+            livekit_token, _ = mint_token(
+                LIVEKIT_API_KEY, LIVEKIT_API_SECRET, livekit_room, user_id, json.dumps(metadata), grants
+            )
+        else:
+            token_payload = {
+                "room_name": livekit_room,
+                "participant_name": user_id,
+                "grants": grants,
+                "metadata": metadata
+            }
+            async with httpx.AsyncClient(timeout=10.0) as client:
+                token_resp = await client.post(f"{SERVICES['livekit_token']}/generate-token", json=token_payload)
+                token_resp.raise_for_status()
+                livekit_token = token_resp.json().get("token")
     except Exception as e:
         raise HTTPException(status_code=502, detail=f"Token LiveKit indisponible: {e}")
     
@@ -203,7 +397,8 @@ async def create_exercise_session(session_data: Dict[str, Any]):
     }
     
     # Stocker en Redis
-    redis_client.setex(f"session:{session_id}", 3600, json.dumps(session))
+    _store_session(session, SESSION_TTL)
+    _index_session_created(session)
     
     return {
         "session_id": session_id,
@@ -217,50 +412,50 @@ async def create_exercise_session(session_data: Dict[str, Any]):
 @app.get("/api/v1/exercises/sessions/{session_id}")
 async def get_exercise_session(session_id: str):
     """État d'une session d'exercice"""
-    session_data = redis_client.get(f"session:{session_id}")
+    session = _load_session(session_id)
     
-    if not session_data:
+    if not session:
         raise HTTPException(status_code=404, detail="Session non trouvée")
     
-    return json.loads(session_data)
+    return session
 
 @app.put("/api/v1/exercises/sessions/{session_id}")
 async def update_exercise_session(session_id: str, update_data: Dict[str, Any]):
-    """Mettre à jour une session"""
-    session_data = redis_client.get(f"session:{session_id}")
-    
-    if not session_data:
-        raise HTTPException(status_code=404, detail="Session non trouvée")
-    
-    session = json.loads(session_data)
-    
+    """Mettre à jour une session (écriture partielle des seuls champs fournis)"""
     # Mettre à jour les champs autorisés
     allowed_fields = ["status", "metrics", "settings"]
-    for field in allowed_fields:
-        if field in update_data:
-            session[field] = update_data[field]
-    
-    session["updated_at"] = datetime.now().isoformat()
+    fields = {field: update_data[field] for field in allowed_fields if field in update_data}
+    if "status" in fields and not isinstance(fields["status"], str):
+        # Stocké tel quel dans le hash: une valeur typée reviendrait en chaîne
+        raise HTTPException(status_code=400, detail="status doit être une chaîne")
+    fields["updated_at"] = datetime.now().isoformat()
+    
+    updated = _update_session(session_id, fields, SESSION_TTL)
+    if not updated:
+        raise HTTPException(status_code=404, detail="Session non trouvée")
     
-    # Sauvegarder
-    redis_client.setex(f"session:{session_id}", 3600, json.dumps(session))
+    session, previous_status, _, first_completion = updated
+    if "status" in fields:
+        _index_session_status(session, previous_status, first_completion)
     
     return session
 
 @app.delete("/api/v1/exercises/sessions/{session_id}")
 async def end_exercise_session(session_id: str):
     """Terminer une session d'exercice"""
-    session_data = redis_client.get(f"session:{session_id}")
-    
-    if not session_data:
+    # Sauvegarder état final (24h); une session déjà terminée n'est pas recomptée
+    updated = _update_session(
+        session_id,
+        {"status": "completed", "completed_at": datetime.now().isoformat()},
+        COMPLETED_SESSION_TTL,
+        skip_if_status="completed"
+    )
+    if not updated:
         raise HTTPException(status_code=404, detail="Session non trouvée")
     
-    session = json.loads(session_data)
-    session["status"] = "completed"
-    session["completed_at"] = datetime.now().isoformat()
-    
-    # Sauvegarder état final
-    redis_client.setex(f"session:{session_id}", 86400, json.dumps(session))  # 24h
+    session, previous_status, applied, first_completion = updated
+    if applied:
+        _index_session_status(session, previous_status, first_completion)
     
     return {"message": "Session terminée", "session": session}
 
@@ -275,13 +470,10 @@ async def analyze_audio_chunk(audio_data: Dict[str, Any]):
     if not session_id or not audio_base64:
         raise HTTPException(status_code=400, detail="session_id et audio_data requis")
     
-    # Récupérer session
-    session_data = redis_client.get(f"session:{session_id}")
-    if not session_data:
+    # Vérifier la session
+    if not redis_client.exists(_session_key(session_id)):
         raise HTTPException(status_code=404, detail="Session non trouvée")
     
-    session = json.loads(session_data)
-    
     try:
         # Analyser avec Vosk
         async with httpx.AsyncClient() as client:
@@ -324,18 +516,15 @@ async def websocket_realtime_analysis(websocket: WebSocket, session_id: str):
     """WebSocket pour analyse vocale temps réel"""
     await websocket.accept()
     
-    # Vérifier session
-    session_data = redis_client.get(f"session:{session_id}")
-    if not session_data:
+    # Vérifier session et la marquer comme active en une écriture
+    updated = _update_session(session_id, {"status": "active"}, SESSION_TTL)
+    if not updated:
         await websocket.send_json({"error": "Session non trouvée"})
         await websocket.close()
         return
     
-    session = json.loads(session_data)
-    
-    # Marquer session comme active
-    session["status"] = "active"
-    redis_client.setex(f"session:{session_id}", 3600, json.dumps(session))
+    session, previous_status, _, first_completion = updated
+    _index_session_status(session, previous_status, first_completion)
     
     try:
         await websocket.send_json({
@@ -351,6 +540,11 @@ async def websocket_realtime_analysis(websocket: WebSocket, session_id: str):
             if data.get("type") == "audio_chunk":
                 # Analyser audio
                 try:
+                    pipe = redis_client.pipeline(transaction=False)
+                    pipe.zadd(ACTIVE_SESSIONS_KEY, {session_id: time.time()})
+                    pipe.hset(_session_key(session_id), "last_activity_at", datetime.now().isoformat())
+                    pipe.expire(_session_key(session_id), SESSION_TTL)
+                    pipe.execute()
                     analysis_result = await analyze_audio_chunk({
                         "session_id": session_id,
                         "audio_data": data.get("audio_data")
@@ -375,33 +569,54 @@ async def websocket_realtime_analysis(websocket: WebSocket, session_id: str):
     except WebSocketDisconnect:
         pass
     finally:
-        # Marquer session comme terminée
-        session["status"] = "completed"
-        session["completed_at"] = datetime.now().isoformat()
-        redis_client.setex(f"session:{session_id}", 86400, json.dumps(session))
+        # Marquer session comme terminée (sauf si DELETE l'a déjà fait)
+        updated = _update_session(
+            session_id,
+            {"status": "completed", "completed_at": datetime.now().isoformat()},
+            COMPLETED_SESSION_TTL,
+            skip_if_status="completed"
+        )
+        if updated and updated[2]:
+            _index_session_status(updated[0], updated[1], updated[3])
 
 # === ANALYTICS ===
 
 @app.get("/api/v1/exercises/analytics/user/{user_id}")
 async def get_user_analytics(user_id: str):
-    """Historique et statistiques utilisateur"""
-    # Rechercher toutes les sessions de l'utilisateur
-    sessions = []
-    for key in redis_client.scan_iter(match="session:*"):
-        session_data = redis_client.get(key)
-        if session_data:
-            session = json.loads(session_data)
-            if session.get("user_id") == user_id:
-                sessions.append(session)
-    
-    # Calculer statistiques
-    total_sessions = len(sessions)
-    completed_sessions = len([s for s in sessions if s.get("status") == "completed"])
-    
-    exercise_types = {}
-    for session in sessions:
-        template_id = session.get("template_id", "unknown")
-        exercise_types[template_id] = exercise_types.get(template_id, 0) + 1
+    """Historique et statistiques utilisateur (index user:{id}:sessions et compteurs)"""
+    stats = redis_client.hgetall(_user_stats_key(user_id))
+    total_sessions = int(stats.get("total", 0))
+    completed_sessions = int(stats.get("completed", 0))
+    
+    exercise_types = {
+        field[len("template:"):]: int(count)
+        for field, count in stats.items()
+        if field.startswith("template:")
+    }
+    
+    # Sessions récentes: les plus récentes de l'index encore présentes en Redis;
+    # les membres dont la session a expiré sont retirés au passage
+    index_key = _user_sessions_key(user_id)
+    redis_client.zremrangebyscore(index_key, "-inf", time.time() - USER_INDEX_TTL)
+    recent_sessions = []
+    start = 0
+    while len(recent_sessions) < 5 and start < USER_SESSIONS_MAX:
+        recent_ids = redis_client.zrevrange(index_key, start, start + 9)
+        if not recent_ids:
+            break
+        pipe = redis_client.pipeline(transaction=False)
+        for session_id in recent_ids:
+            pipe.hgetall(_session_key(session_id))
+        expired_ids = []
+        for session_id, raw in zip(recent_ids, pipe.execute(raise_on_error=False)):
+            if isinstance(raw, dict) and raw:
+                if len(recent_sessions) < 5:
+                    recent_sessions.append(_decode_session(raw))
+            elif not raw:
+                expired_ids.append(session_id)
+        if expired_ids:
+            redis_client.zrem(index_key, *expired_ids)
+        start += len(recent_ids) - len(expired_ids)
     
     return {
         "user_id": user_id,
@@ -409,26 +624,35 @@ async def get_user_analytics(user_id: str):
         "completed_sessions": completed_sessions,
         "completion_rate": (completed_sessions / total_sessions * 100) if total_sessions > 0 else 0,
         "exercise_types": exercise_types,
-        "recent_sessions": sorted(sessions, key=lambda x: x.get("created_at", ""), reverse=True)[:5]
+        "recent_sessions": recent_sessions
     }
 
 @app.get("/api/v1/exercises/analytics/global")
 async def get_global_analytics():
-    """Statistiques globales de l'application"""
-    all_sessions = []
-    for key in redis_client.scan_iter(match="session:*"):
-        session_data = redis_client.get(key)
-        if session_data:
-            all_sessions.append(json.loads(session_data))
-    
-    total_sessions = len(all_sessions)
-    active_sessions = len([s for s in all_sessions if s.get("status") == "active"])
+    """Statistiques globales de l'application (agrégats précalculés)"""
+    # Les sessions actives sans activité depuis SESSION_TTL ont expiré
+    stale_before = time.time() - SESSION_TTL
+    
+    pipe = redis_client.pipeline()
+    pipe.zremrangebyscore(ACTIVE_SESSIONS_KEY, "-inf", stale_before)
+    pipe.zcard(ACTIVE_SESSIONS_KEY)
+    pipe.get(SESSIONS_TOTAL_KEY)
+    pipe.pfcount(USERS_HLL_KEY)
+    pipe.hgetall(TEMPLATE_COUNTERS_KEY)
+    _, active_sessions, total_sessions, total_users, template_counters = pipe.execute()
+    
+    popular_exercises = {}
+    for field, count in template_counters.items():
+        template_id, _, counter = field.rpartition(":")
+        popular_exercises.setdefault(template_id, {"created": 0, "completed": 0})[counter] = int(count)
     
     return {
-        "total_sessions": total_sessions,
+        "total_sessions": int(total_sessions or 0),
         "active_sessions": active_sessions,
-        "total_users": len(set(s.get("user_id") for s in all_sessions if s.get("user_id"))),
-        "popular_exercises": {},  # À implémenter
+        "total_users": total_users,
+        "popular_exercises": dict(sorted(
+            popular_exercises.items(), key=lambda item: item[1]["created"], reverse=True
+        )),
         "timestamp": datetime.now().isoformat()
     }
 
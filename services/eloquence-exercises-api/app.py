@@ -1,17 +1,33 @@
-from fastapi import FastAPI, HTTPException, Depends, File, UploadFile, Form, WebSocket, WebSocketDisconnect
+from fastapi import FastAPI, HTTPException, Depends, File, UploadFile, Form, WebSocket, WebSocketDisconnect, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 import redis
 import json
 import os
-from typing import Dict, List, Any, Optional
+from typing import Dict, List, Any, Optional, Sequence, Tuple
 import httpx
 import logging
 import uuid
 from datetime import datetime
 import asyncio
 import base64
+import binascii
 import numpy as np
 import io
+import wave
+import socket
+import time
+import re
+import math
+import struct
+import zlib
+import random
+import hashlib
+import tempfile
+import unicodedata
+from collections import deque, OrderedDict
+from dataclasses import dataclass, field
+from functools import lru_cache
 
 from models.exercise_models import (
     ExerciseTemplate, ExerciseConfig, SessionConfig, SessionData,
@@ -60,6 +76,17 @@ redis_client = redis.Redis.from_url(
     os.getenv("REDIS_URL", "redis://redis:6379/0"),
     decode_responses=True
 )
+# Client binaire pour les enregistrements compacts (historique des analyses)
+redis_binary_client = redis.Redis.from_url(os.getenv("REDIS_URL", "redis://redis:6379/0"))
+
+# Libération d'un verrou uniquement par son détenteur: KEYS[1]=verrou, ARGV[1]=jeton
+_RELEASE_LOCK_LUA = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+release_lock_script = redis_client.register_script(_RELEASE_LOCK_LUA)
 
 # Configuration LiveKit
 LIVEKIT_URL = os.getenv("LIVEKIT_URL", "ws://livekit:7880")
@@ -70,6 +97,20 @@ VOSK_SERVICE_URL = os.getenv("VOSK_SERVICE_URL", "http://vosk-stt-analysis:8095"
 
 # Configuration du service Mistral
 MISTRAL_SERVICE_URL = os.getenv("MISTRAL_SERVICE_URL", "http://mistral-conversation:8001")
+# Les analyses d'histoires passent après le trafic conversationnel dans la file de mistral-conversation
+MISTRAL_BATCH_HEADERS = {"X-Request-Priority": "batch"}
+MISTRAL_MAX_RETRY_AFTER = float(os.getenv("MISTRAL_MAX_RETRY_AFTER", "5"))
+# Timeouts client; l'attente en file annoncée au service (X-Request-Deadline) garde une marge
+# pour la génération, afin qu'une requête déjà abandonnée ici ne parte jamais en amont
+MISTRAL_REQUEST_TIMEOUT = 15.0
+MISTRAL_STREAM_READ_TIMEOUT = 30.0
+MISTRAL_DEADLINE_MARGIN = float(os.getenv("MISTRAL_DEADLINE_MARGIN", "5"))
+
+def _mistral_batch_headers(client_timeout: float) -> Dict[str, str]:
+    return {
+        **MISTRAL_BATCH_HEADERS,
+        "X-Request-Deadline": f"{max(client_timeout - MISTRAL_DEADLINE_MARGIN, 1.0):g}"
+    }
 
 # Configuration HTTPX optimisée selon la documentation
 httpx_timeout = httpx.Timeout(
@@ -102,10 +143,28 @@ SESSION_PREFIX = "eloquence:session:"
 TEMPLATE_PREFIX = "eloquence:template:"
 REALTIME_SESSION_PREFIX = "eloquence:realtime:"
 
-# Gestionnaire des connexions WebSocket actives
+# État temps réel partagé entre workers (hash d'agrégats, stream de chunks, transcription)
+REALTIME_LIVE_PREFIX = "eloquence:realtime_live:"
+REALTIME_ACTIVE_KEY = f"{REALTIME_LIVE_PREFIX}active"
+REALTIME_SESSION_TTL = int(os.getenv("REALTIME_SESSION_TTL", "900"))
+WORKER_ID = os.getenv("WORKER_ID", f"{socket.gethostname()}:{os.getpid()}")
+
+# Gestionnaire des connexions WebSocket actives (sockets locaux à ce worker,
+# l'état de session vit dans Redis et survit à une reconnexion ailleurs)
 active_websocket_connections: Dict[str, WebSocket] = {}
 realtime_sessions: Dict[str, Dict] = {}
 
+# Pipeline temps réel : file bornée entre la réception WebSocket et le traitement Vosk
+REALTIME_QUEUE_MAXSIZE = int(os.getenv("REALTIME_QUEUE_MAXSIZE", "8"))
+REALTIME_QUEUE_POLICY = os.getenv("REALTIME_QUEUE_POLICY", "merge")  # merge | drop_oldest | block
+REALTIME_MAX_MERGED_CHUNKS = int(os.getenv("REALTIME_MAX_MERGED_CHUNKS", "4"))
+REALTIME_MAX_INFLIGHT_CHUNKS = int(os.getenv("REALTIME_MAX_INFLIGHT_CHUNKS", "2"))
+
+# Agrégation temps réel : cadence des METRICS_UPDATE et historiques bornés par session
+REALTIME_METRICS_EVERY_N_CHUNKS = int(os.getenv("REALTIME_METRICS_EVERY_N_CHUNKS", "5"))
+REALTIME_CHUNK_HISTORY_SIZE = int(os.getenv("REALTIME_CHUNK_HISTORY_SIZE", "50"))
+REALTIME_METRICS_HISTORY_SIZE = int(os.getenv("REALTIME_METRICS_HISTORY_SIZE", "20"))
+
 # Templates d'exercices prédéfinis
 PREDEFINED_TEMPLATES = [
     {
@@ -162,6 +221,92 @@ PREDEFINED_TEMPLATES = [
     }
 ]
 
+# Idempotence des analyses (en-tête Idempotency-Key ou hash du corps)
+IDEMPOTENCY_PREFIX = "eloquence:idempotency:"
+IDEMPOTENCY_TTL = int(os.getenv("IDEMPOTENCY_TTL", "600"))
+IDEMPOTENCY_WAIT_TIMEOUT = int(os.getenv("IDEMPOTENCY_WAIT_TIMEOUT", "60"))
+
+# Historique des analyses par utilisateur (ZSET horodaté + enregistrements compacts)
+HISTORY_PREFIX = "eloquence:history:"
+HISTORY_MAX_ENTRIES = int(os.getenv("HISTORY_MAX_ENTRIES", "500"))
+HISTORY_TTL = int(os.getenv("HISTORY_TTL", str(90 * 24 * 3600)))
+
+# Limitation de débit par seau à jetons (un seau par utilisateur et classe d'endpoint;
+# le type d'exercice choisit seulement un profil de limites connu côté serveur)
+RATE_LIMIT_PREFIX = "eloquence:ratelimit:"
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "true").lower() == "true"
+RATE_LIMIT_DEFAULTS = {
+    "vosk": {"capacity": 10, "refill_per_minute": 20},  # analyses Vosk seules
+    "story": {"capacity": 4, "refill_per_minute": 6}    # Vosk + Mistral
+}
+# Profils par type d'exercice, complétés par RATE_LIMITS_BY_EXERCISE (JSON); type inconnu -> general
+RATE_LIMITS_BY_EXERCISE = {
+    "virelangue": {"capacity": 6, "refill_per_minute": 12},
+    **json.loads(os.getenv("RATE_LIMITS_BY_EXERCISE", "{}"))
+}
+
+# Taille des blocs lus depuis les uploads et relayés vers Vosk
+UPLOAD_STREAM_CHUNK_SIZE = int(os.getenv("UPLOAD_STREAM_CHUNK_SIZE", str(64 * 1024)))
+
+# Jobs asynchrones (POST → job_id, GET /api/jobs/{job_id} ou push WebSocket)
+JOB_PREFIX = "eloquence:job:"
+JOB_QUEUE_MAXSIZE = int(os.getenv("JOB_QUEUE_MAXSIZE", "64"))
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "4"))
+JOB_TTL = int(os.getenv("JOB_TTL", "3600"))
+JOB_LATENCY_SAMPLES = int(os.getenv("JOB_LATENCY_SAMPLES", "200"))
+
+# Analyse narrative streamée: relayer les deltas SSE de mistral-conversation
+STORY_ANALYSIS_STREAM_LLM = os.getenv("STORY_ANALYSIS_STREAM_LLM", "true").lower() == "true"
+
+# Réserve d'éléments narratifs pré-générés (clé: type, thème, difficulté).
+# ZSET membre=élément JSON, score=date d'ajout: tirages non destructifs, purge par âge
+STORY_POOL_PREFIX = "eloquence:story_pool:v2:"
+STORY_POOL_SEEN_PREFIX = "eloquence:story_pool_seen:"
+STORY_POOL_LOCK_PREFIX = "eloquence:story_pool_lock:"
+STORY_POOL_LOW_WATERMARK = int(os.getenv("STORY_POOL_LOW_WATERMARK", "9"))
+STORY_POOL_TARGET_SIZE = int(os.getenv("STORY_POOL_TARGET_SIZE", "30"))
+STORY_POOL_BATCH_SIZE = int(os.getenv("STORY_POOL_BATCH_SIZE", "12"))  # éléments par appel LLM
+STORY_POOL_SEEN_TTL = int(os.getenv("STORY_POOL_SEEN_TTL", str(7 * 24 * 3600)))
+STORY_POOL_REFILL_INTERVAL = float(os.getenv("STORY_POOL_REFILL_INTERVAL", "60"))
+STORY_POOL_MAX_SIZE = int(os.getenv("STORY_POOL_MAX_SIZE", "200"))
+STORY_POOL_MAX_AGE = int(os.getenv("STORY_POOL_MAX_AGE", str(7 * 24 * 3600)))
+# Éléments par requête: borné au nombre d'éléments de repli disponibles par type
+STORY_ELEMENTS_MAX_COUNT = 3
+# Buckets autorisés: toute autre valeur retombe sur le bucket par défaut (pas de bucket
+# ni d'appel LLM de réapprovisionnement par valeur arbitraire envoyée par un client)
+STORY_POOL_ELEMENT_TYPES = {"character", "location", "magicObject"}
+STORY_POOL_THEMES = {
+    "libre", "fantasy", "sciencefiction", "adventure", "mystery", "comedy", "horror", "fairytale"
+}
+STORY_POOL_DIFFICULTIES = {
+    "facile": "facile", "easy": "facile",
+    "moyen": "moyen", "medium": "moyen",
+    "difficile": "difficile", "hard": "difficile",
+    "expert": "expert"
+}
+STORY_POOL_WARM_BUCKETS = [
+    ("character", "libre", "facile"),
+    ("location", "libre", "facile"),
+    ("magicObject", "libre", "facile")
+]
+
+# Catalogue de virelangues de l'application (préchargé dans le cache de cibles)
+VIRELANGUE_CATALOGUE = [
+    {"text": "Les chaussettes de l'archiduchesse sont-elles sèches, archi-sèches ?", "target_sounds": ["ch", "s"]},
+    {"text": "Un chasseur sachant chasser doit savoir chasser sans son chien", "target_sounds": ["ch", "s"]},
+    {"text": "Ces six saucissons-ci sont si secs qu'on ne sait si c'en sont", "target_sounds": ["s"]},
+    {"text": "Trois tortues trottaient sur trois toits très étroits", "target_sounds": ["t", "r", "tr"]},
+    {"text": "Papa pend peu, papa paie peu, papa part peu", "target_sounds": ["p"]},
+    {"text": "Seize chaises séchaient dans seize sachets sales", "target_sounds": ["s", "ch"]},
+    {"text": "Si six scies scient six cyprès, six cent scies scient six cent cyprès", "target_sounds": ["s"]},
+    {"text": "Cinq chiens chassent six chats", "target_sounds": ["ch"]},
+    {"text": "Didon dîna, dit-on, du dos d'un dodu dindon", "target_sounds": ["d"]},
+    {"text": "Tonton, ton thé t'a-t-il ôté ta toux ?", "target_sounds": ["t"]}
+]
+# Catalogue complémentaire optionnel (liste JSON au même format)
+VIRELANGUE_CATALOGUE_PATH = os.getenv("VIRELANGUE_CATALOGUE_PATH")
+VIRELANGUE_CACHE_SIZE = int(os.getenv("VIRELANGUE_CACHE_SIZE", "512"))
+
 async def get_redis_client():
     """Dépendance pour obtenir le client Redis"""
     return redis_client
@@ -184,6 +329,36 @@ async def startup_event():
         
     except Exception as e:
         logger.error(f"❌ Erreur initialisation: {str(e)}")
+    
+    # Précompiler les virelangues du catalogue (indépendant de Redis)
+    try:
+        catalogue = list(VIRELANGUE_CATALOGUE)
+        if VIRELANGUE_CATALOGUE_PATH:
+            with open(VIRELANGUE_CATALOGUE_PATH, encoding="utf-8") as catalogue_file:
+                catalogue.extend(json.load(catalogue_file))
+        warmed = virelangue_target_cache.warm(catalogue)
+        logger.info(f"✅ {warmed} virelangues précompilés")
+    except Exception as e:
+        logger.error(f"❌ Erreur préchargement virelangues: {str(e)}")
+    
+    # Démarrer le réapprovisionnement de la réserve d'éléments narratifs
+    global story_pool_refill_task
+    for bucket in STORY_POOL_WARM_BUCKETS:
+        _schedule_story_pool_refill(*bucket)
+    story_pool_refill_task = asyncio.create_task(_story_pool_refill_worker())
+    
+    # Démarrer les workers de jobs d'analyse
+    for _ in range(max(1, JOB_WORKERS)):
+        job_worker_tasks.append(asyncio.create_task(_analysis_job_worker()))
+    logger.info(f"✅ {len(job_worker_tasks)} workers de jobs démarrés (file: {JOB_QUEUE_MAXSIZE})")
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Arrêt propre des tâches de fond"""
+    if story_pool_refill_task:
+        story_pool_refill_task.cancel()
+    for task in job_worker_tasks:
+        task.cancel()
 
 @app.get("/health")
 async def health_check():
@@ -508,8 +683,340 @@ async def delete_session(session_id: str):
         logger.error(f"❌ Erreur suppression session {session_id}: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Erreur suppression session: {str(e)}")
 
+# ============================================
+# Transfert streamé des uploads audio vers Vosk
+# ============================================
+
+def _upload_size(audio: UploadFile) -> int:
+    """Taille de l'upload sans le charger (fichier spoolé par Starlette)"""
+    position = audio.file.tell()
+    audio.file.seek(0, os.SEEK_END)
+    size = audio.file.tell()
+    audio.file.seek(position)
+    return size
+
+async def _iter_upload_chunks(audio: UploadFile):
+    await audio.seek(0)
+    while True:
+        chunk = await audio.read(UPLOAD_STREAM_CHUNK_SIZE)
+        if not chunk:
+            break
+        yield chunk
+
+async def _detach_upload(audio: UploadFile) -> UploadFile:
+    """
+    Copie l'upload dans un fichier temporaire propre, par blocs.
+    
+    Nécessaire quand l'audio est consommé après la fin de la requête (jobs,
+    réponses streamées): Starlette ferme alors l'UploadFile d'origine.
+    """
+    spool = tempfile.SpooledTemporaryFile(max_size=UPLOAD_STREAM_CHUNK_SIZE * 16)
+    try:
+        async for chunk in _iter_upload_chunks(audio):
+            spool.write(chunk)
+    except BaseException:
+        spool.close()
+        raise
+    spool.seek(0)
+    return UploadFile(file=spool, filename=audio.filename, headers=audio.headers)
+
+def _closing_upload(audio: UploadFile, compute):
+    """Enveloppe compute() pour fermer l'upload détaché une fois le calcul terminé"""
+    async def run():
+        try:
+            return await compute()
+        finally:
+            await audio.close()
+    return run
+
+async def _multipart_upload_body(boundary: str, audio: UploadFile, data: Dict[str, Any]):
+    for name, value in data.items():
+        yield (
+            f"--{boundary}\r\n"
+            f'Content-Disposition: form-data; name="{name}"\r\n\r\n'
+            f"{value}\r\n"
+        ).encode("utf-8")
+    
+    filename = (audio.filename or "audio.wav").replace('"', "")
+    yield (
+        f"--{boundary}\r\n"
+        f'Content-Disposition: form-data; name="audio"; filename="{filename}"\r\n'
+        f"Content-Type: {audio.content_type or 'application/octet-stream'}\r\n\r\n"
+    ).encode("utf-8")
+    async for chunk in _iter_upload_chunks(audio):
+        yield chunk
+    yield f"\r\n--{boundary}--\r\n".encode("utf-8")
+
+async def post_upload_to_vosk(
+    client: httpx.AsyncClient,
+    path: str,
+    audio: UploadFile,
+    data: Optional[Dict[str, Any]] = None
+) -> httpx.Response:
+    """
+    Relaie l'upload vers Vosk sans le charger en mémoire: le corps multipart
+    est produit par blocs de UPLOAD_STREAM_CHUNK_SIZE depuis le fichier spoolé.
+    """
+    boundary = uuid.uuid4().hex
+    return await client.post(
+        f"{VOSK_SERVICE_URL}{path}",
+        content=_multipart_upload_body(boundary, audio, data or {}),
+        headers={"Content-Type": f"multipart/form-data; boundary={boundary}"}
+    )
+
+# ============================================
+# Limitation de débit par utilisateur (token bucket Redis)
+# ============================================
+
+# Seau à jetons atomique: KEYS[1]=seau, ARGV=capacité, jetons/s, maintenant (ms), coût
+_TOKEN_BUCKET_LUA = """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local now = tonumber(ARGV[3])
+local cost = tonumber(ARGV[4])
+
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or capacity
+local ts = tonumber(state[2]) or now
+
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate / 1000)
+
+local allowed = 0
+local retry_after_ms = 0
+if tokens >= cost then
+    tokens = tokens - cost
+    allowed = 1
+else
+    retry_after_ms = math.ceil((cost - tokens) * 1000 / rate)
+end
+
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'ts', now)
+redis.call('PEXPIRE', KEYS[1], math.ceil(capacity * 1000 / rate) + 1000)
+return {allowed, retry_after_ms}
+"""
+token_bucket_script = redis_client.register_script(_TOKEN_BUCKET_LUA)
+
+# Refus récents connus localement: évite un aller-retour Redis pendant Retry-After
+rate_limit_local_denials: Dict[str, float] = {}
+rate_limit_stats = {"allowed": 0, "limited": 0, "limited_locally": 0, "redis_errors": 0}
+
+def _rate_limit_profile(exercise_type: Optional[str]) -> str:
+    """Type d'exercice envoyé par le client ramené à la liste des profils connus"""
+    return exercise_type if exercise_type in RATE_LIMITS_BY_EXERCISE else "general"
+
+def _rate_limit_config(endpoint_class: str, profile: str) -> Dict[str, float]:
+    config = dict(RATE_LIMIT_DEFAULTS.get(endpoint_class, RATE_LIMIT_DEFAULTS["vosk"]))
+    config.update(RATE_LIMITS_BY_EXERCISE.get(profile, {}))
+    return config
+
+def _rate_limit_identity(request: Request, user_id: Optional[str]) -> str:
+    if user_id and user_id != "anonymous":
+        return f"user:{user_id}"
+    header_user = request.headers.get("x-user-id")
+    if header_user:
+        return f"user:{header_user}"
+    return f"ip:{request.client.host if request.client else 'unknown'}"
+
+def enforce_rate_limit(request: Request, endpoint_class: str, exercise_type: Optional[str], user_id: Optional[str] = None):
+    """
+    Consomme un jeton du seau (utilisateur, classe d'endpoint).
+    
+    Le type d'exercice ne sélectionne qu'un profil de capacité parmi ceux
+    connus du serveur: en changer à chaque essai ne donne pas de seau neuf.
+    Lève HTTPException 429 avec Retry-After si le seau est vide. En cas
+    d'indisponibilité Redis, la requête est laissée passer.
+    """
+    if not RATE_LIMIT_ENABLED:
+        return
+    
+    identity = _rate_limit_identity(request, user_id)
+    bucket_key = f"{RATE_LIMIT_PREFIX}{endpoint_class}:{identity}"
+    
+    now = time.monotonic()
+    denied_until = rate_limit_local_denials.get(bucket_key)
+    if denied_until is not None:
+        if now < denied_until:
+            rate_limit_stats["limited_locally"] += 1
+            raise HTTPException(
+                status_code=429,
+                detail="Trop de requêtes, réessayez plus tard",
+                headers={"Retry-After": str(max(1, math.ceil(denied_until - now)))}
+            )
+        del rate_limit_local_denials[bucket_key]
+    
+    config = _rate_limit_config(endpoint_class, _rate_limit_profile(exercise_type))
+    try:
+        allowed, retry_after_ms = token_bucket_script(
+            keys=[bucket_key],
+            args=[config["capacity"], config["refill_per_minute"] / 60.0, int(time.time() * 1000), 1]
+        )
+    except Exception as e:
+        rate_limit_stats["redis_errors"] += 1
+        logger.warning(f"⚠️ Limiteur indisponible, requête autorisée: {e}")
+        return
+    
+    if allowed:
+        rate_limit_stats["allowed"] += 1
+        return
+    
+    retry_after = max(1, math.ceil(int(retry_after_ms) / 1000))
+    if len(rate_limit_local_denials) >= 10000:
+        for expired_key in [key for key, until in rate_limit_local_denials.items() if until <= now]:
+            del rate_limit_local_denials[expired_key]
+    rate_limit_local_denials[bucket_key] = now + retry_after
+    rate_limit_stats["limited"] += 1
+    logger.info(f"🚦 Limite atteinte {bucket_key} - Retry-After {retry_after}s")
+    raise HTTPException(
+        status_code=429,
+        detail="Trop de requêtes, réessayez plus tard",
+        headers={"Retry-After": str(retry_after)}
+    )
+
+# ============================================
+# Historique compact des analyses par utilisateur
+# ============================================
+
+# Ordre figé des métriques dans l'enregistrement binaire (ajouts en fin uniquement)
+HISTORY_METRIC_FIELDS = (
+    "overall", "clarity", "fluency", "confidence", "energy",
+    "vocabulary_richness", "hesitation_rate", "articulation_score"
+)
+HISTORY_RECORD_VERSION = 1
+_HISTORY_RECORD_HEADER = struct.Struct(f"<BB{len(HISTORY_METRIC_FIELDS)}f")
+
+def _pack_history_metrics(analysis_result: Dict[str, Any]) -> bytes:
+    """Métriques en float32 (NaN si absente) suivies du type d'exercice en UTF-8"""
+    metrics = analysis_result.get("metrics", {})
+    values = [
+        float(metrics[name]) if isinstance(metrics.get(name), (int, float)) else float("nan")
+        for name in HISTORY_METRIC_FIELDS
+    ]
+    return _HISTORY_RECORD_HEADER.pack(
+        HISTORY_RECORD_VERSION, len(HISTORY_METRIC_FIELDS), *values
+    ) + str(analysis_result.get("exercise_type") or "").encode("utf-8")
+
+def _unpack_history_metrics(record: bytes) -> Dict[str, Any]:
+    _, _, *values = _HISTORY_RECORD_HEADER.unpack_from(record)
+    return {
+        "exercise_type": record[_HISTORY_RECORD_HEADER.size:].decode("utf-8"),
+        "metrics": {
+            name: None if math.isnan(value) else round(value, 4)
+            for name, value in zip(HISTORY_METRIC_FIELDS, values)
+        }
+    }
+
+def _pack_history_feedback(analysis_result: Dict[str, Any]) -> bytes:
+    feedback = {
+        key: analysis_result.get(key)
+        for key in ("transcription", "feedback", "detailed_feedback", "strengths", "improvements")
+        if analysis_result.get(key)
+    }
+    return zlib.compress(json.dumps(feedback, ensure_ascii=False, separators=(",", ":")).encode("utf-8"))
+
+def _history_keys(user_id: str) -> Tuple[str, str, str]:
+    base = f"{HISTORY_PREFIX}{user_id}"
+    return f"{base}:index", f"{base}:metrics", f"{base}:feedback"
+
+def _record_analysis_history(user_id: Optional[str], analysis_id: str, analysis_result: Dict[str, Any]):
+    """Indexe l'analyse dans l'historique de l'utilisateur (ZSET par horodatage + HASH compacts)"""
+    if not user_id or user_id == "anonymous":
+        return
+    
+    try:
+        index_key, metrics_key, feedback_key = _history_keys(user_id)
+        
+        pipe = redis_binary_client.pipeline()
+        pipe.zadd(index_key, {analysis_id: time.time()})
+        pipe.hset(metrics_key, analysis_id, _pack_history_metrics(analysis_result))
+        pipe.hset(feedback_key, analysis_id, _pack_history_feedback(analysis_result))
+        # Entrées au-delà de HISTORY_MAX_ENTRIES (les plus anciennes)
+        pipe.zrange(index_key, 0, -(HISTORY_MAX_ENTRIES + 1))
+        pipe.zremrangebyrank(index_key, 0, -(HISTORY_MAX_ENTRIES + 1))
+        for key in (index_key, metrics_key, feedback_key):
+            pipe.expire(key, HISTORY_TTL)
+        evicted = pipe.execute()[3]
+        
+        if evicted:
+            pipe = redis_binary_client.pipeline()
+            pipe.hdel(metrics_key, *evicted)
+            pipe.hdel(feedback_key, *evicted)
+            pipe.execute()
+    except Exception as e:
+        logger.warning(f"⚠️ Historique non enregistré pour {user_id}: {e}")
+
+# Résultat d'analyse par session (24h): même forme compacte que l'historique,
+# dans un HASH {metrics, feedback} au lieu du JSON complet
+ANALYSIS_RESULT_TTL = 86400
+
+def _store_analysis_result(analysis_key: str, analysis_result: Dict[str, Any]):
+    try:
+        pipe = redis_binary_client.pipeline()
+        pipe.delete(analysis_key)  # ancienne valeur JSON éventuelle (autre type)
+        pipe.hset(analysis_key, mapping={
+            "metrics": _pack_history_metrics(analysis_result),
+            "feedback": _pack_history_feedback(analysis_result)
+        })
+        pipe.expire(analysis_key, ANALYSIS_RESULT_TTL)
+        pipe.execute()
+    except Exception as e:
+        logger.warning(f"⚠️ Résultat d'analyse non sauvegardé ({analysis_key}): {e}")
+
+@app.get("/api/users/{user_id}/history")
+async def get_user_analysis_history(
+    user_id: str,
+    limit: int = 20,
+    before: Optional[float] = None,
+    include_feedback: bool = False
+):
+    """
+    Historique paginé des analyses d'un utilisateur, du plus récent au plus ancien.
+    
+    Passer next_cursor dans `before` pour obtenir la page suivante.
+    """
+    try:
+        limit = max(1, min(limit, 100))
+        index_key, metrics_key, feedback_key = _history_keys(user_id)
+        
+        entries = redis_binary_client.zrevrangebyscore(
+            index_key,
+            f"({before}" if before is not None else "+inf",
+            "-inf",
+            start=0,
+            num=limit,
+            withscores=True
+        )
+        analysis_ids = [analysis_id for analysis_id, _ in entries]
+        
+        records = redis_binary_client.hmget(metrics_key, analysis_ids) if analysis_ids else []
+        feedbacks = redis_binary_client.hmget(feedback_key, analysis_ids) if analysis_ids and include_feedback else []
+        
+        items = []
+        for position, (analysis_id, score) in enumerate(entries):
+            if not records[position]:
+                continue
+            item = {
+                "analysis_id": analysis_id.decode("utf-8"),
+                "timestamp": datetime.fromtimestamp(score).isoformat(),
+                **_unpack_history_metrics(records[position])
+            }
+            if include_feedback and feedbacks[position]:
+                item["feedback"] = json.loads(zlib.decompress(feedbacks[position]))
+            items.append(item)
+        
+        return {
+            "user_id": user_id,
+            "items": items,
+            "count": len(items),
+            "next_cursor": entries[-1][1] if len(entries) == limit else None
+        }
+        
+    except Exception as e:
+        logger.error(f"❌ Erreur historique {user_id}: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Erreur récupération historique: {str(e)}")
+
 @app.post("/api/voice-analysis")
 async def analyze_voice(
+    request: Request,
     audio: UploadFile = File(...),
     session_id: Optional[str] = Form(None),
     exercise_type: Optional[str] = Form("general"),
@@ -519,17 +1026,14 @@ async def analyze_voice(
     Endpoint d'analyse vocale qui utilise le service Vosk pour l'analyse audio
     """
     logger.info("🎯 Requête reçue sur /api/voice-analysis - utilisation de Vosk")
+    enforce_rate_limit(request, "vosk", exercise_type, user_id)
     
     try:
         # Générer un session_id si non fourni
         if not session_id:
             session_id = f"analysis_{uuid.uuid4().hex[:8]}"
         
-        # Préparer les données pour l'envoi vers Vosk
-        audio_content = await audio.read()
-        
-        # Créer les données multipart pour Vosk
-        files = {"audio": (audio.filename, audio_content, audio.content_type)}
+        # Données multipart pour Vosk (l'audio est relayé en streaming)
         data = {
             "scenario_type": exercise_type,
             "scenario_context": f"Analyse pour utilisateur {user_id}"
@@ -541,11 +1045,7 @@ async def analyze_voice(
             transport=httpx_async_transport
         ) as client:
             try:
-                vosk_response = await client.post(
-                    f"{VOSK_SERVICE_URL}/analyze",
-                    files=files,
-                    data=data
-                )
+                vosk_response = await post_upload_to_vosk(client, "/analyze", audio, data)
             except httpx.ConnectError as e:
                 logger.error(f"❌ Erreur de connexion vers Vosk ({VOSK_SERVICE_URL}): {e}")
                 raise HTTPException(
@@ -595,11 +1095,10 @@ async def analyze_voice(
             "processing_time": vosk_result.get("processing_time", 0.0)
         }
         
-        # Sauvegarder le résultat dans Redis
-        if session_id and redis_client:
-            analysis_key = f"eloquence:voice_analysis:{session_id}"
-            redis_client.set(analysis_key, json.dumps(analysis_result))
-            redis_client.expire(analysis_key, 86400)  # Expire après 24h
+        # Sauvegarder le résultat dans Redis (forme compacte, 24h)
+        if session_id:
+            _store_analysis_result(f"eloquence:voice_analysis:{session_id}", analysis_result)
+        _record_analysis_history(user_id, session_id, analysis_result)
         
         logger.info(f"✅ Analyse vocale réussie pour session {session_id}")
         return analysis_result
@@ -613,28 +1112,339 @@ async def analyze_voice(
             content=f"Erreur d'analyse: {str(e)}"
         )
 
+# ============================================
+# Idempotence des requêtes d'analyse
+# ============================================
+
+# Calculs en cours dans ce worker, par clé d'idempotence (single-flight)
+idempotent_inflight: Dict[str, asyncio.Task] = {}
+
+async def _idempotency_key(
+    request: Request, scope: str, audio: UploadFile, fields: Dict[str, Any], user_id: Optional[str] = None
+) -> str:
+    """
+    Clé fournie par le client (en-tête Idempotency-Key) ou hash du corps de la requête.
+    
+    Préfixée par l'identité de l'appelant: deux utilisateurs envoyant la même
+    clé ne partagent jamais leurs résultats.
+    """
+    identity = _rate_limit_identity(request, user_id)
+    client_key = request.headers.get("idempotency-key")
+    if client_key:
+        return f"{scope}:{identity}:key:{client_key.strip()}"
+    
+    body_hash = hashlib.sha256()
+    async for chunk in _iter_upload_chunks(audio):
+        body_hash.update(chunk)
+    body_hash.update(json.dumps(fields, sort_keys=True, default=str).encode("utf-8"))
+    return f"{scope}:{identity}:body:{body_hash.hexdigest()}"
+
+def _idempotent_result_exists(key: str) -> bool:
+    try:
+        return bool(redis_client.exists(f"{IDEMPOTENCY_PREFIX}result:{key}"))
+    except Exception:
+        return False
+
+async def _wait_for_idempotent_result(key: str) -> Optional[Dict[str, Any]]:
+    """Attend le résultat calculé par un autre worker (None si son calcul est abandonné)"""
+    deadline = time.monotonic() + IDEMPOTENCY_WAIT_TIMEOUT
+    while time.monotonic() < deadline:
+        await asyncio.sleep(0.25)
+        cached = redis_client.get(f"{IDEMPOTENCY_PREFIX}result:{key}")
+        if cached:
+            return json.loads(cached)
+        if not redis_client.exists(f"{IDEMPOTENCY_PREFIX}pending:{key}"):
+            return None
+    return None
+
+async def _compute_idempotent(key: str, compute) -> Dict[str, Any]:
+    pending_key = f"{IDEMPOTENCY_PREFIX}pending:{key}"
+    pending_token = f"{WORKER_ID}:{uuid.uuid4().hex}"
+    
+    # Un autre worker traite déjà la même requête: réutiliser son résultat
+    owns_pending = bool(redis_client.set(pending_key, pending_token, nx=True, ex=IDEMPOTENCY_WAIT_TIMEOUT))
+    if not owns_pending:
+        logger.info(f"⏳ Requête dupliquée en cours sur un autre worker: {key}")
+        result = await _wait_for_idempotent_result(key)
+        if result is not None:
+            return result
+        # Calcul abandonné ou trop long ailleurs: reprendre le marqueur s'il est libre
+        owns_pending = bool(redis_client.set(pending_key, pending_token, nx=True, ex=IDEMPOTENCY_WAIT_TIMEOUT))
+    
+    try:
+        result = await compute()
+        # Seuls les résultats exploitables sont rejoués (pas les erreurs de validation)
+        if isinstance(result, dict) and result.get("success", True) is not False:
+            redis_client.set(f"{IDEMPOTENCY_PREFIX}result:{key}", json.dumps(result), ex=IDEMPOTENCY_TTL)
+        return result
+    finally:
+        # Ne jamais effacer le marqueur posé par un autre worker
+        if owns_pending:
+            release_lock_script(keys=[pending_key], args=[pending_token])
+
+async def run_idempotent(
+    key: str, response: Optional[Response], compute, audio: UploadFile, owned: bool = False
+) -> Dict[str, Any]:
+    """
+    Exécute compute(audio) une seule fois par clé d'idempotence.
+    
+    Les doublons concurrents attendent le calcul en cours (même worker ou via
+    Redis); les résultats terminés sont rejoués depuis Redis pendant IDEMPOTENCY_TTL.
+    
+    Le calcul reçoit sa propre copie détachée de l'upload (une seule par clé en
+    cours): il ne dépend pas de l'UploadFile d'une requête que Starlette fermera.
+    Avec owned=True, `audio` est déjà détaché et sa propriété est cédée ici.
+    """
+    try:
+        cached = redis_client.get(f"{IDEMPOTENCY_PREFIX}result:{key}")
+        if cached:
+            logger.info(f"♻️ Résultat rejoué depuis Redis: {key}")
+            if response is not None:
+                response.headers["Idempotent-Replayed"] = "true"
+            return json.loads(cached)
+        
+        task = idempotent_inflight.get(key)
+        if task is None and not owned:
+            audio, owned = await _detach_upload(audio), True
+            # Un doublon a pu démarrer le calcul pendant la copie
+            task = idempotent_inflight.get(key)
+        
+        if task is not None:
+            logger.info(f"🔗 Requête dupliquée rattachée au calcul en cours: {key}")
+            if response is not None:
+                response.headers["Idempotent-Replayed"] = "true"
+        else:
+            job_audio = audio
+            task = asyncio.create_task(_closing_upload(
+                job_audio, lambda: _compute_idempotent(key, lambda: compute(job_audio))
+            )())
+            owned = False  # fermé par le calcul lui-même
+            idempotent_inflight[key] = task
+            task.add_done_callback(lambda _: idempotent_inflight.pop(key, None))
+    finally:
+        if owned:
+            await audio.close()
+    
+    # shield: la déconnexion d'un client n'annule pas le calcul partagé
+    return await asyncio.shield(task)
+
+# ============================================
+# Jobs asynchrones pour les analyses lourdes
+# ============================================
+
+# File bornée locale au worker; l'état des jobs vit dans Redis (consultable partout)
+job_queue: asyncio.Queue = asyncio.Queue(maxsize=JOB_QUEUE_MAXSIZE)
+job_worker_tasks: List[asyncio.Task] = []
+job_metrics = {"submitted": 0, "deduplicated": 0, "rejected": 0, "completed": 0, "failed": 0, "running": 0}
+job_wait_times_ms: deque = deque(maxlen=JOB_LATENCY_SAMPLES)
+job_run_times_ms: deque = deque(maxlen=JOB_LATENCY_SAMPLES)
+
+# Envoi vers les WebSockets temps réel locaux (push de fin de job)
+realtime_senders: Dict[str, Any] = {}
+
+def _save_job(job: Dict[str, Any]):
+    redis_client.set(f"{JOB_PREFIX}{job['job_id']}", json.dumps(job), ex=JOB_TTL)
+
+def _load_job(job_id: str) -> Optional[Dict[str, Any]]:
+    raw = redis_client.get(f"{JOB_PREFIX}{job_id}")
+    return json.loads(raw) if raw else None
+
+async def submit_analysis_job(
+    kind: str, key: str, session_id: Optional[str], response: Response, compute, audio: UploadFile
+) -> Dict[str, Any]:
+    """
+    Enfile une analyse et retourne immédiatement son identifiant (HTTP 202).
+    
+    Une requête dupliquée (même clé d'idempotence) récupère le job existant.
+    L'audio n'est copié hors de la requête que pour un job réellement enfilé.
+    """
+    job_id = f"job_{uuid.uuid4().hex}"
+    existing_job_id = None
+    if not redis_client.set(f"{JOB_PREFIX}key:{key}", job_id, nx=True, ex=JOB_TTL):
+        existing_job_id = redis_client.get(f"{JOB_PREFIX}key:{key}")
+    if existing_job_id:
+        job = _load_job(existing_job_id)
+        if job and job["status"] != "failed":
+            job_metrics["deduplicated"] += 1
+            response.status_code = 202
+            return {"job_id": existing_job_id, "status": job["status"], "status_url": f"/api/jobs/{existing_job_id}"}
+        redis_client.set(f"{JOB_PREFIX}key:{key}", job_id, ex=JOB_TTL)
+    
+    job = {
+        "job_id": job_id,
+        "kind": kind,
+        "session_id": session_id,
+        "status": "queued",
+        "worker_id": WORKER_ID,
+        "submitted_at": time.time(),
+        "started_at": None,
+        "completed_at": None,
+        "result": None,
+        "error": None
+    }
+    if job_queue.full():
+        redis_client.delete(f"{JOB_PREFIX}key:{key}")
+        job_metrics["rejected"] += 1
+        logger.warning(f"⚠️ File de jobs pleine ({JOB_QUEUE_MAXSIZE}), job {kind} refusé")
+        raise HTTPException(
+            status_code=503,
+            detail="File d'analyse saturée, réessayez plus tard",
+            headers={"Retry-After": "5"}
+        )
+    
+    # Visible des doublons pendant la copie de l'audio
+    _save_job(job)
+    
+    # Le job s'exécute après la requête: détacher l'audio de l'UploadFile
+    job_audio = await _detach_upload(audio)
+    try:
+        job_queue.put_nowait((job, key, compute, job_audio))
+    except asyncio.QueueFull:
+        # File remplie pendant la copie
+        await job_audio.close()
+        redis_client.delete(f"{JOB_PREFIX}key:{key}", f"{JOB_PREFIX}{job_id}")
+        job_metrics["rejected"] += 1
+        raise HTTPException(
+            status_code=503,
+            detail="File d'analyse saturée, réessayez plus tard",
+            headers={"Retry-After": "5"}
+        )
+    
+    job_metrics["submitted"] += 1
+    logger.info(f"📥 Job {job_id} ({kind}) en file - profondeur: {job_queue.qsize()}")
+    
+    response.status_code = 202
+    return {"job_id": job_id, "status": "queued", "status_url": f"/api/jobs/{job_id}"}
+
+async def _notify_job_completion(job: Dict[str, Any]):
+    """Pousse le résultat sur le WebSocket temps réel de la session s'il est connecté ici"""
+    sender = realtime_senders.get(job.get("session_id") or "")
+    if sender is None:
+        return
+    try:
+        await sender(json.dumps({
+            "type": "JOB_COMPLETED",
+            "job_id": job["job_id"],
+            "kind": job["kind"],
+            "status": job["status"],
+            "result": job["result"],
+            "error": job["error"]
+        }))
+    except Exception as e:
+        logger.warning(f"⚠️ Push job {job['job_id']} impossible: {e}")
+
+async def _run_analysis_job(job: Dict[str, Any], key: str, compute, audio: UploadFile):
+    job["status"] = "running"
+    job["started_at"] = time.time()
+    _save_job(job)
+    job_metrics["running"] += 1
+    job_wait_times_ms.append((job["started_at"] - job["submitted_at"]) * 1000)
+    
+    try:
+        job["result"] = await run_idempotent(key, None, compute, audio, owned=True)
+        job["status"] = "completed"
+        job_metrics["completed"] += 1
+    except HTTPException as e:
+        job["status"], job["error"] = "failed", e.detail
+        job_metrics["failed"] += 1
+    except Exception as e:
+        job["status"], job["error"] = "failed", str(e)
+        job_metrics["failed"] += 1
+    finally:
+        job_metrics["running"] -= 1
+    
+    job["completed_at"] = time.time()
+    job_run_times_ms.append((job["completed_at"] - job["started_at"]) * 1000)
+    _save_job(job)
+    logger.info(f"✅ Job {job['job_id']} {job['status']} en {job_run_times_ms[-1]:.0f} ms")
+    await _notify_job_completion(job)
+
+async def _analysis_job_worker():
+    while True:
+        job, key, compute, audio = await job_queue.get()
+        try:
+            await _run_analysis_job(job, key, compute, audio)
+        except Exception as e:
+            logger.error(f"❌ Erreur job {job['job_id']}: {e}")
+            # Échec avant la prise en charge par run_idempotent (fermeture idempotente sinon)
+            await audio.close()
+        finally:
+            job_queue.task_done()
+
+def _latency_summary(samples: deque) -> Dict[str, float]:
+    if not samples:
+        return {"avg_ms": 0.0, "p95_ms": 0.0}
+    ordered = sorted(samples)
+    return {
+        "avg_ms": round(sum(ordered) / len(ordered), 1),
+        "p95_ms": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))], 1)
+    }
+
+def _job_metrics_snapshot() -> Dict[str, Any]:
+    return {
+        **job_metrics,
+        "queue_depth": job_queue.qsize(),
+        "queue_capacity": JOB_QUEUE_MAXSIZE,
+        "workers": len(job_worker_tasks),
+        "worker_id": WORKER_ID,
+        "queue_wait": _latency_summary(job_wait_times_ms),
+        "run_time": _latency_summary(job_run_times_ms)
+    }
+
+@app.get("/api/jobs/metrics")
+async def get_job_metrics():
+    """Profondeur de file et latences des jobs de ce worker"""
+    return _job_metrics_snapshot()
+
+@app.get("/api/jobs/{job_id}")
+async def get_job(job_id: str):
+    """État d'un job d'analyse (résultat inclus une fois terminé)"""
+    job = _load_job(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job non trouvé")
+    return job
+
 @app.post("/api/voice-analysis/detailed")
 async def analyze_voice_detailed(
+    request: Request,
+    response: Response,
     audio: UploadFile = File(...),
     session_id: Optional[str] = Form(None),
     exercise_type: Optional[str] = Form("general"),
-    user_id: Optional[str] = Form("anonymous")
+    user_id: Optional[str] = Form("anonymous"),
+    async_job: Optional[bool] = Form(False)
 ):
     """
-    Endpoint d'analyse vocale avancée avec métriques détaillées et feedback personnalisé
+    Endpoint d'analyse vocale avancée avec métriques détaillées et feedback personnalisé.
+    Idempotent: les requêtes dupliquées partagent le même calcul.
+    Avec async_job=true, retourne immédiatement un job_id (HTTP 202).
     """
     logger.info("🎯 Requête reçue sur /api/voice-analysis/detailed")
+    key = await _idempotency_key(request, "voice_detailed", audio, {
+        "session_id": session_id, "exercise_type": exercise_type, "user_id": user_id
+    }, user_id)
+    # Le rejeu d'un résultat déjà calculé ne consomme pas de jeton
+    if not _idempotent_result_exists(key):
+        enforce_rate_limit(request, "vosk", exercise_type, user_id)
     
+    compute = lambda upload: _analyze_voice_detailed_content(upload, session_id, exercise_type, user_id)
+    if async_job:
+        return await submit_analysis_job("voice_detailed", key, session_id, response, compute, audio)
+    return await run_idempotent(key, response, compute, audio)
+
+async def _analyze_voice_detailed_content(
+    audio: UploadFile,
+    session_id: Optional[str],
+    exercise_type: str,
+    user_id: str
+) -> Dict[str, Any]:
+    """Analyse détaillée: Vosk /analyze + feedback par métrique, sauvegardée dans Redis"""
     try:
         # Générer un session_id si non fourni
         if not session_id:
             session_id = f"detailed_analysis_{uuid.uuid4().hex[:8]}"
         
-        # Préparer les données pour l'envoi vers Vosk
-        audio_content = await audio.read()
-        
-        # Créer les données multipart pour Vosk
-        files = {"audio": (audio.filename, audio_content, audio.content_type)}
+        # Données multipart pour Vosk (l'audio est relayé en streaming)
         data = {
             "scenario_type": exercise_type,
             "scenario_context": f"Analyse détaillée pour utilisateur {user_id}"
@@ -646,11 +1456,7 @@ async def analyze_voice_detailed(
             transport=httpx_async_transport
         ) as client:
             try:
-                vosk_response = await client.post(
-                    f"{VOSK_SERVICE_URL}/analyze",
-                    files=files,
-                    data=data
-                )
+                vosk_response = await post_upload_to_vosk(client, "/analyze", audio, data)
             except httpx.ConnectError as e:
                 logger.error(f"❌ Erreur de connexion vers Vosk (détaillée): {e}")
                 raise HTTPException(
@@ -708,11 +1514,10 @@ async def analyze_voice_detailed(
             "processing_time": vosk_result.get("processing_time", 0.0)
         }
         
-        # Sauvegarder le résultat dans Redis
-        if session_id and redis_client:
-            analysis_key = f"eloquence:voice_analysis_detailed:{session_id}"
-            redis_client.set(analysis_key, json.dumps(analysis_result))
-            redis_client.expire(analysis_key, 86400)  # Expire après 24h
+        # Sauvegarder le résultat dans Redis (forme compacte, 24h)
+        if session_id:
+            _store_analysis_result(f"eloquence:voice_analysis_detailed:{session_id}", analysis_result)
+        _record_analysis_history(user_id, session_id, analysis_result)
         
         logger.info(f"✅ Analyse vocale détaillée réussie pour session {session_id}")
         return analysis_result
@@ -805,18 +1610,21 @@ def _calculate_hesitation_rate(vosk_result: Dict[str, Any]) -> float:
 
 @app.post("/analyze-virelangue")
 async def analyze_virelangue_pronunciation(
+    request: Request,
     audio: UploadFile = File(...),
     target_text: str = Form(...),
     target_sounds: str = Form(...),
     session_id: Optional[str] = Form(None),
     analysis_focus: str = Form("pronunciation_accuracy"),
     enable_phoneme_analysis: str = Form("true"),
-    enable_fluency_metrics: str = Form("true")
+    enable_fluency_metrics: str = Form("true"),
+    user_id: Optional[str] = Form(None)
 ):
     """
     Endpoint spécialisé pour l'analyse de virelangues avec évaluation de prononciation
     """
     logger.info(f"🎭 Analyse virelangue reçue - texte cible: {target_text}")
+    enforce_rate_limit(request, "vosk", "virelangue", user_id)
     logger.info("🔍 DEBUG-VERY-EARLY: Fonction analyze_virelangue démarrée")
     
     try:
@@ -825,19 +1633,13 @@ async def analyze_virelangue_pronunciation(
         if not session_id:
             session_id = f"virelangue_{uuid.uuid4().hex[:8]}"
         
-        # Parser les sons ciblés (envoyés en JSON string)
-        try:
-            target_sounds_list = json.loads(target_sounds) if isinstance(target_sounds, str) else target_sounds
-        except json.JSONDecodeError:
-            target_sounds_list = [target_sounds] if target_sounds else []
+        # Parser les sons ciblés (envoyés en JSON string) et récupérer la cible précompilée
+        target_sounds_list = list(_parse_target_sounds(target_sounds))
+        target_profile = virelangue_target_cache.get(target_text)
         
         logger.info(f"🔊 Sons ciblés: {target_sounds_list}")
         
-        # Préparer les données pour l'envoi vers Vosk
-        audio_content = await audio.read()
-        
-        # Créer les données multipart pour Vosk
-        files = {"audio": (audio.filename, audio_content, audio.content_type)}
+        # Données multipart pour Vosk (l'audio est relayé en streaming)
         data = {
             "scenario_type": "virelangue",
             "scenario_context": f"Analyse virelangue: {target_text}"
@@ -850,11 +1652,7 @@ async def analyze_virelangue_pronunciation(
         ) as client:
             try:
                 logger.info(f"🔗 Tentative connexion vers Vosk: {VOSK_SERVICE_URL}/analyze")
-                vosk_response = await client.post(
-                    f"{VOSK_SERVICE_URL}/analyze",
-                    files=files,
-                    data=data
-                )
+                vosk_response = await post_upload_to_vosk(client, "/analyze", audio, data)
                 logger.info(f"✅ Connexion Vosk réussie, status: {vosk_response.status_code}")
                 
                 # 🔍 DIAGNOSTIC IMMÉDIAT: Identifier exactement où et pourquoi vosk_result devient une string
@@ -985,16 +1783,28 @@ async def analyze_virelangue_pronunciation(
         confidence_score = safe_get(vosk_result, "confidence_score", 0.0, "confidence_extraction")
         logger.info(f"🔍 STEP 5: confidence_score = {confidence_score}")
         
+        # /analyze renvoie la transcription sous forme d'objet {"text": ...}
+        if isinstance(transcribed_text, dict):
+            transcribed_text = transcribed_text.get("text", "")
+        
+        # Alignement mot à mot calculé une seule fois pour le score et les sons ciblés
+        word_alignment = _align_word_sequences(
+            list(target_profile.tokens), _tokenize_french(transcribed_text)
+        )
+        
         logger.info(f"🔍 STEP 6: About to call _calculate_virelangue_pronunciation_score")
         pronunciation_score = _calculate_virelangue_pronunciation_score(
-            target_text, transcribed_text, confidence_score
+            target_text, transcribed_text, confidence_score, alignment=word_alignment
         )
         logger.info(f"🔍 STEP 7: pronunciation_score = {pronunciation_score}")
         
         # Analyser les sons difficiles
         logger.info(f"🔍 STEP 8: About to call _analyze_target_sounds")
         try:
-            sound_analysis = _analyze_target_sounds(transcribed_text, target_sounds_list, vosk_result)
+            sound_analysis = _analyze_target_sounds(
+                transcribed_text, target_sounds_list, vosk_result,
+                alignment=word_alignment, target_profile=target_profile
+            )
             # ✅ VALIDATION CRITIQUE: Vérifier que sound_analysis est un dictionnaire
             if not isinstance(sound_analysis, dict):
                 logger.error(f"❌ _analyze_target_sounds a retourné un type invalide: {type(sound_analysis)}, contenu: {sound_analysis}")
@@ -1021,6 +1831,9 @@ async def analyze_virelangue_pronunciation(
                 "sound_precision": safe_get(sound_analysis, "precision_score", 0.0, "sound_precision")
             },
             "sound_analysis": sound_analysis,
+            "target_phonetic": target_profile.phonetic,
+            "word_alignment": word_alignment["operations"],
+            "word_error_rate": round(word_alignment["word_error_rate"], 3),
             "prosody_analysis": safe_get(vosk_result, "prosody", {}, "prosody_analysis"),
             "feedback": _generate_virelangue_feedback(pronunciation_score, sound_analysis),
             "strengths": _extract_virelangue_strengths(pronunciation_score, sound_analysis),
@@ -1049,80 +1862,507 @@ async def analyze_virelangue_pronunciation(
             detail=f"Erreur d'analyse virelangue: {str(e)}"
         )
 
-def _calculate_virelangue_pronunciation_score(target_text: str, transcribed_text: str, base_confidence: float) -> float:
-    """Calcule un score de prononciation spécifique aux virelangues"""
-    try:
-        target_words = target_text.lower().replace(",", "").replace("?", "").replace("!", "").split()
-        transcribed_words = transcribed_text.lower().replace(",", "").replace("?", "").replace("!", "").split()
-        
-        if not target_words:
-            return base_confidence
-        
-        # Calculer la similarité mot par mot
-        correct_words = 0
-        for target_word in target_words:
-            # Chercher le mot le plus proche dans la transcription
-            best_match = 0.0
-            for transcribed_word in transcribed_words:
-                # Similarité simple basée sur les caractères communs
-                similarity = _calculate_word_similarity(target_word, transcribed_word)
-                best_match = max(best_match, similarity)
-            
-            if best_match > 0.7:  # Seuil de correspondance
-                correct_words += 1
-        
-        word_accuracy = correct_words / len(target_words)
-        
-        # Combiner avec la confiance Vosk
-        final_score = (word_accuracy * 0.7) + (base_confidence * 0.3)
-        return min(1.0, max(0.0, final_score))
-        
-    except Exception:
-        return base_confidence
+# ============================================
+# Moteur de scoring virelangues: phonétisation et alignement
+# ============================================
 
-def _calculate_word_similarity(word1: str, word2: str) -> float:
-    """Calcule la similarité entre deux mots"""
-    if word1 == word2:
-        return 1.0
+# Seuil de similarité phonétique pour considérer un mot comme correctement prononcé
+VIRELANGUE_MATCH_THRESHOLD = 0.7
+# Marge de la bande de programmation dynamique autour de la diagonale
+VIRELANGUE_ALIGNMENT_BAND = int(os.getenv("VIRELANGUE_ALIGNMENT_BAND", "4"))
+
+_FRENCH_VOWELS = set("aeiouyàâäéèêëîïôöùûüœæ")
+_FRENCH_WORD_SPLIT = re.compile(r"[^\wàâäéèêëîïôöùûüçœæ]+")
+
+# Graphèmes simples -> phonèmes (API simplifiée)
+_FRENCH_LETTER_PHONEMES = {
+    "a": "a", "à": "a", "â": "a", "ä": "a",
+    "é": "e", "è": "ɛ", "ê": "ɛ", "ë": "ɛ", "e": "ə",
+    "i": "i", "î": "i", "ï": "i", "y": "i",
+    "o": "o", "ô": "o", "ö": "o",
+    "u": "y", "û": "y", "ü": "y", "ù": "y",
+    "œ": "ø", "æ": "e",
+    "ç": "s", "j": "ʒ", "r": "ʁ", "x": "ks", "h": "",
+}
+
+# Mots fréquents dont la lecture contredit les règles (appliqué avant les règles)
+_FRENCH_G2P_LEXICON: Dict[str, Tuple[str, ...]] = {
+    "et": ("e",), "est": ("ɛ",), "es": ("ɛ",),
+    "un": ("ɛ̃",), "une": ("y", "n"), "ont": ("ɔ̃",), "eu": ("y",),
+    "femme": ("f", "a", "m"), "monsieur": ("m", "ə", "s", "j", "ø"),
+    "fils": ("f", "i", "s"), "os": ("ɔ", "s"), "plus": ("p", "l", "y"),
+    "cinq": ("s", "ɛ̃", "k"), "six": ("s", "i", "s"), "dix": ("d", "i", "s"),
+    "sept": ("s", "ɛ", "t"), "huit": ("ɥ", "i", "t"), "neuf": ("n", "ø", "f"),
+    "vingt": ("v", "ɛ̃"), "cent": ("s", "ɑ̃"), "mille": ("m", "i", "l"),
+    "client": ("k", "l", "i", "j", "ɑ̃"), "ville": ("v", "i", "l"), "tranquille": ("t", "ʁ", "ɑ̃", "k", "i", "l"),
+    "aiment": ("ɛ", "m"), "dorment": ("d", "ɔ", "ʁ", "m"), "sèment": ("s", "ɛ", "m"),
+}
+
+# Mots en -ent (hors -ment) où la terminaison se prononce: noms, adjectifs, adverbes.
+# Les autres -ent sont traités comme des terminaisons verbales muettes (ils chantent).
+_FRENCH_PRONOUNCED_ENT = {
+    "absent", "accent", "agent", "argent", "content", "dent", "différent",
+    "évident", "excellent", "intelligent", "lent", "parent", "patient", "présent",
+    "récent", "serpent", "souvent", "talent", "torrent", "urgent", "vent", "violent",
+    "adolescent", "continent", "incident", "innocent", "président", "silent", "trident",
+}
+
+def _tokenize_french(text: str) -> List[str]:
+    """Normalise (minuscules, NFC, ponctuation et apostrophes retirées) et découpe en mots"""
+    if not text:
+        return []
+    normalized = unicodedata.normalize("NFC", str(text).lower())
+    return [token for token in _FRENCH_WORD_SPLIT.split(normalized.replace("_", " ")) if token]
+
+def _is_french_vowel(char: str) -> bool:
+    return char in _FRENCH_VOWELS
+
+@lru_cache(maxsize=8192)
+def _french_g2p(word: str) -> Tuple[str, ...]:
+    """
+    Conversion graphème -> phonème à règles pour le français.
     
-    # Calculer la distance de Levenshtein simplifiée
-    len1, len2 = len(word1), len(word2)
-    if len1 == 0 or len2 == 0:
-        return 0.0
+    Couvre les digrammes et nasales courants, les lettres muettes finales et les
+    règles contextuelles de c/g/s: suffisant pour comparer des prononciations et
+    localiser les sons ciblés, sans dictionnaire externe.
+    """
+    w = word.lower()
+    if w in _FRENCH_G2P_LEXICON:
+        return _FRENCH_G2P_LEXICON[w]
     
-    # Compter les caractères communs
-    common_chars = 0
-    for char in word1:
-        if char in word2:
-            common_chars += 1
+    # Terminaison verbale -ent muette (ils parlent -> parle)
+    if len(w) > 4 and w.endswith("ent") and not w.endswith("ment") and w not in _FRENCH_PRONOUNCED_ENT:
+        w = w[:-2]
     
-    similarity = common_chars / max(len1, len2)
-    return similarity
-
-def _analyze_target_sounds(transcribed_text: str, target_sounds: List[str], vosk_result: Dict) -> Dict[str, Any]:
-    """Analyse la prononciation des sons ciblés"""
+    # Terminaisons muettes ou réduites
+    if len(w) <= 3 and w.endswith("es"):
+        w = w[:-2] + "é"
+    if len(w) > 3 and w.endswith("er"):
+        w = w[:-2] + "é"
+    if len(w) > 5 and w.endswith("aient"):
+        w = w[:-3]
+    # -et / -ets avant la suppression des consonnes finales (sachets -> sachè)
+    if len(w) > 3 and w.endswith("ets"):
+        w = w[:-3] + "è"
+    elif len(w) > 2 and w.endswith("et"):
+        w = w[:-2] + "è"
+    if len(w) > 2 and w[-1] in "sxztdp":
+        w = w[:-1]
+        if len(w) > 2 and w[-1] in "tdp":
+            w = w[:-1]
+    if len(w) > 2 and w.endswith("se") and _is_french_vowel(w[-3]):
+        w = w[:-2] + "z"
+    elif len(w) > 2 and w.endswith("ge"):
+        # g reste doux devant le e muet (mange, rouge)
+        w = w[:-2] + "j"
+    elif len(w) > 2 and w.endswith("e"):
+        w = w[:-1]
     
-    # ✅ VALIDATION CRITIQUE
-    if not isinstance(vosk_result, dict):
-        logger.error(f"❌ _analyze_target_sounds: vosk_result n'est pas un dict: {type(vosk_result)}")
-        return {"precision_score": 0.5, "sound_details": [], "overall_sound_quality": "erreur_type"}
+    phonemes: List[str] = []
+    i, n = 0, len(w)
     
-    if not target_sounds:
-        return {"precision_score": 0.8, "sound_details": []}
+    def at(k: int) -> str:
+        return w[k] if 0 <= k < n else ""
     
-    sound_details = []
-    total_precision = 0.0
+    def nasal_ends(k: int) -> bool:
+        # Une voyelle + n/m est nasale si elle n'est suivie ni d'une voyelle ni d'un n/m
+        return not _is_french_vowel(at(k)) and at(k) not in ("n", "m")
     
-    for sound in target_sounds:
-        sound_count_target = transcribed_text.lower().count(sound.lower())
-        precision = min(1.0, sound_count_target / max(1, len(target_sounds)))
+    while i < n:
+        c = w[i]
+        two = w[i:i + 2]
+        three = w[i:i + 3]
         
-        sound_details.append({
-            "sound": sound,
-            "detected_count": sound_count_target,
-            "precision": precision,
-            "feedback": f"Son '{sound}' détecté {sound_count_target} fois"
-        })
+        if three == "eau":
+            phonemes.append("o"); i += 3
+        elif w[i:i + 4] in ("aill", "eill"):
+            phonemes.extend(["a" if c == "a" else "ɛ", "j"]); i += 4
+        elif three in ("ail", "eil") and i + 3 == n:
+            phonemes.extend(["a" if c == "a" else "ɛ", "j"]); i += 3
+        elif w[i:i + 4] == "ienn":
+            # e ouvert devant nn (tiennent, chienne)
+            phonemes.extend(["j", "ɛ", "n"]); i += 4
+        elif three == "ien" and nasal_ends(i + 3):
+            phonemes.extend(["j", "ɛ̃"]); i += 3
+        elif three in ("ain", "ein", "aim") and nasal_ends(i + 3):
+            phonemes.append("ɛ̃"); i += 3
+        elif three == "oin" and nasal_ends(i + 3):
+            phonemes.extend(["w", "ɛ̃"]); i += 3
+        elif three == "ill" and _is_french_vowel(at(i - 1)):
+            phonemes.append("j"); i += 3
+        elif two in ("ai", "ei"):
+            phonemes.append("ɛ"); i += 2
+        elif two == "au":
+            phonemes.append("o"); i += 2
+        elif two == "oi":
+            phonemes.extend(["w", "a"]); i += 2
+        elif two in ("ou", "où", "oû"):
+            phonemes.append("u"); i += 2
+        elif two in ("eu", "œu"):
+            phonemes.append("ø"); i += 2
+        elif two in ("an", "am", "en", "em") and nasal_ends(i + 2):
+            phonemes.append("ɑ̃"); i += 2
+        elif two in ("in", "im", "yn", "ym", "un", "um") and nasal_ends(i + 2):
+            phonemes.append("ɛ̃"); i += 2
+        elif two in ("on", "om") and nasal_ends(i + 2):
+            phonemes.append("ɔ̃"); i += 2
+        elif two == "ch":
+            phonemes.append("ʃ"); i += 2
+        elif two == "ph":
+            phonemes.append("f"); i += 2
+        elif two == "gn":
+            phonemes.append("ɲ"); i += 2
+        elif two == "qu":
+            phonemes.append("k"); i += 2
+        elif two == "gu" and at(i + 2) in ("e", "é", "è", "ê", "i", "y"):
+            phonemes.append("g"); i += 2
+        elif two == "sc" and at(i + 2) in ("e", "é", "è", "ê", "i", "y"):
+            phonemes.append("s"); i += 2
+        elif c == "c":
+            phonemes.append("s" if at(i + 1) in ("e", "é", "è", "ê", "i", "y") else "k"); i += 1
+        elif c == "g":
+            phonemes.append("ʒ" if at(i + 1) in ("e", "é", "è", "ê", "i", "y") else "g"); i += 1
+        elif c == "s":
+            if at(i + 1) == "s":
+                phonemes.append("s"); i += 2
+            else:
+                phonemes.append("z" if _is_french_vowel(at(i - 1)) and _is_french_vowel(at(i + 1)) else "s"); i += 1
+        elif c == "e" and at(i + 1) and not _is_french_vowel(at(i + 1)) and (
+            not at(i + 2) or not _is_french_vowel(at(i + 2))
+        ):
+            # e devant deux consonnes ou une consonne finale: e ouvert
+            phonemes.append("ɛ"); i += 1
+        elif c in _FRENCH_LETTER_PHONEMES:
+            phoneme = _FRENCH_LETTER_PHONEMES[c]
+            if phoneme:
+                phonemes.append(phoneme)
+            i += 1
+        else:
+            phonemes.append(c)
+            i += 1
+        
+        # Consonnes doublées prononcées une seule fois
+        if len(phonemes) >= 2 and phonemes[-1] == phonemes[-2] and not _is_french_vowel(w[i - 1]):
+            phonemes.pop()
+    
+    return tuple(phonemes)
+
+def _sequence_edit_distance(a: Sequence, b: Sequence) -> int:
+    """Distance de Levenshtein entre deux séquences (deux lignes de DP)"""
+    if len(a) < len(b):
+        a, b = b, a
+    previous = list(range(len(b) + 1))
+    for i, item_a in enumerate(a, 1):
+        current = [i]
+        for j, item_b in enumerate(b, 1):
+            current.append(min(
+                previous[j] + 1,
+                current[j - 1] + 1,
+                previous[j - 1] + (item_a != item_b)
+            ))
+        previous = current
+    return previous[-1]
+
+@lru_cache(maxsize=16384)
+def _phonetic_word_similarity(word1: str, word2: str) -> float:
+    """Similarité [0, 1] entre deux mots sur leur forme phonétique (homophones = 1.0)"""
+    if word1 == word2:
+        return 1.0
+    phonemes1, phonemes2 = _french_g2p(word1), _french_g2p(word2)
+    if phonemes1 == phonemes2:
+        return 1.0
+    longest = max(len(phonemes1), len(phonemes2))
+    if longest == 0:
+        return 0.0
+    return 1.0 - _sequence_edit_distance(phonemes1, phonemes2) / longest
+
+def _align_word_sequences(target_words: List[str], transcribed_words: List[str]) -> Dict[str, Any]:
+    """
+    Aligne la transcription sur le texte cible par distance d'édition pondérée.
+    
+    La substitution coûte 1 - similarité phonétique, insertion et suppression 1.
+    Le DP est restreint à une bande autour de la diagonale (|n - m| + marge), ce qui
+    ramène le coût à O(n·bande) et respecte l'ordre et les répétitions des mots.
+    """
+    n, m = len(target_words), len(transcribed_words)
+    band = abs(n - m) + VIRELANGUE_ALIGNMENT_BAND
+    infinity = float("inf")
+    
+    cost = [[infinity] * (m + 1) for _ in range(n + 1)]
+    back: List[List[Optional[str]]] = [[None] * (m + 1) for _ in range(n + 1)]
+    cost[0][0] = 0.0
+    for j in range(1, min(m, band) + 1):
+        cost[0][j] = float(j)
+        back[0][j] = "insertion"
+    
+    for i in range(1, n + 1):
+        j_start, j_end = max(0, i - band), min(m, i + band)
+        if j_start == 0:
+            cost[i][0] = float(i)
+            back[i][0] = "deletion"
+        for j in range(max(1, j_start), j_end + 1):
+            similarity = _phonetic_word_similarity(target_words[i - 1], transcribed_words[j - 1])
+            candidates = (
+                (cost[i - 1][j - 1] + (1.0 - similarity), "substitution"),
+                (cost[i - 1][j] + 1.0, "deletion"),
+                (cost[i][j - 1] + 1.0, "insertion"),
+            )
+            cost[i][j], back[i][j] = min(candidates, key=lambda candidate: candidate[0])
+    
+    # Remontée du chemin optimal
+    operations: List[Dict[str, Any]] = []
+    i, j = n, m
+    while i > 0 or j > 0:
+        step = back[i][j]
+        if step == "substitution":
+            similarity = _phonetic_word_similarity(target_words[i - 1], transcribed_words[j - 1])
+            operations.append({
+                "operation": "match" if similarity >= VIRELANGUE_MATCH_THRESHOLD else "substitution",
+                "target_index": i - 1,
+                "target": target_words[i - 1],
+                "transcribed": transcribed_words[j - 1],
+                "similarity": round(similarity, 3)
+            })
+            i, j = i - 1, j - 1
+        elif step == "deletion":
+            operations.append({"operation": "deletion", "target_index": i - 1, "target": target_words[i - 1], "transcribed": None, "similarity": 0.0})
+            i -= 1
+        else:
+            operations.append({"operation": "insertion", "target_index": None, "target": None, "transcribed": transcribed_words[j - 1], "similarity": 0.0})
+            j -= 1
+    operations.reverse()
+    
+    total_cost = cost[n][m]
+    return {
+        "operations": operations,
+        "cost": total_cost,
+        "matched_words": sum(1 for op in operations if op["operation"] == "match"),
+        "word_error_rate": (total_cost / n) if n else float(m > 0)
+    }
+
+@dataclass
+class VirelangueTargetProfile:
+    """Forme précompilée d'un texte cible: mots normalisés, phonèmes et positions des sons"""
+    text_hash: str
+    tokens: Tuple[str, ...]
+    phonemes: Tuple[Tuple[str, ...], ...]
+    sound_positions: Dict[str, Dict[int, int]] = field(default_factory=dict)
+    
+    @property
+    def phonetic(self) -> str:
+        return " ".join("".join(word_phonemes) for word_phonemes in self.phonemes)
+    
+    def positions_for(self, sound: str, memoize: bool = False) -> Dict[int, int]:
+        """
+        Occurrences du son par index de mot cible.
+        
+        Seuls les sons du catalogue (memoize=True au préchauffage) sont mémorisés:
+        les sons envoyés par le client sont recalculés à chaque appel pour que
+        les profils épinglés ne grossissent pas sans limite.
+        """
+        positions = self.sound_positions.get(sound)
+        if positions is None:
+            sound_phonemes = _french_g2p(str(sound).lower())
+            positions = {}
+            for index, word_phonemes in enumerate(self.phonemes):
+                count = _count_phoneme_occurrences(word_phonemes, sound_phonemes)
+                if count:
+                    positions[index] = count
+            if memoize:
+                self.sound_positions[sound] = positions
+        return positions
+
+class VirelangueTargetCache:
+    """
+    Cache process des textes cibles, indexé par hash du texte normalisé.
+    
+    Les virelangues du catalogue sont épinglés au démarrage; les textes ad hoc
+    passent par un LRU borné à VIRELANGUE_CACHE_SIZE entrées.
+    """
+    
+    def __init__(self, max_size: int):
+        self.max_size = max(1, max_size)
+        self.hits = 0
+        self.misses = 0
+        self._pinned: Dict[str, VirelangueTargetProfile] = {}
+        self._lru: "OrderedDict[str, VirelangueTargetProfile]" = OrderedDict()
+    
+    @staticmethod
+    def key_for(target_text: str) -> str:
+        normalized = unicodedata.normalize("NFC", (target_text or "").strip().lower())
+        return hashlib.sha1(normalized.encode("utf-8")).hexdigest()
+    
+    @staticmethod
+    def _compile(text_hash: str, target_text: str) -> VirelangueTargetProfile:
+        tokens = tuple(_tokenize_french(target_text))
+        return VirelangueTargetProfile(
+            text_hash=text_hash,
+            tokens=tokens,
+            phonemes=tuple(_french_g2p(token) for token in tokens)
+        )
+    
+    def get(self, target_text: str) -> VirelangueTargetProfile:
+        text_hash = self.key_for(target_text)
+        
+        profile = self._pinned.get(text_hash)
+        if profile is not None:
+            self.hits += 1
+            return profile
+        
+        profile = self._lru.get(text_hash)
+        if profile is not None:
+            self._lru.move_to_end(text_hash)
+            self.hits += 1
+            return profile
+        
+        self.misses += 1
+        profile = self._compile(text_hash, target_text)
+        self._lru[text_hash] = profile
+        if len(self._lru) > self.max_size:
+            self._lru.popitem(last=False)
+        return profile
+    
+    def warm(self, catalogue: List[Dict[str, Any]]) -> int:
+        """Épingle les virelangues du catalogue avec les positions de leurs sons"""
+        for entry in catalogue:
+            text_hash = self.key_for(entry["text"])
+            profile = self._pinned.get(text_hash) or self._compile(text_hash, entry["text"])
+            for sound in entry.get("target_sounds", []):
+                profile.positions_for(sound, memoize=True)
+            self._pinned[text_hash] = profile
+            self._lru.pop(text_hash, None)
+        return len(self._pinned)
+    
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "pinned": len(self._pinned),
+            "lru_size": len(self._lru),
+            "lru_max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0
+        }
+
+virelangue_target_cache = VirelangueTargetCache(VIRELANGUE_CACHE_SIZE)
+
+@lru_cache(maxsize=1024)
+def _parse_target_sounds(target_sounds: str) -> Tuple[str, ...]:
+    """Parse les sons ciblés envoyés en JSON string (repli: chaîne brute)"""
+    try:
+        parsed = json.loads(target_sounds)
+    except json.JSONDecodeError:
+        return (target_sounds,) if target_sounds else ()
+    if isinstance(parsed, list):
+        return tuple(str(sound) for sound in parsed)
+    return (str(parsed),) if parsed else ()
+
+def _calculate_virelangue_pronunciation_score(
+    target_text: str,
+    transcribed_text: str,
+    base_confidence: float,
+    alignment: Optional[Dict[str, Any]] = None
+) -> float:
+    """Calcule un score de prononciation spécifique aux virelangues"""
+    try:
+        target_words = _tokenize_french(target_text)
+        if not target_words:
+            return base_confidence
+        
+        if alignment is None:
+            alignment = _align_word_sequences(target_words, _tokenize_french(transcribed_text))
+        
+        # Précision mot à mot = 1 - taux d'erreur pondéré (ordre et répétitions inclus)
+        word_accuracy = max(0.0, 1.0 - alignment["word_error_rate"])
+        
+        # Combiner avec la confiance Vosk
+        final_score = (word_accuracy * 0.7) + (base_confidence * 0.3)
+        return min(1.0, max(0.0, final_score))
+        
+    except Exception:
+        return base_confidence
+
+def _count_phoneme_occurrences(phonemes: Tuple[str, ...], pattern: Tuple[str, ...]) -> int:
+    """Nombre d'occurrences non chevauchantes d'une suite de phonèmes"""
+    if not pattern or len(pattern) > len(phonemes):
+        return 0
+    count, i = 0, 0
+    while i <= len(phonemes) - len(pattern):
+        if phonemes[i:i + len(pattern)] == pattern:
+            count += 1
+            i += len(pattern)
+        else:
+            i += 1
+    return count
+
+def _analyze_target_sounds(
+    transcribed_text: str,
+    target_sounds: List[str],
+    vosk_result: Dict,
+    alignment: Optional[Dict[str, Any]] = None,
+    target_profile: Optional[VirelangueTargetProfile] = None
+) -> Dict[str, Any]:
+    """
+    Analyse la prononciation des sons ciblés au niveau phonétique.
+    
+    Chaque son est phonétisé puis recherché dans les mots cibles; il est compté comme
+    réalisé quand le mot transcrit aligné le contient aussi.
+    """
+    
+    # ✅ VALIDATION CRITIQUE
+    if not isinstance(vosk_result, dict):
+        logger.error(f"❌ _analyze_target_sounds: vosk_result n'est pas un dict: {type(vosk_result)}")
+        return {"precision_score": 0.5, "sound_details": [], "overall_sound_quality": "erreur_type"}
+    
+    if not target_sounds:
+        return {"precision_score": 0.8, "sound_details": []}
+    
+    operations = alignment["operations"] if alignment else []
+    transcribed_phonemes = [_french_g2p(word) for word in _tokenize_french(transcribed_text)]
+    
+    sound_details = []
+    total_precision = 0.0
+    
+    for sound in target_sounds:
+        sound_phonemes = _french_g2p(str(sound).lower())
+        
+        detected_count = sum(_count_phoneme_occurrences(p, sound_phonemes) for p in transcribed_phonemes)
+        expected_count = 0
+        realized_count = 0
+        positions = target_profile.positions_for(sound) if target_profile else None
+        for op in operations:
+            if op["target"] is None:
+                continue
+            if positions is not None:
+                expected_in_word = positions.get(op["target_index"], 0)
+            else:
+                expected_in_word = _count_phoneme_occurrences(_french_g2p(op["target"]), sound_phonemes)
+            if not expected_in_word:
+                continue
+            expected_count += expected_in_word
+            if op["transcribed"] is not None:
+                realized_count += min(
+                    expected_in_word,
+                    _count_phoneme_occurrences(_french_g2p(op["transcribed"]), sound_phonemes)
+                )
+        
+        if expected_count:
+            precision = realized_count / expected_count
+            feedback = f"Son '{sound}' réalisé {realized_count}/{expected_count} fois"
+        else:
+            # Son absent du texte cible (ou alignement indisponible): simple présence
+            precision = 1.0 if detected_count else 0.5
+            feedback = f"Son '{sound}' détecté {detected_count} fois"
+        
+        sound_details.append({
+            "sound": sound,
+            "phonemes": "".join(sound_phonemes),
+            "detected_count": detected_count,
+            "expected_count": expected_count,
+            "realized_count": realized_count,
+            "precision": precision,
+            "feedback": feedback
+        })
         
         total_precision += precision
     
@@ -1227,7 +2467,13 @@ async def get_statistics():
             "templates_total": template_count,
             "voice_analyses_total": voice_analysis_count,
             "realtime_sessions_total": realtime_session_count,
-            "active_websocket_connections": len(active_websocket_connections),
+            "virelangue_target_cache": virelangue_target_cache.stats(),
+            "story_pool": dict(story_pool_stats, pending_refills=len(story_pool_pending)),
+            "analysis_jobs": _job_metrics_snapshot(),
+            "rate_limiting": rate_limit_stats,
+            "active_websocket_connections": _count_active_realtime_sessions(),
+            "local_websocket_connections": len(active_websocket_connections),
+            "worker_id": WORKER_ID,
             "completion_rate": round((completed_sessions / session_count) * 100, 2) if session_count > 0 else 0
         }
         
@@ -1239,7 +2485,13 @@ async def get_statistics():
 # Fonctions utilitaires pour l'analyse temps réel
 # ============================================
 
-async def send_error_to_websocket(websocket: WebSocket, session_id: str, error_code: str, error_message: str):
+async def send_error_to_websocket(
+    websocket: WebSocket,
+    session_id: str,
+    error_code: str,
+    error_message: str,
+    send_lock: Optional[asyncio.Lock] = None
+):
     """Envoie un message d'erreur via WebSocket"""
     try:
         error_msg = RealTimeError(
@@ -1247,10 +2499,107 @@ async def send_error_to_websocket(websocket: WebSocket, session_id: str, error_c
             error_code=error_code,
             error_message=error_message
         )
-        await websocket.send_text(error_msg.model_dump_json())
+        if send_lock is not None:
+            async with send_lock:
+                await websocket.send_text(error_msg.model_dump_json())
+        else:
+            await websocket.send_text(error_msg.model_dump_json())
     except Exception as e:
         logger.error(f"❌ Erreur envoi message d'erreur WebSocket: {e}")
 
+# Marqueur de fin de session déposé dans la file de chunks
+_REALTIME_END = object()
+
+def _merge_wav_chunks(first_b64: str, second_b64: str) -> Optional[str]:
+    """Concatène deux chunks WAV base64 de mêmes paramètres, None si impossible"""
+    try:
+        with wave.open(io.BytesIO(base64.b64decode(first_b64)), "rb") as first:
+            params = first.getparams()
+            first_frames = first.readframes(first.getnframes())
+        with wave.open(io.BytesIO(base64.b64decode(second_b64)), "rb") as second:
+            second_params = second.getparams()
+            second_frames = second.readframes(second.getnframes())
+        
+        if (params.nchannels, params.sampwidth, params.framerate) != (
+            second_params.nchannels, second_params.sampwidth, second_params.framerate
+        ):
+            return None
+        
+        output = io.BytesIO()
+        with wave.open(output, "wb") as merged:
+            merged.setnchannels(params.nchannels)
+            merged.setsampwidth(params.sampwidth)
+            merged.setframerate(params.framerate)
+            merged.writeframes(first_frames + second_frames)
+        return base64.b64encode(output.getvalue()).decode("ascii")
+    except (wave.Error, EOFError, binascii.Error, ValueError):
+        return None
+
+class RealtimeChunkQueue:
+    """
+    File bornée entre la réception WebSocket et le traitement Vosk.
+    
+    Quand la file est pleine, la politique décide du sort du nouveau chunk:
+    - "merge": fusion avec le dernier chunk en attente (repli sur drop_oldest)
+    - "drop_oldest": abandon du chunk le plus ancien en attente
+    - "block": attente d'une place (backpressure TCP vers le client)
+    """
+    
+    def __init__(self, maxsize: int, policy: str):
+        self.maxsize = max(1, maxsize)
+        self.policy = policy
+        self.merged_count = 0
+        self.dropped_count = 0
+        self._items: deque = deque()
+        self._condition = asyncio.Condition()
+    
+    def __len__(self) -> int:
+        return len(self._items)
+    
+    async def put(self, item: Any) -> Optional[Dict[str, Any]]:
+        """Ajoute un élément, retourne l'événement de backpressure éventuel"""
+        async with self._condition:
+            event = None
+            
+            # Le marqueur de fin n'est jamais perdu ni fusionné
+            if item is not _REALTIME_END and len(self._items) >= self.maxsize:
+                if self.policy == "block":
+                    await self._condition.wait_for(lambda: len(self._items) < self.maxsize)
+                    event = {"action": "blocked", "chunk_id": item["chunk_id"]}
+                else:
+                    last = self._items[-1]
+                    if (
+                        self.policy == "merge"
+                        and last is not _REALTIME_END
+                        and len(last["merged_chunk_ids"]) < REALTIME_MAX_MERGED_CHUNKS
+                    ):
+                        merged_audio = _merge_wav_chunks(last["audio_data"], item["audio_data"])
+                        if merged_audio is not None:
+                            last["audio_data"] = merged_audio
+                            last["merged_chunk_ids"].append(item["chunk_id"])
+                            self.merged_count += 1
+                            return {
+                                "action": "merged",
+                                "chunk_id": item["chunk_id"],
+                                "into_chunk_id": last["chunk_id"]
+                            }
+                    
+                    dropped = self._items.popleft()
+                    self.dropped_count += 1
+                    event = {"action": "dropped", "chunk_id": dropped["chunk_id"]}
+            
+            self._items.append(item)
+            self._condition.notify_all()
+            return event
+    
+    async def get(self) -> Any:
+        """Retire le plus ancien élément en attente"""
+        async with self._condition:
+            await self._condition.wait_for(lambda: len(self._items) > 0)
+            item = self._items.popleft()
+            self._condition.notify_all()
+            return item
+
 async def process_audio_chunk_realtime(session_id: str, audio_data: str, chunk_id: int) -> Optional[Dict]:
     """Traite un chunk audio en temps réel avec Vosk"""
     try:
@@ -1289,32 +2638,101 @@ async def process_audio_chunk_realtime(session_id: str, audio_data: str, chunk_i
         logger.error(f"❌ Erreur traitement chunk {chunk_id}: {e}")
         return None
 
+class RealtimeMetricsAccumulator:
+    """
+    Agrégats glissants d'une session temps réel, mis à jour en O(1) par chunk.
+    
+    La variance de la confiance est calculée par l'algorithme de Welford, ce qui
+    évite de conserver l'historique complet des chunks.
+    """
+    
+    def __init__(self):
+        self.chunk_count = 0
+        self.word_count = 0
+        self.silent_count = 0
+        self.confidence_count = 0
+        self.confidence_sum = 0.0
+        self._confidence_mean = 0.0
+        self._confidence_m2 = 0.0
+    
+    def add_chunk(self, text: str, confidence: float):
+        """Intègre un chunk transcrit dans les agrégats"""
+        self.chunk_count += 1
+        
+        stripped = text.strip() if text else ""
+        if stripped:
+            self.word_count += len(stripped.split())
+        else:
+            self.silent_count += 1
+        
+        # Même règle que l'historique: les confiances nulles ne comptent pas
+        if confidence:
+            self.confidence_count += 1
+            self.confidence_sum += confidence
+            delta = confidence - self._confidence_mean
+            self._confidence_mean += delta / self.confidence_count
+            self._confidence_m2 += delta * (confidence - self._confidence_mean)
+    
+    @property
+    def average_confidence(self) -> float:
+        return self.confidence_sum / self.confidence_count if self.confidence_count else 0.0
+    
+    @property
+    def confidence_variance(self) -> float:
+        return self._confidence_m2 / self.confidence_count if self.confidence_count else 0.0
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """Forme sérialisable pour Redis (hash live et archive)"""
+        return {
+            "chunk_count": self.chunk_count,
+            "word_count": self.word_count,
+            "silent_count": self.silent_count,
+            "confidence_count": self.confidence_count,
+            "confidence_sum": self.confidence_sum,
+            "confidence_mean": self._confidence_mean,
+            "confidence_m2": self._confidence_m2
+        }
+    
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "RealtimeMetricsAccumulator":
+        """Reconstruit les agrégats depuis un hash Redis (valeurs en chaînes)"""
+        accumulator = cls()
+        accumulator.chunk_count = int(data.get("chunk_count", 0))
+        accumulator.word_count = int(data.get("word_count", 0))
+        accumulator.silent_count = int(data.get("silent_count", 0))
+        accumulator.confidence_count = int(data.get("confidence_count", 0))
+        accumulator.confidence_sum = float(data.get("confidence_sum", 0.0))
+        accumulator._confidence_mean = float(data.get("confidence_mean", 0.0))
+        accumulator._confidence_m2 = float(data.get("confidence_m2", 0.0))
+        return accumulator
+
+def _empty_realtime_metrics() -> Dict[str, float]:
+    return {
+        "clarity_score": 0.0,
+        "fluency_score": 0.0,
+        "energy_score": 0.0,
+        "speaking_rate": 0.0,
+        "pause_ratio": 0.0,
+        "cumulative_confidence": 0.0,
+        "confidence_std": 0.0
+    }
+
 def calculate_realtime_metrics(session_data: Dict) -> Dict[str, float]:
-    """Calcule les métriques en temps réel"""
+    """Calcule les métriques en temps réel à partir des agrégats de la session"""
     try:
-        chunks = session_data.get("chunks", [])
-        if not chunks:
-            return {
-                "clarity_score": 0.0,
-                "fluency_score": 0.0,
-                "energy_score": 0.0,
-                "speaking_rate": 0.0,
-                "pause_ratio": 0.0,
-                "cumulative_confidence": 0.0
-            }
+        accumulator: RealtimeMetricsAccumulator = session_data.get("metrics_accumulator")
+        if not accumulator or not accumulator.chunk_count:
+            return _empty_realtime_metrics()
         
         # Calculer la confiance cumulative
-        confidences = [chunk.get("confidence", 0.0) for chunk in chunks if chunk.get("confidence")]
-        avg_confidence = sum(confidences) / len(confidences) if confidences else 0.0
+        avg_confidence = accumulator.average_confidence
         
         # Estimer le débit (mots par minute)
-        total_words = sum(len(chunk.get("text", "").split()) for chunk in chunks)
         elapsed_time = session_data.get("elapsed_time", 1.0)  # en secondes
-        speaking_rate = (total_words / elapsed_time) * 60 if elapsed_time > 0 else 0.0
+        speaking_rate = (accumulator.word_count / elapsed_time) * 60 if elapsed_time > 0 else 0.0
         
         # Estimer le ratio de pauses (basé sur les chunks sans transcription)
-        silent_chunks = sum(1 for chunk in chunks if not chunk.get("text", "").strip())
-        pause_ratio = silent_chunks / len(chunks) if chunks else 0.0
+        pause_ratio = accumulator.silent_count / accumulator.chunk_count
         
         return {
             "clarity_score": avg_confidence,
@@ -1322,24 +2740,369 @@ def calculate_realtime_metrics(session_data: Dict) -> Dict[str, float]:
             "energy_score": min(1.0, speaking_rate / 150),  # Normalisé sur 150 mots/min
             "speaking_rate": speaking_rate,
             "pause_ratio": pause_ratio,
-            "cumulative_confidence": avg_confidence
+            "cumulative_confidence": avg_confidence,
+            "confidence_std": accumulator.confidence_variance ** 0.5
         }
         
     except Exception as e:
         logger.error(f"❌ Erreur calcul métriques temps réel: {e}")
-        return {
-            "clarity_score": 0.0,
-            "fluency_score": 0.0,
-            "energy_score": 0.0,
-            "speaking_rate": 0.0,
-            "pause_ratio": 0.0,
-            "cumulative_confidence": 0.0
+        return _empty_realtime_metrics()
+
+def _realtime_live_key(session_id: str, suffix: str = "") -> str:
+    return f"{REALTIME_LIVE_PREFIX}{session_id}{suffix}"
+
+def _new_realtime_session() -> Dict[str, Any]:
+    return {
+        "start_time": datetime.now(),
+        "chunks": deque(maxlen=REALTIME_CHUNK_HISTORY_SIZE),
+        "metrics_accumulator": RealtimeMetricsAccumulator(),
+        "metrics_every_n_chunks": max(1, REALTIME_METRICS_EVERY_N_CHUNKS),
+        "transcription_parts": [],
+        "metrics_history": deque(maxlen=REALTIME_METRICS_HISTORY_SIZE),
+        "last_ack_chunk_id": -1,
+        "resumed": False
+    }
+
+def _load_realtime_session(session_id: str) -> Optional[Dict[str, Any]]:
+    """Reprend une session live depuis Redis (créée par n'importe quel worker)"""
+    try:
+        state = redis_client.hgetall(_realtime_live_key(session_id))
+        if not state:
+            return None
+        
+        session_data = _new_realtime_session()
+        session_data.update({
+            "start_time": datetime.fromisoformat(state["start_time"]),
+            "metrics_accumulator": RealtimeMetricsAccumulator.from_dict(state),
+            "metrics_every_n_chunks": max(1, int(state.get("metrics_every_n_chunks", REALTIME_METRICS_EVERY_N_CHUNKS))),
+            "elapsed_time": float(state.get("elapsed_time", 0.0)),
+            "last_ack_chunk_id": int(state.get("last_ack_chunk_id", -1)),
+            "resumed": True
+        })
+        for field in ("exercise_type", "user_id"):
+            if field in state:
+                session_data[field] = state[field]
+        if "settings" in state:
+            session_data["settings"] = json.loads(state["settings"])
+        
+        transcript = redis_client.get(_realtime_live_key(session_id, ":transcript"))
+        if transcript and transcript.strip():
+            session_data["transcription_parts"].append(transcript.strip())
+        
+        recent = redis_client.xrevrange(
+            _realtime_live_key(session_id, ":chunks"), count=REALTIME_CHUNK_HISTORY_SIZE
+        )
+        for _, fields in reversed(recent):
+            session_data["chunks"].append({
+                "chunk_id": int(fields.get("chunk_id", 0)),
+                "timestamp": fields.get("timestamp", ""),
+                "text": fields.get("text", ""),
+                "confidence": float(fields.get("confidence", 0.0))
+            })
+        
+        return session_data
+    except Exception as e:
+        logger.warning(f"⚠️ Reprise session temps réel {session_id} impossible: {e}")
+        return None
+
+def _persist_realtime_session(session_id: str, session_data: Dict[str, Any]):
+    """Écrit l'état compact de la session (hors chunks) et marque ce worker propriétaire"""
+    try:
+        mapping = {
+            "start_time": session_data["start_time"].isoformat(),
+            "metrics_every_n_chunks": session_data["metrics_every_n_chunks"],
+            "elapsed_time": session_data.get("elapsed_time", 0.0),
+            "last_ack_chunk_id": session_data["last_ack_chunk_id"],
+            "worker_id": WORKER_ID,
+            **session_data["metrics_accumulator"].to_dict()
         }
+        for field in ("exercise_type", "user_id"):
+            if session_data.get(field):
+                mapping[field] = session_data[field]
+        if "settings" in session_data:
+            mapping["settings"] = json.dumps(session_data["settings"])
+        
+        pipe = redis_client.pipeline(transaction=False)
+        pipe.hset(_realtime_live_key(session_id), mapping=mapping)
+        pipe.expire(_realtime_live_key(session_id), REALTIME_SESSION_TTL)
+        pipe.zadd(REALTIME_ACTIVE_KEY, {session_id: time.time()})
+        pipe.execute()
+    except Exception as e:
+        logger.warning(f"⚠️ Persistance session temps réel {session_id} échouée: {e}")
+
+def _persist_realtime_chunk(session_id: str, session_data: Dict[str, Any], chunk_data: Dict[str, Any]):
+    """Un seul aller-retour Redis par chunk: agrégats, stream borné, transcription, TTL"""
+    try:
+        accumulator = session_data["metrics_accumulator"]
+        pipe = redis_client.pipeline(transaction=False)
+        pipe.hset(_realtime_live_key(session_id), mapping={
+            "elapsed_time": session_data.get("elapsed_time", 0.0),
+            "last_ack_chunk_id": session_data["last_ack_chunk_id"],
+            "worker_id": WORKER_ID,
+            **accumulator.to_dict()
+        })
+        pipe.xadd(
+            _realtime_live_key(session_id, ":chunks"),
+            {
+                "chunk_id": chunk_data["chunk_id"],
+                "timestamp": str(chunk_data["timestamp"]),
+                "text": chunk_data["text"],
+                "confidence": chunk_data["confidence"]
+            },
+            maxlen=REALTIME_CHUNK_HISTORY_SIZE,
+            approximate=True
+        )
+        if chunk_data["text"].strip():
+            pipe.append(_realtime_live_key(session_id, ":transcript"), " " + chunk_data["text"].strip())
+        for suffix in ("", ":chunks", ":transcript"):
+            pipe.expire(_realtime_live_key(session_id, suffix), REALTIME_SESSION_TTL)
+        pipe.zadd(REALTIME_ACTIVE_KEY, {session_id: time.time()})
+        pipe.execute()
+    except Exception as e:
+        logger.warning(f"⚠️ Persistance chunk {chunk_data['chunk_id']} ({session_id}) échouée: {e}")
+
+def _release_realtime_session(session_id: str, completed: bool):
+    """Retire la session des connexions actives; l'état live n'est supprimé qu'en fin de session"""
+    try:
+        pipe = redis_client.pipeline(transaction=False)
+        pipe.zrem(REALTIME_ACTIVE_KEY, session_id)
+        if completed:
+            pipe.delete(
+                _realtime_live_key(session_id),
+                _realtime_live_key(session_id, ":chunks"),
+                _realtime_live_key(session_id, ":transcript")
+            )
+        pipe.execute()
+    except Exception as e:
+        logger.warning(f"⚠️ Libération session temps réel {session_id} échouée: {e}")
+
+def _count_active_realtime_sessions() -> int:
+    """Sessions temps réel actives sur l'ensemble des workers"""
+    try:
+        redis_client.zremrangebyscore(REALTIME_ACTIVE_KEY, 0, time.time() - REALTIME_SESSION_TTL)
+        return redis_client.zcard(REALTIME_ACTIVE_KEY)
+    except Exception:
+        return len(active_websocket_connections)
+
+@app.get("/api/realtime/sessions/{session_id}")
+async def get_realtime_session_route(session_id: str):
+    """Indice de routage: worker propriétaire et dernier chunk acquitté d'une session live"""
+    try:
+        state = redis_client.hmget(
+            _realtime_live_key(session_id), "worker_id", "last_ack_chunk_id", "chunk_count"
+        )
+    except Exception as e:
+        raise HTTPException(status_code=503, detail=f"Redis indisponible: {str(e)}")
+    
+    worker_id, last_ack_chunk_id, chunk_count = state
+    if worker_id is None:
+        raise HTTPException(status_code=404, detail="Session temps réel non trouvée")
+    
+    return {
+        "session_id": session_id,
+        "worker_id": worker_id,
+        "last_ack_chunk_id": int(last_ack_chunk_id or -1),
+        "chunk_count": int(chunk_count or 0),
+        "ttl_seconds": REALTIME_SESSION_TTL
+    }
 
 # ============================================
 # Endpoint WebSocket pour analyse temps réel
 # ============================================
 
+async def _emit_realtime_chunk_result(
+    send_text,
+    session_id: str,
+    chunk: Dict[str, Any],
+    vosk_result: Optional[Dict]
+):
+    """Enregistre le résultat Vosk d'un chunk et envoie les messages partiels"""
+    chunk_id = chunk["chunk_id"]
+    if not vosk_result:
+        logger.warning(f"⚠️ Pas de résultat Vosk pour chunk {chunk_id}")
+        return
+    
+    session_data = realtime_sessions[session_id]
+    
+    # Stocker le chunk (format correct basé sur la doc Vosk)
+    # Le service Vosk retourne directement: {"text": "...", "confidence": 0.x, "words": [...]}
+    text = vosk_result.get("text", "")
+    confidence = vosk_result.get("confidence", 0.0)
+    
+    chunk_data = {
+        "chunk_id": chunk_id,
+        "timestamp": chunk["timestamp"],
+        "text": text,
+        "confidence": confidence
+    }
+    session_data["chunks"].append(chunk_data)
+    session_data["metrics_accumulator"].add_chunk(text, confidence)
+    session_data["last_ack_chunk_id"] = max(session_data["last_ack_chunk_id"], *chunk["merged_chunk_ids"])
+    
+    # Mettre à jour la transcription totale
+    if chunk_data["text"].strip():
+        session_data["transcription_parts"].append(chunk_data["text"].strip())
+    
+    # Calculer l'elapsed time
+    session_data["elapsed_time"] = (datetime.now() - session_data["start_time"]).total_seconds()
+    
+    _persist_realtime_chunk(session_id, session_data, chunk_data)
+    
+    # Envoyer résultat partiel
+    partial_result = {
+        "type": "PARTIAL_RESULT",
+        "session_id": session_id,
+        "chunk_id": chunk_id,
+        "transcription": chunk_data["text"],
+        "confidence": chunk_data["confidence"],
+        "timestamp": datetime.now().isoformat(),
+        "partial_metrics": {"chunk_confidence": chunk_data["confidence"]},
+        "acked_chunk_id": session_data["last_ack_chunk_id"]
+    }
+    if len(chunk["merged_chunk_ids"]) > 1:
+        partial_result["merged_chunk_ids"] = chunk["merged_chunk_ids"]
+    await send_text(json.dumps(partial_result))
+    
+    # Envoyer mise à jour des métriques selon la cadence de la session
+    if session_data["metrics_accumulator"].chunk_count % session_data["metrics_every_n_chunks"] == 0:
+        metrics = calculate_realtime_metrics(session_data)
+        metrics_update = {
+            "type": "METRICS_UPDATE",
+            "session_id": session_id,
+            "timestamp": datetime.now().isoformat(),
+            **metrics
+        }
+        await send_text(json.dumps(metrics_update))
+        session_data["metrics_history"].append(metrics)
+
+async def _finalize_realtime_session(send_text, session_id: str):
+    """Calcule et envoie le résultat final, puis archive la session dans Redis"""
+    session_data = realtime_sessions[session_id]
+    total_duration = (datetime.now() - session_data["start_time"]).total_seconds()
+    
+    # Calculer métriques finales
+    final_metrics = calculate_realtime_metrics(session_data)
+    
+    # Générer feedback simple
+    transcription = " ".join(session_data["transcription_parts"])
+    strengths = []
+    improvements = []
+    
+    if final_metrics["cumulative_confidence"] > 0.8:
+        strengths.append("Excellente clarté de prononciation")
+    if final_metrics["speaking_rate"] > 100 and final_metrics["speaking_rate"] < 180:
+        strengths.append("Débit de parole optimal")
+    if final_metrics["pause_ratio"] < 0.3:
+        strengths.append("Fluidité naturelle")
+    
+    if final_metrics["cumulative_confidence"] < 0.6:
+        improvements.append("Améliorer l'articulation")
+    if final_metrics["speaking_rate"] < 80:
+        improvements.append("Parler un peu plus rapidement")
+    elif final_metrics["speaking_rate"] > 200:
+        improvements.append("Ralentir légèrement le débit")
+    
+    feedback = f"Session de {total_duration:.1f}s avec {session_data['metrics_accumulator'].chunk_count} chunks analysés."
+    
+    # Envoyer résultat final
+    final_result = {
+        "type": "FINAL_RESULT",
+        "session_id": session_id,
+        "total_duration": total_duration,
+        "final_transcription": transcription,
+        "overall_metrics": final_metrics,
+        "strengths": strengths,
+        "improvements": improvements,
+        "feedback": feedback,
+        "processing_time": 0.0,
+        "timestamp": datetime.now().isoformat()
+    }
+    await send_text(json.dumps(final_result))
+    
+    # Sauvegarder dans Redis
+    redis_client.set(
+        f"{REALTIME_SESSION_PREFIX}{session_id}",
+        json.dumps({
+            "session_data": {
+                "start_time": session_data["start_time"].isoformat(),
+                "exercise_type": session_data.get("exercise_type"),
+                "resumed": session_data["resumed"],
+                "user_id": session_data.get("user_id"),
+                "settings": session_data.get("settings", {}),
+                "elapsed_time": session_data.get("elapsed_time", 0.0),
+                "aggregates": session_data["metrics_accumulator"].to_dict(),
+                "recent_chunks": list(session_data["chunks"]),
+                "metrics_history": list(session_data["metrics_history"])
+            },
+            "final_result": final_result,
+            "completed_at": datetime.now().isoformat()
+        }),
+        ex=86400  # 24h expiration
+    )
+    
+    logger.info(f"✅ Session temps réel terminée: {session_id}")
+
+async def _process_realtime_queue(
+    websocket: WebSocket,
+    session_id: str,
+    queue: RealtimeChunkQueue,
+    send_text,
+    send_lock: asyncio.Lock
+):
+    """
+    Consomme la file de chunks: les appels Vosk tournent en parallèle (bornés par
+    REALTIME_MAX_INFLIGHT_CHUNKS) et les résultats sont émis dans l'ordre d'arrivée
+    des chunks, pas dans l'ordre de fin de traitement. Cet ordre n'est celui des
+    chunk_id que si le client les envoie dans l'ordre: aucun réordonnancement
+    (les chunk_id peuvent avoir des trous après drop_oldest), le client trie par chunk_id.
+    """
+    inflight_slots = asyncio.Semaphore(max(1, REALTIME_MAX_INFLIGHT_CHUNKS))
+    ordered_results: asyncio.Queue = asyncio.Queue()
+    
+    async def dispatch():
+        while True:
+            chunk = await queue.get()
+            if chunk is _REALTIME_END:
+                await ordered_results.put(_REALTIME_END)
+                return
+            
+            await inflight_slots.acquire()
+            task = asyncio.create_task(
+                process_audio_chunk_realtime(session_id, chunk["audio_data"], chunk["chunk_id"])
+            )
+            await ordered_results.put((chunk, task))
+    
+    async def emit():
+        while True:
+            entry = await ordered_results.get()
+            if entry is _REALTIME_END:
+                try:
+                    await _finalize_realtime_session(send_text, session_id)
+                except Exception as e:
+                    logger.error(f"❌ Erreur fin de session: {e}")
+                    await send_error_to_websocket(websocket, session_id, "END_ERROR", str(e), send_lock)
+                return
+            
+            chunk, task = entry
+            try:
+                vosk_result = await task
+                await _emit_realtime_chunk_result(send_text, session_id, chunk, vosk_result)
+            except Exception as e:
+                logger.error(f"❌ Erreur traitement chunk: {e}")
+                await send_error_to_websocket(websocket, session_id, "CHUNK_ERROR", str(e), send_lock)
+            finally:
+                inflight_slots.release()
+    
+    dispatcher = asyncio.create_task(dispatch())
+    try:
+        await emit()
+    finally:
+        dispatcher.cancel()
+        while not ordered_results.empty():
+            entry = ordered_results.get_nowait()
+            if entry is not _REALTIME_END:
+                entry[1].cancel()
+
 @app.websocket("/ws/voice-analysis/{session_id}")
 async def websocket_voice_analysis_realtime(websocket: WebSocket, session_id: str):
     """
@@ -1351,195 +3114,129 @@ async def websocket_voice_analysis_realtime(websocket: WebSocket, session_id: st
     3. Réception de résultats partiels (PARTIAL_RESULT, METRICS_UPDATE)
     4. Envoi de END_SESSION
     5. Réception de résultat final (FINAL_RESULT)
+    
+    La réception et le traitement Vosk tournent dans deux tâches reliées par une
+    file bornée: une lenteur de Vosk ne bloque jamais la lecture du socket.
     """
-    await websocket.accept()
+    # L'en-tête worker sert d'indice de routage collant aux load balancers
+    await websocket.accept(headers=[(b"x-eloquence-worker", WORKER_ID.encode())])
     active_websocket_connections[session_id] = websocket
     logger.info(f"🔌 WebSocket connecté pour session {session_id}")
     
+    send_lock = asyncio.Lock()
+    
+    async def send_text(payload: str):
+        async with send_lock:
+            await websocket.send_text(payload)
+    realtime_senders[session_id] = send_text
+    
+    chunk_queue = RealtimeChunkQueue(REALTIME_QUEUE_MAXSIZE, REALTIME_QUEUE_POLICY)
+    processing_task: Optional[asyncio.Task] = None
+    session_completed = False
+    session_data: Optional[Dict[str, Any]] = None
+    
     try:
-        # Initialiser la session temps réel
-        realtime_sessions[session_id] = {
-            "start_time": datetime.now(),
-            "chunks": [],
-            "chunk_counter": 0,
-            "total_transcription": "",
-            "metrics_history": []
-        }
+        # Reprendre la session depuis Redis si un autre worker l'a démarrée, sinon l'initialiser
+        session_data = _load_realtime_session(session_id)
+        if session_data:
+            logger.info(f"♻️ Session temps réel reprise: {session_id} (dernier chunk {session_data['last_ack_chunk_id']})")
+        else:
+            session_data = _new_realtime_session()
+        realtime_sessions[session_id] = session_data
+        _persist_realtime_session(session_id, session_data)
+        resume_from_chunk_id = session_data["last_ack_chunk_id"]
+        
+        processing_task = asyncio.create_task(
+            _process_realtime_queue(websocket, session_id, chunk_queue, send_text, send_lock)
+        )
         
         while True:
             try:
-                logger.info(f"🔄 Boucle WebSocket active pour session {session_id}")
-                
                 # Recevoir un message WebSocket
                 data = await websocket.receive_text()
-                logger.info(f"📨 Data brute reçue: {data}")
                 
                 message = json.loads(data)
                 message_type = message.get("type")
                 
-                logger.info(f"📨 Message reçu type: {message_type}, contenu complet: {message}")
+                logger.debug(f"📨 Message reçu type: {message_type}")
                 
                 if message_type == "START_SESSION":
                     # Démarrer la session
                     try:
+                        settings = message.get("settings") or {}
                         realtime_sessions[session_id].update({
                             "exercise_type": message.get("exercise_type", "general"),
                             "user_id": message.get("user_id", "anonymous"),
-                            "settings": message.get("settings", {})
+                            "settings": settings
                         })
+                        if settings.get("metrics_every_n_chunks"):
+                            realtime_sessions[session_id]["metrics_every_n_chunks"] = max(
+                                1, int(settings["metrics_every_n_chunks"])
+                            )
+                        _persist_realtime_session(session_id, realtime_sessions[session_id])
                         
                         logger.info(f"🎯 Session temps réel démarrée: {session_id}")
                         
-                        # Envoyer confirmation
-                        await websocket.send_text(json.dumps({
+                        # Envoyer confirmation avec les indices de reprise
+                        await send_text(json.dumps({
                             "type": "session_started",
                             "session_id": session_id,
+                            "worker_id": WORKER_ID,
+                            "resumed": realtime_sessions[session_id]["resumed"],
+                            "resume_from_chunk_id": resume_from_chunk_id,
                             "timestamp": datetime.now().isoformat()
                         }))
                     except Exception as e:
                         logger.error(f"❌ Erreur démarrage session: {e}")
-                        await send_error_to_websocket(websocket, session_id, "START_ERROR", str(e))
+                        await send_error_to_websocket(websocket, session_id, "START_ERROR", str(e), send_lock)
                     
                 elif message_type == "AUDIO_CHUNK":
-                    # Traiter chunk audio
-                    try:
-                        chunk_id = message.get("chunk_id", 0)
-                        audio_data = message.get("audio_data", "")
-                        timestamp = message.get("timestamp", datetime.now().isoformat())
-                        
-                        session_data = realtime_sessions[session_id]
-                        
-                        # Traiter avec Vosk (correction: utiliser endpoint /analyze au lieu de /transcribe)
-                        vosk_result = await process_audio_chunk_realtime(
-                            session_id,
-                            audio_data,
-                            chunk_id
-                        )
-                        
-                        if vosk_result:
-                            # Stocker le chunk (format correct basé sur la doc Vosk)
-                            # Le service Vosk retourne directement: {"text": "...", "confidence": 0.x, "words": [...]}
-                            text = vosk_result.get("text", "")
-                            confidence = vosk_result.get("confidence", 0.0)
-                            
-                            chunk_data = {
-                                "chunk_id": chunk_id,
-                                "timestamp": timestamp,
-                                "text": text,
-                                "confidence": confidence
-                            }
-                            session_data["chunks"].append(chunk_data)
-                            
-                            # Mettre à jour la transcription totale
-                            if chunk_data["text"].strip():
-                                session_data["total_transcription"] += " " + chunk_data["text"].strip()
-                            
-                            # Calculer l'elapsed time
-                            session_data["elapsed_time"] = (datetime.now() - session_data["start_time"]).total_seconds()
-                            
-                            # Envoyer résultat partiel
-                            partial_result = {
-                                "type": "PARTIAL_RESULT",
-                                "session_id": session_id,
-                                "chunk_id": chunk_id,
-                                "transcription": chunk_data["text"],
-                                "confidence": chunk_data["confidence"],
-                                "timestamp": datetime.now().isoformat(),
-                                "partial_metrics": {"chunk_confidence": chunk_data["confidence"]}
-                            }
-                            await websocket.send_text(json.dumps(partial_result))
-                            
-                            # Envoyer mise à jour des métriques toutes les 5 chunks
-                            if len(session_data["chunks"]) % 5 == 0:
-                                metrics = calculate_realtime_metrics(session_data)
-                                metrics_update = {
-                                    "type": "METRICS_UPDATE",
-                                    "session_id": session_id,
-                                    "timestamp": datetime.now().isoformat(),
-                                    **metrics
-                                }
-                                await websocket.send_text(json.dumps(metrics_update))
-                                session_data["metrics_history"].append(metrics)
-                        else:
-                            logger.warning(f"⚠️ Pas de résultat Vosk pour chunk {chunk_id}")
-                    except Exception as e:
-                        logger.error(f"❌ Erreur traitement chunk: {e}")
-                        await send_error_to_websocket(websocket, session_id, "CHUNK_ERROR", str(e))
+                    # Mettre le chunk en file, le traitement Vosk est asynchrone
+                    chunk_id = message.get("chunk_id", 0)
                     
-                elif message_type == "END_SESSION":
-                    # Terminer la session
-                    try:
-                        session_data = realtime_sessions[session_id]
-                        total_duration = (datetime.now() - session_data["start_time"]).total_seconds()
-                        
-                        # Calculer métriques finales
-                        final_metrics = calculate_realtime_metrics(session_data)
-                        
-                        # Générer feedback simple
-                        transcription = session_data["total_transcription"].strip()
-                        strengths = []
-                        improvements = []
-                        
-                        if final_metrics["cumulative_confidence"] > 0.8:
-                            strengths.append("Excellente clarté de prononciation")
-                        if final_metrics["speaking_rate"] > 100 and final_metrics["speaking_rate"] < 180:
-                            strengths.append("Débit de parole optimal")
-                        if final_metrics["pause_ratio"] < 0.3:
-                            strengths.append("Fluidité naturelle")
-                        
-                        if final_metrics["cumulative_confidence"] < 0.6:
-                            improvements.append("Améliorer l'articulation")
-                        if final_metrics["speaking_rate"] < 80:
-                            improvements.append("Parler un peu plus rapidement")
-                        elif final_metrics["speaking_rate"] > 200:
-                            improvements.append("Ralentir légèrement le débit")
-                        
-                        feedback = f"Session de {total_duration:.1f}s avec {len(session_data['chunks'])} chunks analysés."
-                        
-                        # Envoyer résultat final
-                        final_result = {
-                            "type": "FINAL_RESULT",
+                    # Après une reprise, ignorer les chunks déjà acquittés renvoyés par le client
+                    if "chunk_id" in message and chunk_id <= resume_from_chunk_id:
+                        logger.debug(f"⏭️ Chunk {chunk_id} déjà traité ({session_id})")
+                        continue
+                    
+                    backpressure_event = await chunk_queue.put({
+                        "chunk_id": chunk_id,
+                        "audio_data": message.get("audio_data", ""),
+                        "timestamp": message.get("timestamp", datetime.now().isoformat()),
+                        "merged_chunk_ids": [chunk_id]
+                    })
+                    
+                    if backpressure_event:
+                        logger.warning(f"⚠️ File temps réel saturée ({session_id}): {backpressure_event}")
+                        await send_text(json.dumps({
+                            "type": "BACKPRESSURE",
                             "session_id": session_id,
-                            "total_duration": total_duration,
-                            "final_transcription": transcription,
-                            "overall_metrics": final_metrics,
-                            "strengths": strengths,
-                            "improvements": improvements,
-                            "feedback": feedback,
-                            "processing_time": 0.0,
-                            "timestamp": datetime.now().isoformat()
-                        }
-                        await websocket.send_text(json.dumps(final_result))
-                        
-                        # Sauvegarder dans Redis
-                        redis_client.set(
-                            f"{REALTIME_SESSION_PREFIX}{session_id}",
-                            json.dumps({
-                                "session_data": session_data,
-                                "final_result": final_result,
-                                "completed_at": datetime.now().isoformat()
-                            }),
-                            ex=86400  # 24h expiration
-                        )
-                        
-                        logger.info(f"✅ Session temps réel terminée: {session_id}")
-                        break
-                    except Exception as e:
-                        logger.error(f"❌ Erreur fin de session: {e}")
-                        await send_error_to_websocket(websocket, session_id, "END_ERROR", str(e))
-                        break
+                            "policy": chunk_queue.policy,
+                            "queue_depth": len(chunk_queue),
+                            "merged_total": chunk_queue.merged_count,
+                            "dropped_total": chunk_queue.dropped_count,
+                            "timestamp": datetime.now().isoformat(),
+                            **backpressure_event
+                        }))
+                    
+                elif message_type == "END_SESSION":
+                    # Terminer la session: vider la file puis envoyer le résultat final
+                    await chunk_queue.put(_REALTIME_END)
+                    await processing_task
+                    session_completed = True
+                    break
                 
                 else:
                     logger.warning(f"⚠️ Type de message non reconnu: {message_type}")
-                    await send_error_to_websocket(websocket, session_id, "UNKNOWN_MESSAGE_TYPE", f"Type '{message_type}' non supporté")
+                    await send_error_to_websocket(websocket, session_id, "UNKNOWN_MESSAGE_TYPE", f"Type '{message_type}' non supporté", send_lock)
                     
             except WebSocketDisconnect:
                 logger.info(f"🔌 WebSocket déconnecté: {session_id}")
                 break
             except json.JSONDecodeError:
-                await send_error_to_websocket(websocket, session_id, "INVALID_JSON", "Format JSON invalide")
+                await send_error_to_websocket(websocket, session_id, "INVALID_JSON", "Format JSON invalide", send_lock)
             except Exception as e:
-                await send_error_to_websocket(websocket, session_id, "PROCESSING_ERROR", str(e))
+                await send_error_to_websocket(websocket, session_id, "PROCESSING_ERROR", str(e), send_lock)
                 
     except WebSocketDisconnect:
         logger.info(f"🔌 WebSocket fermé: {session_id}")
@@ -1547,9 +3244,21 @@ async def websocket_voice_analysis_realtime(websocket: WebSocket, session_id: st
         logger.error(f"❌ Erreur WebSocket {session_id}: {e}")
     finally:
         # Cleanup
-        if session_id in active_websocket_connections:
+        if processing_task and not processing_task.done():
+            processing_task.cancel()
+            try:
+                await processing_task
+            except (asyncio.CancelledError, Exception):
+                pass
+        # Une reconnexion plus récente sur ce worker possède désormais la session: ne rien lui retirer
+        if active_websocket_connections.get(session_id) is websocket:
+            _release_realtime_session(session_id, completed=session_completed)
             del active_websocket_connections[session_id]
-        if session_id in realtime_sessions:
+        else:
+            logger.info(f"♻️ Session {session_id} reprise par une connexion plus récente, état conservé")
+        if realtime_senders.get(session_id) is send_text:
+            del realtime_senders[session_id]
+        if session_data is not None and realtime_sessions.get(session_id) is session_data:
             del realtime_sessions[session_id]
         logger.info(f"🧹 Cleanup session {session_id}")
 
@@ -1566,13 +3275,14 @@ async def call_mistral_with_retry(payload, max_retries=2):
             
             # ✅ CORRECTION CRITIQUE : Créer un nouveau client pour chaque tentative
             async with httpx.AsyncClient(
-                timeout=httpx.Timeout(connect=5.0, read=15.0, write=10.0, pool=2.0),
+                timeout=httpx.Timeout(connect=5.0, read=MISTRAL_REQUEST_TIMEOUT, write=10.0, pool=2.0),
                 transport=httpx_async_transport
             ) as mistral_client:
                 response = await mistral_client.post(
                     f"{MISTRAL_SERVICE_URL}/v1/chat/completions",
                     json=payload,
-                    timeout=15.0
+                    headers=_mistral_batch_headers(MISTRAL_REQUEST_TIMEOUT),
+                    timeout=MISTRAL_REQUEST_TIMEOUT
                 )
                 
                 if response.status_code == 200:
@@ -1580,6 +3290,13 @@ async def call_mistral_with_retry(payload, max_retries=2):
                     return response
                 else:
                     logger.warning(f"⚠️ Mistral HTTP {response.status_code} - Tentative {attempt + 1}")
+                    # File saturée ou quota amont: respecter Retry-After plutôt que de réessayer aussitôt
+                    if response.status_code in (429, 503) and attempt < max_retries:
+                        try:
+                            retry_after = float(response.headers.get("Retry-After", "1"))
+                        except ValueError:
+                            retry_after = 1.0
+                        await asyncio.sleep(min(max(retry_after, 0.0), MISTRAL_MAX_RETRY_AFTER))
                 
         except httpx.ConnectError as e:
             logger.warning(f"⚠️ Mistral connexion échouée - Tentative {attempt + 1}: {e}")
@@ -1655,86 +3372,68 @@ def _generate_vosk_only_analysis(session_id, story_title, transcription, element
         "timestamp": datetime.now().isoformat()
     }
 
-@app.post("/api/story/analyze-narrative")
-async def analyze_story_narrative(
-    audio: UploadFile = File(...),
-    session_id: str = Form(...),
-    story_title: Optional[str] = Form("Histoire sans titre"),
-    story_elements: Optional[str] = Form("[]"),
-    genre: Optional[str] = Form("libre")
-):
+# Patterns de contenu non significatif (charabia, hésitations, tests micro)
+STORY_NONSENSE_PATTERNS = [
+    "bla", "blabla", "euh", "hum", "ah", "oh", "mmm",
+    "test", "testing", "allo", "hello", "bonjour"
+]
+
+def _story_nonsense_ratio(words: List[str]) -> float:
+    nonsense_count = sum(1 for word in words if any(pattern in word for pattern in STORY_NONSENSE_PATTERNS))
+    return nonsense_count / max(len(words), 1)
+
+def _validate_story_audio(audio: UploadFile, session_id: str) -> Optional[Dict[str, Any]]:
+    """Valide l'audio reçu sans le lire; retourne None ou la réponse d'erreur"""
+    # ✅ VALIDATION LOG: Vérifier la taille du fichier audio
+    audio_size = _upload_size(audio)
+    logger.info(f"📊 VALIDATION AUDIO - Taille: {audio_size} bytes, Nom: {audio.filename}")
+    
+    # ✅ CORRECTION : Validation assouplie de la taille du fichier
+    if audio_size < 100:  # Moins de 100 bytes = fichier invalide
+        logger.error(f"❌ FICHIER AUDIO INVALIDE - Taille: {audio_size} bytes (minimum 100 bytes requis)")
+        return {
+            "success": False,
+            "error": "INVALID_AUDIO_FILE",
+            "details": f"Fichier audio trop petit: {audio_size} bytes. Minimum requis: 100 bytes",
+            "session_id": session_id,
+            "timestamp": datetime.now().isoformat()
+        }
+    elif audio_size < 1000:
+        # ✅ NOUVEAU : Avertissement pour fichiers petits mais valides
+        logger.warning(f"⚠️ FICHIER AUDIO PETIT - Taille: {audio_size} bytes - Analyse avec prudence")
+    
+    logger.info(f"✅ AUDIO VALIDE - Format: {audio.content_type}, Taille: {audio_size} bytes")
+    return None
+
+async def _transcribe_story_audio(audio: UploadFile) -> Dict[str, Any]:
     """
-    Endpoint d'analyse narrative pour le générateur d'histoires
-    Flux: Audio → Vosk STT → Mistral AI → Analyse structurée
+    Étape 1: transcription seule via Vosk /transcribe (sans prosodie ni feedback).
+    
+    Retourne {text, confidence, words, duration}; text vide si Vosk échoue.
     """
-    logger.info(f"🎭 Analyse narrative reçue - session: {session_id}, titre: {story_title}")
+    async with httpx.AsyncClient(
+        timeout=httpx_timeout,
+        transport=httpx_async_transport
+    ) as client:
+        try:
+            logger.info(f"🔗 Envoi vers Vosk STT: {VOSK_SERVICE_URL}/transcribe")
+            vosk_response = await post_upload_to_vosk(client, "/transcribe", audio)
+            
+            if vosk_response.status_code == 200:
+                vosk_result = vosk_response.json()
+                logger.info(f"✅ Transcription réussie: {vosk_result.get('text', '')[:100]}...")
+                return vosk_result
+            logger.warning(f"⚠️ Vosk STT erreur: {vosk_response.status_code}")
+        except Exception as e:
+            logger.error(f"❌ Erreur Vosk STT: {e}")
     
-    try:
-        # Préparer les données pour l'envoi vers Vosk STT
-        audio_content = await audio.read()
-        
-        # ✅ VALIDATION LOG: Vérifier la taille du fichier audio
-        audio_size = len(audio_content)
-        logger.info(f"📊 VALIDATION AUDIO - Taille: {audio_size} bytes, Nom: {audio.filename}")
-        
-        # ✅ CORRECTION : Validation assouplie de la taille du fichier
-        if audio_size < 100:  # Moins de 100 bytes = fichier invalide
-            logger.error(f"❌ FICHIER AUDIO INVALIDE - Taille: {audio_size} bytes (minimum 100 bytes requis)")
-            return {
-                "success": False,
-                "error": "INVALID_AUDIO_FILE",
-                "details": f"Fichier audio trop petit: {audio_size} bytes. Minimum requis: 100 bytes",
-                "session_id": session_id,
-                "timestamp": datetime.now().isoformat()
-            }
-        elif audio_size < 1000:
-            # ✅ NOUVEAU : Avertissement pour fichiers petits mais valides
-            logger.warning(f"⚠️ FICHIER AUDIO PETIT - Taille: {audio_size} bytes - Analyse avec prudence")
-        
-        # Log des détails audio
-        logger.info(f"✅ AUDIO VALIDE - Format: {audio.content_type}, Taille: {audio_size} bytes")
-        
-        # Étape 1: Transcription via Vosk
-        files = {"audio": (audio.filename, audio_content, audio.content_type)}
-        data = {
-            "scenario_type": "story_narration",
-            "scenario_context": f"Analyse narrative: {story_title}"
-        }
-        
-        transcription = ""
-        
-        async with httpx.AsyncClient(
-            timeout=httpx_timeout,
-            transport=httpx_async_transport
-        ) as client:
-            try:
-                logger.info(f"🔗 Envoi vers Vosk STT: {VOSK_SERVICE_URL}/analyze")
-                vosk_response = await client.post(
-                    f"{VOSK_SERVICE_URL}/analyze",
-                    files=files,
-                    data=data
-                )
-                
-                if vosk_response.status_code == 200:
-                    vosk_result = vosk_response.json()
-                    transcription = vosk_result.get("transcription", "")
-                    logger.info(f"✅ Transcription réussie: {transcription[:100]}...")
-                else:
-                    logger.warning(f"⚠️ Vosk STT erreur: {vosk_response.status_code}")
-                    transcription = "Transcription indisponible"
-                    
-            except Exception as e:
-                logger.error(f"❌ Erreur Vosk STT: {e}")
-                transcription = "Transcription indisponible"
-        
-        # Étape 2: Analyse narrative via Mistral AI
-        if transcription and transcription != "Transcription indisponible":
-            try:
-                # Parser les éléments d'histoire
-                elements_list = json.loads(story_elements) if story_elements else []
-                
-                # Créer le prompt d'analyse narrative
-                analysis_prompt = f"""Analysez cette histoire racontée oralement et retournez UNIQUEMENT un objet JSON valide avec cette structure exacte:
+    return {"text": "", "confidence": 0.0, "words": [], "duration": 0.0}
+
+def _parse_story_elements_form(story_elements: Optional[str]) -> List[str]:
+    return json.loads(story_elements) if story_elements else []
+
+def _build_story_analysis_payload(story_title: str, genre: str, elements_list: List[str], transcription: str) -> Dict[str, Any]:
+    analysis_prompt = f"""Analysez cette histoire racontée oralement et retournez UNIQUEMENT un objet JSON valide avec cette structure exacte:
 
 {{
     "overall_score": 0.8,
@@ -1759,116 +3458,149 @@ Transcription: {transcription}
 
 Analysez la créativité, l'utilisation des éléments, la cohérence narrative et la fluidité."""
 
-                mistral_payload = {
-                    "model": "mistral-nemo-instruct-2407",
-                    "messages": [{"role": "user", "content": analysis_prompt}],
-                    "temperature": 0.6,
-                    "max_tokens": 1000
-                }
-                
-                logger.info(f"🔗 Envoi vers Mistral AI: {MISTRAL_SERVICE_URL}/v1/chat/completions")
-                
-                # ✅ MONITORING CONNEXION MISTRAL
-                mistral_start_time = datetime.now()
-                logger.info(f"🔍 MISTRAL CONNEXION - Début: {mistral_start_time.isoformat()}")
-                
-                # ✅ UTILISATION DU SYSTÈME DE RETRY INTELLIGENT
-                mistral_response = await call_mistral_with_retry(mistral_payload)
-                
-                if mistral_response is None:
-                    logger.warning("⚠️ Mistral indisponible - Utilisation analyse Vosk seule")
-                    return _generate_vosk_only_analysis(session_id, story_title, transcription, elements_list)
-                
-                mistral_duration = (datetime.now() - mistral_start_time).total_seconds()
-                logger.info(f"⏱️ MISTRAL RESPONSE - Durée: {mistral_duration:.2f}s, Status: {mistral_response.status_code}")
-                
-                if mistral_response.status_code == 200:
-                    mistral_result = mistral_response.json()
-                    analysis_text = mistral_result.get("choices", [{}])[0].get("message", {}).get("content", "")
-                    
-                    # 🧠 SYSTÈME HYBRIDE INTELLIGENT : Analyse préliminaire du contenu
-                    transcription_clean = transcription.lower().strip()
-                    words = transcription_clean.split()
-                    
-                    # Détecter le contenu non significatif
-                    nonsense_patterns = [
-                        "bla", "blabla", "euh", "hum", "ah", "oh", "mmm",
-                        "test", "testing", "allo", "hello", "bonjour"
-                    ]
-                    
-                    nonsense_count = 0
-                    for word in words:
-                        if any(pattern in word for pattern in nonsense_patterns):
-                            nonsense_count += 1
-                    
-                    nonsense_ratio = nonsense_count / max(len(words), 1)
-                    
-                    logger.info(f"🔍 ANALYSE HYBRIDE - Ratio charabia: {nonsense_ratio:.2f}, Mots: {len(words)}")
-                    
-                    # Si le contenu est de qualité, utiliser Mistral IA + ajustements intelligents
-                    if len(words) >= 5 and nonsense_ratio < 0.3:
-                        logger.info("✅ Contenu de qualité détecté - Utilisation Mistral + ajustements")
-                        
-                        # Parser le JSON de l'analyse Mistral
-                        try:
-                            # Nettoyer le texte pour extraire le JSON
-                            if "```json" in analysis_text:
-                                analysis_text = analysis_text.split("```json")[1].split("```")[0]
-                            elif "```" in analysis_text:
-                                analysis_text = analysis_text.split("```")[1]
-                            
-                            mistral_analysis = json.loads(analysis_text.strip())
-                            
-                            # Appliquer des ajustements intelligents aux scores Mistral
-                            adjusted_analysis = _apply_intelligent_adjustments(
-                                mistral_analysis, transcription, elements_list, nonsense_ratio
-                            )
-                            
-                            logger.info("✅ Analyse Mistral + ajustements intelligents appliquée")
-                            
-                            # Construire la réponse finale avec Mistral amélioré
-                            return {
-                                "success": True,
-                                "analysis": adjusted_analysis,
-                                "transcription": transcription,
-                                "session_id": session_id,
-                                "story_title": story_title,
-                                "genre": genre,
-                                "elements": elements_list,
-                                "analysis_method": "mistral_intelligent",
-                                "content_quality": "good",
-                                "timestamp": datetime.now().isoformat()
-                            }
-                            
-                        except json.JSONDecodeError as e:
-                            logger.error(f"❌ Erreur parsing JSON Mistral: {e}")
-                            # Fallback vers analyse intelligente
-                            return _generate_fallback_narrative_analysis(
-                                session_id, story_title, transcription, elements_list
-                            )
-                    else:
-                        # Contenu de mauvaise qualité ou charabia - utiliser analyse intelligente
-                        logger.info(f"⚠️ Contenu de mauvaise qualité détecté (ratio: {nonsense_ratio:.2f}) - Utilisation analyse intelligente")
-                        return _generate_fallback_narrative_analysis(
-                            session_id, story_title, transcription, elements_list
-                        )
-                else:
-                    logger.error(f"❌ Mistral AI erreur: {mistral_response.status_code}")
-                    return _generate_fallback_narrative_analysis(
-                        session_id, story_title, transcription, elements_list
-                    )
-                    
-            except Exception as e:
-                logger.error(f"❌ Erreur analyse Mistral: {e}")
-                return _generate_fallback_narrative_analysis(
-                    session_id, story_title, transcription, elements_list
-                )
-        else:
+    return {
+        "model": "mistral-nemo-instruct-2407",
+        "messages": [{"role": "user", "content": analysis_prompt}],
+        "temperature": 0.6,
+        "max_tokens": 1000
+    }
+
+def _story_content_is_meaningful(transcription: str) -> Tuple[bool, float]:
+    """Pré-filtre local: évite l'appel Mistral sur du charabia ou un contenu trop court"""
+    words = transcription.lower().strip().split()
+    nonsense_ratio = _story_nonsense_ratio(words)
+    logger.info(f"🔍 ANALYSE HYBRIDE - Ratio charabia: {nonsense_ratio:.2f}, Mots: {len(words)}")
+    return len(words) >= 5 and nonsense_ratio < 0.3, nonsense_ratio
+
+def _finalize_story_analysis(
+    analysis_text: str,
+    session_id: str,
+    story_title: str,
+    genre: str,
+    transcription: str,
+    elements_list: List[str],
+    nonsense_ratio: float
+) -> Dict[str, Any]:
+    """Parse la réponse Mistral et applique les ajustements intelligents (fallback local sinon)"""
+    try:
+        # Nettoyer le texte pour extraire le JSON
+        if "```json" in analysis_text:
+            analysis_text = analysis_text.split("```json")[1].split("```")[0]
+        elif "```" in analysis_text:
+            analysis_text = analysis_text.split("```")[1]
+        
+        mistral_analysis = json.loads(analysis_text.strip())
+    except json.JSONDecodeError as e:
+        logger.error(f"❌ Erreur parsing JSON Mistral: {e}")
+        return _generate_fallback_narrative_analysis(session_id, story_title, transcription, elements_list)
+    
+    adjusted_analysis = _apply_intelligent_adjustments(
+        mistral_analysis, transcription, elements_list, nonsense_ratio
+    )
+    logger.info("✅ Analyse Mistral + ajustements intelligents appliquée")
+    
+    return {
+        "success": True,
+        "analysis": adjusted_analysis,
+        "transcription": transcription,
+        "session_id": session_id,
+        "story_title": story_title,
+        "genre": genre,
+        "elements": elements_list,
+        "analysis_method": "mistral_intelligent",
+        "content_quality": "good",
+        "timestamp": datetime.now().isoformat()
+    }
+
+@app.post("/api/story/analyze-narrative")
+async def analyze_story_narrative(
+    request: Request,
+    response: Response,
+    audio: UploadFile = File(...),
+    session_id: str = Form(...),
+    story_title: Optional[str] = Form("Histoire sans titre"),
+    story_elements: Optional[str] = Form("[]"),
+    genre: Optional[str] = Form("libre"),
+    async_job: Optional[bool] = Form(False),
+    user_id: Optional[str] = Form(None)
+):
+    """
+    Endpoint d'analyse narrative pour le générateur d'histoires
+    Flux: Audio → Vosk STT (transcription seule) → Mistral AI → Analyse structurée
+    Idempotent: les requêtes dupliquées partagent le même calcul.
+    Avec async_job=true, retourne immédiatement un job_id (HTTP 202).
+    """
+    logger.info(f"🎭 Analyse narrative reçue - session: {session_id}, titre: {story_title}")
+    error_response = _validate_story_audio(audio, session_id)
+    if error_response:
+        return error_response
+    
+    key = await _idempotency_key(request, "story_narrative", audio, {
+        "session_id": session_id, "story_title": story_title,
+        "story_elements": story_elements, "genre": genre
+    }, user_id)
+    # Le rejeu d'un résultat déjà calculé ne consomme pas de jeton
+    if not _idempotent_result_exists(key):
+        enforce_rate_limit(request, "story", "story_narration", user_id)
+    
+    compute = lambda upload: _analyze_story_narrative_content(upload, session_id, story_title, story_elements, genre)
+    if async_job:
+        return await submit_analysis_job("story_narrative", key, session_id, response, compute, audio)
+    return await run_idempotent(key, response, compute, audio)
+
+async def _analyze_story_narrative_content(
+    audio: UploadFile,
+    session_id: str,
+    story_title: str,
+    story_elements: Optional[str],
+    genre: str
+) -> Dict[str, Any]:
+    """Transcription Vosk puis analyse Mistral, avec repli sur l'analyse locale"""
+    try:
+        # Étape 1: Transcription via Vosk
+        transcription = (await _transcribe_story_audio(audio)).get("text", "")
+        elements_list = _parse_story_elements_form(story_elements)
+        
+        if not transcription:
             # Pas de transcription, utiliser fallback
-            elements_list = json.loads(story_elements) if story_elements else []
             return _generate_fallback_narrative_analysis(
                 session_id, story_title, "Transcription indisponible", elements_list
             )
+        
+        # Contenu de mauvaise qualité ou charabia: analyse locale sans appel Mistral
+        meaningful, nonsense_ratio = _story_content_is_meaningful(transcription)
+        if not meaningful:
+            logger.info(f"⚠️ Contenu de mauvaise qualité détecté (ratio: {nonsense_ratio:.2f}) - Utilisation analyse intelligente")
+            return _generate_fallback_narrative_analysis(session_id, story_title, transcription, elements_list)
+        
+        # Étape 2: Analyse narrative via Mistral AI
+        try:
+            logger.info(f"🔗 Envoi vers Mistral AI: {MISTRAL_SERVICE_URL}/v1/chat/completions")
+            mistral_start_time = datetime.now()
+            
+            mistral_response = await call_mistral_with_retry(
+                _build_story_analysis_payload(story_title, genre, elements_list, transcription)
+            )
+            
+            if mistral_response is None:
+                logger.warning("⚠️ Mistral indisponible - Utilisation analyse Vosk seule")
+                return _generate_vosk_only_analysis(session_id, story_title, transcription, elements_list)
+            
+            mistral_duration = (datetime.now() - mistral_start_time).total_seconds()
+            logger.info(f"⏱️ MISTRAL RESPONSE - Durée: {mistral_duration:.2f}s, Status: {mistral_response.status_code}")
+            
+            if mistral_response.status_code != 200:
+                logger.error(f"❌ Mistral AI erreur: {mistral_response.status_code}")
+                return _generate_fallback_narrative_analysis(session_id, story_title, transcription, elements_list)
+            
+            analysis_text = mistral_response.json().get("choices", [{}])[0].get("message", {}).get("content", "")
+            return _finalize_story_analysis(
+                analysis_text, session_id, story_title, genre, transcription, elements_list, nonsense_ratio
+            )
+                
+        except Exception as e:
+            logger.error(f"❌ Erreur analyse Mistral: {e}")
+            return _generate_fallback_narrative_analysis(session_id, story_title, transcription, elements_list)
             
     except Exception as e:
         logger.error(f"❌ Erreur générale analyse narrative: {e}")
@@ -1877,21 +3609,161 @@ Analysez la créativité, l'utilisation des éléments, la cohérence narrative
             detail=f"Erreur d'analyse narrative: {str(e)}"
         )
 
-@app.post("/api/story/generate-elements")
-async def generate_story_elements(
-    element_type: str = Form(...),
-    theme: Optional[str] = Form("libre"),
-    difficulty: Optional[str] = Form("facile"),
-    count: Optional[int] = Form(3)
+def _format_story_stream_event(event: Dict[str, Any], stream_format: str) -> str:
+    payload = json.dumps(event, ensure_ascii=False)
+    if stream_format == "sse":
+        return f"event: {event['event']}\ndata: {payload}\n\n"
+    return f"{payload}\n"
+
+async def _stream_mistral_content(payload: Dict[str, Any]):
+    """
+    Itère sur les fragments de texte produits par Mistral.
+    
+    En mode streaming (STORY_ANALYSIS_STREAM_LLM), relaie les deltas SSE du
+    service; sinon produit la réponse complète en un seul fragment.
+    """
+    if not STORY_ANALYSIS_STREAM_LLM:
+        mistral_response = await call_mistral_with_retry(payload)
+        if mistral_response is None or mistral_response.status_code != 200:
+            raise RuntimeError(f"Mistral indisponible: {mistral_response.status_code if mistral_response else 'No response'}")
+        yield mistral_response.json().get("choices", [{}])[0].get("message", {}).get("content", "")
+        return
+    
+    async with httpx.AsyncClient(
+        timeout=httpx.Timeout(connect=5.0, read=MISTRAL_STREAM_READ_TIMEOUT, write=10.0, pool=2.0),
+        transport=httpx_async_transport
+    ) as mistral_client:
+        async with mistral_client.stream(
+            "POST", f"{MISTRAL_SERVICE_URL}/v1/chat/completions", json=dict(payload, stream=True),
+            headers=_mistral_batch_headers(MISTRAL_STREAM_READ_TIMEOUT)
+        ) as response:
+            if response.status_code != 200:
+                raise RuntimeError(f"Mistral HTTP {response.status_code}")
+            async for line in response.aiter_lines():
+                if not line.startswith("data:"):
+                    continue
+                data = line[len("data:"):].strip()
+                if data == "[DONE]":
+                    break
+                # Le dernier fragment ne porte que l'usage (choices vide)
+                choices = json.loads(data).get("choices") or [{}]
+                delta = choices[0].get("delta", {}).get("content")
+                if delta:
+                    yield delta
+
+@app.post("/api/story/analyze-narrative/stream")
+async def analyze_story_narrative_stream(
+    request: Request,
+    audio: UploadFile = File(...),
+    session_id: str = Form(...),
+    story_title: Optional[str] = Form("Histoire sans titre"),
+    story_elements: Optional[str] = Form("[]"),
+    genre: Optional[str] = Form("libre"),
+    stream_format: Optional[str] = Form("ndjson"),
+    user_id: Optional[str] = Form(None)
 ):
     """
-    Endpoint de génération d'éléments narratifs
+    Variante streamée de l'analyse narrative (NDJSON ou SSE).
+    
+    Événements: transcription → heuristic_scores (analyse locale immédiate)
+    → analysis_delta (si streaming LLM actif) → analysis (résultat final).
     """
-    logger.info(f"🎭 Génération éléments - type: {element_type}, thème: {theme}")
+    logger.info(f"🎭 Analyse narrative streamée - session: {session_id}, titre: {story_title}")
+    enforce_rate_limit(request, "story", "story_narration", user_id)
     
-    try:
-        # Créer le prompt de génération
-        generation_prompt = f"""Générez {count} {element_type}s pour une histoire.
+    error_response = _validate_story_audio(audio, session_id)
+    if error_response:
+        return error_response
+    elements_list = _parse_story_elements_form(story_elements)
+    stream_format = "sse" if stream_format == "sse" else "ndjson"
+    
+    # Le flux est produit après la requête: l'UploadFile d'origine sera fermé
+    stream_audio = await _detach_upload(audio)
+    
+    async def event_stream():
+        try:
+            vosk_result = await _transcribe_story_audio(stream_audio)
+        finally:
+            await stream_audio.close()
+        transcription = vosk_result.get("text", "")
+        yield _format_story_stream_event({
+            "event": "transcription",
+            "session_id": session_id,
+            "transcription": transcription or "Transcription indisponible",
+            "confidence": vosk_result.get("confidence", 0.0),
+            "duration": vosk_result.get("duration", 0.0)
+        }, stream_format)
+        
+        heuristic_result = _generate_fallback_narrative_analysis(
+            session_id, story_title, transcription or "Transcription indisponible", elements_list
+        )
+        yield _format_story_stream_event(dict(heuristic_result, event="heuristic_scores"), stream_format)
+        
+        meaningful, nonsense_ratio = _story_content_is_meaningful(transcription) if transcription else (False, 1.0)
+        if not meaningful:
+            # L'analyse locale est définitive: rien à attendre de Mistral
+            yield _format_story_stream_event(dict(heuristic_result, event="analysis"), stream_format)
+            return
+        
+        analysis_text = ""
+        try:
+            async for delta in _stream_mistral_content(
+                _build_story_analysis_payload(story_title, genre, elements_list, transcription)
+            ):
+                analysis_text += delta
+                if STORY_ANALYSIS_STREAM_LLM:
+                    yield _format_story_stream_event({"event": "analysis_delta", "delta": delta}, stream_format)
+            final_result = _finalize_story_analysis(
+                analysis_text, session_id, story_title, genre, transcription, elements_list, nonsense_ratio
+            )
+        except Exception as e:
+            logger.warning(f"⚠️ Mistral indisponible - Utilisation analyse Vosk seule: {e}")
+            final_result = _generate_vosk_only_analysis(session_id, story_title, transcription, elements_list)
+        
+        yield _format_story_stream_event(dict(final_result, event="analysis"), stream_format)
+    
+    media_type = "text/event-stream" if stream_format == "sse" else "application/x-ndjson"
+    return StreamingResponse(event_stream(), media_type=media_type)
+
+# ============================================
+# Réserve d'éléments narratifs pré-générés
+# ============================================
+
+# Compteurs locaux et buckets en attente de réapprovisionnement
+story_pool_stats = {"served_from_pool": 0, "served_generated": 0, "served_fallback": 0, "refill_batches": 0}
+story_pool_pending: set = set()
+story_pool_refill_event = asyncio.Event()
+story_pool_refill_task: Optional[asyncio.Task] = None
+
+def _story_pool_params(theme: Optional[str], difficulty: Optional[str]) -> Tuple[str, str]:
+    """Thème et difficulté ramenés à la liste blanche (valeur inconnue -> libre / facile)"""
+    theme_key = (theme or "libre").strip().lower().replace("-", "").replace(" ", "")
+    return (
+        theme_key if theme_key in STORY_POOL_THEMES else "libre",
+        STORY_POOL_DIFFICULTIES.get((difficulty or "facile").strip().lower(), "facile")
+    )
+
+def _story_pool_bucket(element_type: str, theme: str, difficulty: str) -> str:
+    return f"{element_type}:{theme}:{difficulty}"
+
+def _story_element_identity(element: Dict[str, Any]) -> str:
+    return str(element.get("name", "")).strip().lower()
+
+def _parse_story_elements_content(content: str) -> List[Dict[str, Any]]:
+    """Extrait la liste d'éléments du JSON renvoyé par Mistral (lève JSONDecodeError)"""
+    if "```json" in content:
+        content = content.split("```json")[1].split("```")[0]
+    elif "```" in content:
+        content = content.split("```")[1]
+    
+    elements = json.loads(content.strip()).get("elements", [])
+    return [element for element in elements if isinstance(element, dict) and element.get("name")]
+
+async def _generate_story_elements_batch(
+    element_type: str, theme: str, difficulty: str, count: int
+) -> Optional[List[Dict[str, Any]]]:
+    """Génère un lot d'éléments en un seul appel Mistral (None en cas d'échec)"""
+    generation_prompt = f"""Générez {count} {element_type}s pour une histoire.
         
 Thème: {theme}
 Difficulté: {difficulty}
@@ -1908,49 +3780,199 @@ Retournez UNIQUEMENT un objet JSON valide avec cette structure:
     ]
 }}
 
+Tous les noms doivent être différents.
 Adaptez le vocabulaire à la difficulté {difficulty}."""
 
-        mistral_payload = {
-            "model": "mistral-nemo-instruct-2407",
-            "messages": [{"role": "user", "content": generation_prompt}],
-            "temperature": 0.8,
-            "max_tokens": 800
-        }
-        
-        # ✅ CORRECTION CRITIQUE : Utiliser le système de retry intelligent
-        mistral_response = await call_mistral_with_retry(mistral_payload)
+    mistral_payload = {
+        "model": "mistral-nemo-instruct-2407",
+        "messages": [{"role": "user", "content": generation_prompt}],
+        "temperature": 0.8,
+        # ~90 tokens par élément, comme les 800 tokens historiques pour quelques éléments
+        "max_tokens": max(800, 90 * count)
+    }
+    
+    mistral_response = await call_mistral_with_retry(mistral_payload)
+    if not mistral_response or mistral_response.status_code != 200:
+        logger.error(f"❌ Mistral génération erreur: {mistral_response.status_code if mistral_response else 'No response'}")
+        return None
+    
+    content = mistral_response.json().get("choices", [{}])[0].get("message", {}).get("content", "")
+    try:
+        return _parse_story_elements_content(content)
+    except (json.JSONDecodeError, AttributeError):
+        logger.error(f"❌ Erreur parsing JSON génération: {content}")
+        return None
+
+def _add_to_story_pool(bucket: str, elements: List[Dict[str, Any]]) -> int:
+    """Ajoute des éléments puis purge ceux trop anciens et l'excédent (les plus anciens d'abord)"""
+    if not elements:
+        return 0
+    pool_key = f"{STORY_POOL_PREFIX}{bucket}"
+    now = time.time()
+    pipe = redis_client.pipeline()
+    pipe.zadd(
+        pool_key,
+        {json.dumps(element, ensure_ascii=False, sort_keys=True): now for element in elements},
+        nx=True
+    )
+    pipe.zremrangebyscore(pool_key, "-inf", now - STORY_POOL_MAX_AGE)
+    pipe.zremrangebyrank(pool_key, 0, -STORY_POOL_MAX_SIZE - 1)
+    pipe.expire(pool_key, STORY_POOL_MAX_AGE)
+    return pipe.execute()[0]
+
+def _draw_from_story_pool(bucket: str, count: int, user_id: Optional[str]) -> Tuple[List[Dict[str, Any]], int]:
+    """
+    Tire au hasard des éléments de la réserve sans les retirer (ZRANDMEMBER).
+    
+    Les éléments inédits pour l'utilisateur passent en premier; s'il a tout vu,
+    des éléments déjà présentés complètent le tirage (le réapprovisionnement
+    reste en tâche de fond). Retourne (éléments servis, nombre d'éléments
+    encore inédits pour cet utilisateur).
+    """
+    pool_key = f"{STORY_POOL_PREFIX}{bucket}"
+    seen_key = f"{STORY_POOL_SEEN_PREFIX}{user_id}:{bucket}" if user_id else None
+    
+    pipe = redis_client.pipeline()
+    pipe.zremrangebyscore(pool_key, "-inf", time.time() - STORY_POOL_MAX_AGE)
+    pipe.zcard(pool_key)
+    if seen_key:
+        pipe.smembers(seen_key)
+    results = pipe.execute()
+    size = results[1]
+    seen: set = results[2] if seen_key else set()
+    
+    # Échantillon assez large pour contenir `count` inédits même si l'utilisateur a déjà beaucoup vu
+    sample = min(size, count + len(seen)) if size else 0
+    candidates = redis_client.zrandmember(pool_key, sample) if sample else []
+    
+    drawn: List[Dict[str, Any]] = []
+    repeats: List[Dict[str, Any]] = []
+    for raw in candidates or []:
+        element = json.loads(raw)
+        identity = _story_element_identity(element)
+        if identity not in seen:
+            drawn.append(element)
+            seen.add(identity)
+            if len(drawn) >= count:
+                break
+        else:
+            repeats.append(element)
+    
+    unseen = size - len(seen) if seen_key else size
+    drawn.extend(repeats[:count - len(drawn)])
+    return drawn, max(0, unseen)
+
+def _mark_story_elements_seen(bucket: str, user_id: Optional[str], elements: List[Dict[str, Any]]):
+    if not user_id or not elements:
+        return
+    seen_key = f"{STORY_POOL_SEEN_PREFIX}{user_id}:{bucket}"
+    pipe = redis_client.pipeline()
+    pipe.sadd(seen_key, *[_story_element_identity(element) for element in elements])
+    pipe.expire(seen_key, STORY_POOL_SEEN_TTL)
+    pipe.execute()
+
+def _schedule_story_pool_refill(element_type: str, theme: str, difficulty: str):
+    story_pool_pending.add((element_type, theme, difficulty))
+    story_pool_refill_event.set()
+
+async def _refill_story_pool_bucket(element_type: str, theme: str, difficulty: str):
+    """Remonte un bucket jusqu'à STORY_POOL_TARGET_SIZE par lots de STORY_POOL_BATCH_SIZE"""
+    bucket = _story_pool_bucket(element_type, theme, difficulty)
+    lock_key = f"{STORY_POOL_LOCK_PREFIX}{bucket}"
+    
+    # Un seul worker réapprovisionne un bucket donné à la fois
+    lock_token = f"{WORKER_ID}:{uuid.uuid4().hex}"
+    if not redis_client.set(lock_key, lock_token, nx=True, ex=120):
+        return
+    
+    try:
+        deficit = STORY_POOL_TARGET_SIZE - redis_client.zcard(f"{STORY_POOL_PREFIX}{bucket}")
+        for _ in range(math.ceil(max(0, deficit) / STORY_POOL_BATCH_SIZE)):
+            elements = await _generate_story_elements_batch(element_type, theme, difficulty, STORY_POOL_BATCH_SIZE)
+            if not elements:
+                break
+            added = _add_to_story_pool(bucket, elements)
+            story_pool_stats["refill_batches"] += 1
+            logger.info(f"📦 Réserve {bucket}: +{added} éléments")
+    finally:
+        # Le verrou a pu expirer et être repris par un autre worker pendant la génération
+        release_lock_script(keys=[lock_key], args=[lock_token])
+
+async def _story_pool_refill_worker():
+    """Tâche de fond: traite les buckets passés sous le seuil bas"""
+    while True:
+        try:
+            await asyncio.wait_for(story_pool_refill_event.wait(), timeout=STORY_POOL_REFILL_INTERVAL)
+        except asyncio.TimeoutError:
+            pass
+        story_pool_refill_event.clear()
         
-        if mistral_response and mistral_response.status_code == 200:
-            mistral_result = mistral_response.json()
-            content = mistral_result.get("choices", [{}])[0].get("message", {}).get("content", "")
-            
-            # Parser le JSON
+        while story_pool_pending:
+            bucket = story_pool_pending.pop()
             try:
-                if "```json" in content:
-                    content = content.split("```json")[1].split("```")[0]
-                elif "```" in content:
-                    content = content.split("```")[1]
-                
-                elements_data = json.loads(content.strip())
-                
-                return {
-                    "success": True,
-                    "elements": elements_data.get("elements", []),
-                    "element_type": element_type,
-                    "theme": theme,
-                    "difficulty": difficulty,
-                    "timestamp": datetime.now().isoformat()
-                }
-                
-            except json.JSONDecodeError:
-                logger.error(f"❌ Erreur parsing JSON génération: {content}")
+                await _refill_story_pool_bucket(*bucket)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"❌ Erreur réapprovisionnement réserve {bucket}: {e}")
+
+@app.post("/api/story/generate-elements")
+async def generate_story_elements(
+    element_type: str = Form(...),
+    theme: Optional[str] = Form("libre"),
+    difficulty: Optional[str] = Form("facile"),
+    count: Optional[int] = Form(3),
+    user_id: Optional[str] = Form(None)
+):
+    """
+    Endpoint de génération d'éléments narratifs.
+    
+    Sert les éléments depuis la réserve Redis pré-générée; la génération
+    Mistral directe n'intervient que si le bucket est vide. Un utilisateur
+    qui a tout vu reçoit des éléments déjà présentés, jamais un appel LLM bloquant.
+    """
+    logger.info(f"🎭 Génération éléments - type: {element_type}, thème: {theme}")
+    theme, difficulty = _story_pool_params(theme, difficulty)
+    count = max(1, min(count or STORY_ELEMENTS_MAX_COUNT, STORY_ELEMENTS_MAX_COUNT))
+    if element_type not in STORY_POOL_ELEMENT_TYPES:
+        story_pool_stats["served_fallback"] += 1
+        return _generate_fallback_elements(element_type, count)
+    bucket = _story_pool_bucket(element_type, theme, difficulty)
+    
+    try:
+        elements, remaining = _draw_from_story_pool(bucket, count, user_id)
+        if remaining < STORY_POOL_LOW_WATERMARK:
+            _schedule_story_pool_refill(element_type, theme, difficulty)
+        
+        source = "pool"
+        if not elements:
+            # Réserve vide (bucket froid): génération directe d'un lot complet
+            generated = await _generate_story_elements_batch(
+                element_type, theme, difficulty, STORY_POOL_BATCH_SIZE
+            )
+            if not generated:
+                story_pool_stats["served_fallback"] += 1
                 return _generate_fallback_elements(element_type, count)
-        else:
-            logger.error(f"❌ Mistral génération erreur: {mistral_response.status_code if mistral_response else 'No response'}")
-            return _generate_fallback_elements(element_type, count)
+            
+            elements = generated[:count]
+            _add_to_story_pool(bucket, generated)
+            source = "generated"
+        
+        _mark_story_elements_seen(bucket, user_id, elements)
+        story_pool_stats["served_from_pool" if source == "pool" else "served_generated"] += 1
+        return {
+            "success": True,
+            "elements": elements,
+            "element_type": element_type,
+            "theme": theme,
+            "difficulty": difficulty,
+            "source": source,
+            "timestamp": datetime.now().isoformat()
+        }
                 
     except Exception as e:
         logger.error(f"❌ Erreur génération éléments: {e}")
+        story_pool_stats["served_fallback"] += 1
         return _generate_fallback_elements(element_type, count)
 
 def _apply_intelligent_adjustments(mistral_analysis: Dict[str, Any], transcription: str, elements: List[str], nonsense_ratio: float) -> Dict[str, Any]:
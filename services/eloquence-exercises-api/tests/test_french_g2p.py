@@ -0,0 +1,34 @@
+"""
+Cas de référence de la conversion graphème -> phonème française (_french_g2p)
+"""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import _french_g2p  # noqa: E402
+
+
+@pytest.mark.parametrize("word, expected", [
+    # -et / -ets: e ouvert, consonnes finales muettes
+    ("sachets", "saʃɛ"),
+    ("poulets", "pulɛ"),
+    ("jouet", "ʒuɛ"),
+    # -ent verbal muet, e ouvert devant nn
+    ("tiennent", "tjɛn"),
+    ("parlent", "paʁl"),
+    ("trottaient", "tʁotɛ"),
+    # nasale conservée en fin de mot
+    ("chien", "ʃjɛ̃"),
+    # lexique prioritaire sur les règles
+    ("et", "e"),
+    ("client", "klijɑ̃"),
+    # g doux devant e muet, s sonore entre voyelles
+    ("rouge", "ʁuʒ"),
+    ("seize", "sɛz"),
+    ("sèches", "sɛʃ"),
+])
+def test_french_g2p(word, expected):
+    assert "".join(_french_g2p(word)) == expected
@@ -178,52 +178,23 @@ Réponds MAINTENANT :"""
         except Exception as e:
             logger.debug(f"⚠️ LLM Optimizer non disponible: {e}")
 
-        # ESSAI 2: OpenAI direct (si disponible)
+        # ESSAI 2: Routeur partagé (OpenAI puis couverture Mistral au-delà du p90)
         try:
-            openai_key = os.getenv('OPENAI_API_KEY')
-            if openai_key:
-                import openai as openai_client
-                client = openai_client.OpenAI(api_key=openai_key)
-                
-                response = await asyncio.wait_for(
-                    client.chat.completions.create(
-                        model="gpt-3.5-turbo",
-                        messages=[{"role": "system", "content": prompt}],
-                        temperature=0.8,
-                        max_tokens=50,  # Réduit pour plus de rapidité
-                    ),
-                    timeout=1.2,  # Réduit de 2.0 à 1.2s
-                )
-                return response.choices[0].message.content
-        except Exception as e:
-            logger.debug(f"⚠️ OpenAI direct non disponible: {e}")
+            from llm_router import get_llm_router
 
-        # ESSAI 3: Mistral (si disponible)
-        try:
-            mistral_url = os.getenv('MISTRAL_BASE_URL')
-            mistral_key = os.getenv('MISTRAL_API_KEY')
-            if mistral_url and mistral_key:
-                import aiohttp
-                async with aiohttp.ClientSession() as session:
-                    async with session.post(
-                        mistral_url,
-                        headers={
-                            "Authorization": f"Bearer {mistral_key}",
-                            "Content-Type": "application/json"
-                        },
-                        json={
-                            "model": "mistral-small-latest",
-                            "messages": [{"role": "system", "content": prompt}],
-                            "max_tokens": 70,
-                            "temperature": 0.7
-                        },
-                        timeout=aiohttp.ClientTimeout(total=2.0)
-                    ) as resp:
-                        if resp.status == 200:
-                            data = await resp.json()
-                            return data['choices'][0]['message']['content']
+            response = await asyncio.wait_for(
+                get_llm_router().complete(
+                    [{"role": "system", "content": prompt}],
+                    max_tokens=config.get('max_tokens', 50),
+                    temperature=config.get('temperature', 0.7),
+                    models={'openai': 'gpt-3.5-turbo', 'mistral': 'mistral-small-latest'}
+                ),
+                timeout=2.0,
+            )
+            if response:
+                return response
         except Exception as e:
-            logger.debug(f"⚠️ Mistral non disponible: {e}")
+            logger.debug(f"⚠️ Routeur LLM non disponible: {e}")
 
         # FALLBACK FINAL: Réponse d'urgence
         logger.warning("🆘 Utilisation du fallback d'urgence pour LLM")
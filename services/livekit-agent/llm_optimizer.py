@@ -1,29 +1,207 @@
 """
-Optimiseur LLM avec cache Redis et sélection intelligente des modèles
+Optimiseur LLM avec cache à deux niveaux (mémoire + Redis) et sélection intelligente des modèles
 Réduit les coûts tout en maintenant la qualité
 """
 import os
 import json
+import time
+import asyncio
+import re
 import hashlib
 import logging
-from typing import Dict, Any, Optional, List
+import unicodedata
+from collections import OrderedDict
+from typing import AsyncIterator, Dict, Any, Optional, List
 from datetime import datetime, timedelta
-import redis
+import redis.asyncio as aioredis
 from livekit.plugins import openai
-import openai as openai_client
+from openai import AsyncOpenAI
 
 logger = logging.getLogger(__name__)
 
+# Niveau mémoire du cache (devant Redis)
+LOCAL_CACHE_MAX_ENTRIES = int(os.getenv('LLM_LOCAL_CACHE_SIZE', '512'))
+LOCAL_CACHE_MAX_TTL = int(os.getenv('LLM_LOCAL_CACHE_MAX_TTL', '300'))
+# Prompts en échec: pas de nouvel appel pendant ce délai (secondes)
+NEGATIVE_CACHE_TTL = float(os.getenv('LLM_NEGATIVE_CACHE_TTL', '10'))
+# Stale-while-revalidate réservé aux tâches à basse température (réponses stables)
+STALE_WHILE_REVALIDATE_MAX_TEMPERATURE = float(os.getenv('LLM_SWR_MAX_TEMPERATURE', '0.5'))
+STALE_WHILE_REVALIDATE_GRACE = int(os.getenv('LLM_SWR_GRACE', '600'))
+
+# Cache de quasi-doublons (SimHash 64 bits, index par bandes); seuils de similarité
+# par type de tâche cacheable, surchargeables via LLM_NEAR_DUPLICATE_THRESHOLDS (JSON).
+# Les réactions exigent un quasi-recopiage: une affirmation et son contraire
+# ("améliore" / "détruit") peuvent atteindre 0.88.
+SIMHASH_BITS = 64
+SIMHASH_BANDS = 8  # 8 bandes de 8 bits: tout voisin à distance < 8 partage au moins une bande
+# En dessous de ce seuil, l'index par bandes ne retrouve pas toutes les entrées éligibles
+NEAR_DUPLICATE_MIN_THRESHOLD = 1 - (SIMHASH_BANDS - 1) / SIMHASH_BITS
+NEAR_DUPLICATE_THRESHOLDS: Dict[str, float] = {
+    name: max(NEAR_DUPLICATE_MIN_THRESHOLD, float(threshold))
+    for name, threshold in {
+        'reaction': 0.95,
+        'filler': 0.9,
+        'encouragement': 0.9,
+        **json.loads(os.getenv('LLM_NEAR_DUPLICATE_THRESHOLDS', '{}'))
+    }.items()
+}
+NEAR_DUPLICATE_MAX_ENTRIES = int(os.getenv('LLM_NEAR_DUPLICATE_SIZE', '1024'))
+
+# Champs volatils des prompts complets (horodatages, durée écoulée) neutralisés avant signature
+VOLATILE_PROMPT_FIELDS = (
+    (re.compile(r'\d{4}-\d{2}-\d{2}[t ]\d{2}:\d{2}(:\d{2}(\.\d+)?)?'), '0'),
+    (re.compile(r'\b\d{1,2}[:h]\d{2}(:\d{2})?\b'), '0'),
+    (re.compile(r'(duree ecoulee\W+)\d+'), r'\g<1>0'),
+)
+
+
+class LocalTTLCache:
+    """LRU en mémoire avec TTL; une entrée expirée reste servable pendant sa période de grâce"""
+    
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+    
+    def get(self, key: str) -> Optional[tuple]:
+        """Retourne (valeur, périmée) ou None"""
+        entry = self._entries.get(key)
+        if not entry:
+            return None
+        fresh_until, stale_until, value = entry
+        now = time.monotonic()
+        if now >= stale_until:
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value, now >= fresh_until
+    
+    def set(self, key: str, value: Dict[str, Any], ttl: float, stale_grace: float = 0.0):
+        now = time.monotonic()
+        self._entries[key] = (now + ttl, now + ttl + stale_grace, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+    
+    def __len__(self) -> int:
+        return len(self._entries)
+
+def normalize_prompt(text: str) -> str:
+    """
+    Texte canonique pour la signature: minuscules, sans accents.
+    
+    Les nombres sont conservés ("50%" et "5%" ne sont pas la même affirmation);
+    seuls les horodatages et la durée écoulée, qui varient d'un appel à l'autre
+    sans changer le sens, sont neutralisés.
+    """
+    text = unicodedata.normalize('NFKD', text.lower())
+    text = ''.join(char for char in text if not unicodedata.combining(char))
+    for pattern, replacement in VOLATILE_PROMPT_FIELDS:
+        text = pattern.sub(replacement, text)
+    return re.sub(r'[^\w]+', ' ', text).strip()
+
+
+def simhash(text: str) -> int:
+    """SimHash 64 bits sur les mots et les trigrammes de mots du texte normalisé"""
+    words = normalize_prompt(text).split()
+    features = words + [' '.join(words[i:i + 3]) for i in range(len(words) - 2)]
+    weights = [0] * SIMHASH_BITS
+    for feature in features:
+        digest = int.from_bytes(hashlib.blake2b(feature.encode('utf-8'), digest_size=8).digest(), 'big')
+        for bit in range(SIMHASH_BITS):
+            weights[bit] += 1 if digest >> bit & 1 else -1
+    return sum(1 << bit for bit in range(SIMHASH_BITS) if weights[bit] > 0)
+
+
+class NearDuplicateIndex:
+    """
+    Index local de réponses par signature SimHash.
+    
+    Les signatures sont découpées en bandes: seules les entrées partageant une
+    bande (dans le même périmètre) sont comparées, puis retenues si leur
+    similarité (1 - distance de Hamming / 64) atteint le seuil demandé.
+    """
+    
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[tuple, tuple]" = OrderedDict()  # (périmètre, signature) -> (expiration, valeur)
+        self._buckets: Dict[tuple, set] = {}
+    
+    @staticmethod
+    def _bands(signature: int) -> List[int]:
+        width = SIMHASH_BITS // SIMHASH_BANDS
+        return [signature >> (band * width) & ((1 << width) - 1) for band in range(SIMHASH_BANDS)]
+    
+    def _remove(self, entry_key: tuple):
+        self._entries.pop(entry_key, None)
+        scope, signature = entry_key
+        for band, value in enumerate(self._bands(signature)):
+            bucket = self._buckets.get((scope, band, value))
+            if bucket is not None:
+                bucket.discard(entry_key)
+                if not bucket:
+                    del self._buckets[(scope, band, value)]
+    
+    def find(self, scope: str, signature: int, threshold: float) -> Optional[tuple]:
+        """Retourne (valeur, similarité) de la meilleure entrée au-dessus du seuil"""
+        candidates = set()
+        for band, value in enumerate(self._bands(signature)):
+            candidates |= self._buckets.get((scope, band, value), set())
+        
+        best = None
+        now = time.monotonic()
+        for entry_key in candidates:
+            expires_at, value = self._entries[entry_key]
+            if expires_at <= now:
+                self._remove(entry_key)
+                continue
+            similarity = 1 - bin(entry_key[1] ^ signature).count('1') / SIMHASH_BITS
+            if similarity >= threshold and (best is None or similarity > best[2]):
+                best = (entry_key, value, similarity)
+        
+        if best is None:
+            return None
+        self._entries.move_to_end(best[0])
+        return best[1], best[2]
+    
+    def add(self, scope: str, signature: int, value: Dict[str, Any], ttl: float):
+        entry_key = (scope, signature)
+        if entry_key in self._entries:
+            self._remove(entry_key)
+        self._entries[entry_key] = (time.monotonic() + ttl, value)
+        for band, band_value in enumerate(self._bands(signature)):
+            self._buckets.setdefault((scope, band, band_value), set()).add(entry_key)
+        while len(self._entries) > self.max_entries:
+            self._remove(next(iter(self._entries)))
+    
+    def __len__(self) -> int:
+        return len(self._entries)
+
 class LLMOptimizer:
     """Gestionnaire optimisé pour les appels LLM avec cache et sélection de modèle"""
     
+    # Après une erreur Redis, le cache est ignoré pendant ce délai (secondes)
+    REDIS_RETRY_DELAY = 30
+    
     def __init__(self):
         self.api_key = os.getenv('OPENAI_API_KEY')
+        # Clients asynchrones uniques pour le processus (pools de connexions partagés)
+        self._client: Optional[AsyncOpenAI] = None
         self.redis_client = self._init_redis()
+        self._redis_disabled_until = 0.0
         self.cache_ttl = 3600  # 1 heure de cache par défaut
+        self.local_cache = LocalTTLCache(LOCAL_CACHE_MAX_ENTRIES)
+        self.negative_cache: Dict[str, float] = {}
+        self.near_duplicates = NearDuplicateIndex(NEAR_DUPLICATE_MAX_ENTRIES)
+        self._revalidating: Dict[str, asyncio.Future] = {}
         self.usage_stats = {
             'cache_hits': 0,
             'cache_misses': 0,
+            'local_hits': 0,
+            'redis_hits': 0,
+            'stale_hits': 0,
+            'negative_hits': 0,
+            'near_duplicate_hits': 0,
+            'revalidations': 0,
             'gpt_35_calls': 0,
             'gpt_4_mini_calls': 0,
             'tokens_saved': 0,
@@ -36,18 +214,35 @@ class LLMOptimizer:
             'gpt-4o-mini': {'input': 0.00015, 'output': 0.0006}
         }
         
-    def _init_redis(self) -> Optional[redis.Redis]:
-        """Initialise la connexion Redis pour le cache"""
+    def _init_redis(self) -> Optional[aioredis.Redis]:
+        """Initialise le client Redis asynchrone (connexion établie au premier appel)"""
         try:
             redis_url = os.getenv('REDIS_URL', 'redis://redis:6379/2')
-            client = redis.from_url(redis_url, decode_responses=True)
-            client.ping()
-            logger.info("✅ Redis connecté pour cache LLM")
+            client = aioredis.from_url(
+                redis_url,
+                decode_responses=True,
+                socket_connect_timeout=0.5,
+                socket_timeout=0.5
+            )
+            logger.info("✅ Client Redis asynchrone prêt pour cache LLM")
             return client
         except Exception as e:
             logger.warning(f"⚠️ Redis non disponible pour cache: {e}")
             return None
     
+    def get_client(self) -> AsyncOpenAI:
+        """Client OpenAI asynchrone partagé (créé au premier usage)"""
+        if self._client is None:
+            self._client = AsyncOpenAI(api_key=self.api_key)
+        return self._client
+    
+    def _redis_available(self) -> bool:
+        return self.redis_client is not None and time.monotonic() >= self._redis_disabled_until
+    
+    def _disable_redis_temporarily(self, error: Exception):
+        self._redis_disabled_until = time.monotonic() + self.REDIS_RETRY_DELAY
+        logger.warning(f"⚠️ Cache Redis suspendu {self.REDIS_RETRY_DELAY}s: {error}")
+    
     def _generate_cache_key(self, prompt: str, context: Dict) -> str:
         """Génère une clé de cache unique basée sur le prompt et le contexte"""
         cache_data = {
@@ -62,6 +257,7 @@ class LLMOptimizer:
         # Cas nécessitant GPT-4o-mini
         advanced_cases = [
             'multi_agent_orchestration',  # Orchestration multi-agents
+            'multi_agent_reactions',      # Réactions groupées (JSON multi-personas)
             'personality_simulation',      # Simulation de personnalités
             'complex_reasoning',           # Raisonnement complexe
             'creative_storytelling',       # Narration créative
@@ -87,17 +283,30 @@ class LLMOptimizer:
         task_type: str = 'simple_conversation',
         complexity: Optional[Dict] = None,
         use_cache: bool = True,
-        cache_ttl: Optional[int] = None
+        cache_ttl: Optional[int] = None,
+        near_duplicate: Optional[str] = None,
+        near_duplicate_scope: str = '',
+        near_duplicate_text: Optional[str] = None
     ) -> Dict[str, Any]:
         """
         Obtient une réponse LLM optimisée avec cache et sélection de modèle
         
+        Le cache est à deux niveaux: LRU en mémoire du processus, puis Redis.
+        Les prompts en échec récent sont refusés sans appel (cache négatif) et,
+        pour les tâches à basse température, une entrée locale expirée est
+        servie pendant son rafraîchissement en arrière-plan.
+        
         Args:
             messages: Messages de la conversation
             task_type: Type de tâche (simple_conversation, multi_agent_orchestration, etc.)
             complexity: Métriques de complexité
-            use_cache: Utiliser le cache Redis
+            use_cache: Utiliser le cache (mémoire puis Redis)
             cache_ttl: Durée de vie du cache en secondes
+            near_duplicate: Type de tâche cacheable (reaction, filler, encouragement) pour
+                accepter une réponse à un prompt quasi identique (voir NEAR_DUPLICATE_THRESHOLDS)
+            near_duplicate_scope: Périmètre strict des quasi-doublons (ex: session et agent)
+            near_duplicate_text: Partie du prompt qui détermine la réponse (signature calculée
+                dessus plutôt que sur tout le prompt, dont les consignes fixes écrasent les écarts)
         
         Returns:
             Dict contenant la réponse et les métadonnées
@@ -105,25 +314,115 @@ class LLMOptimizer:
         complexity = complexity or {}
         cache_ttl = cache_ttl or self.cache_ttl
         
-        # Vérifier le cache si activé
-        if use_cache and self.redis_client:
-            # Utiliser TOUT le contenu des messages (system + user) pour la clé de cache
-            # afin d'éviter de réutiliser une réponse générique sur « Génère ta réaction ... »
-            compound_prompt = "\n".join(
-                [f"{m.get('role','')}::{m.get('content','')}" for m in messages]
-            ) if messages else ''
-            cache_key = self._generate_cache_key(
-                compound_prompt,
-                {'task_type': task_type, 'complexity': complexity}
+        if not use_cache:
+            return await self._request_llm(messages, task_type, complexity)
+        
+        # Utiliser TOUT le contenu des messages (system + user) pour la clé de cache
+        # afin d'éviter de réutiliser une réponse générique sur « Génère ta réaction ... »
+        compound_prompt = "\n".join(
+            [f"{m.get('role','')}::{m.get('content','')}" for m in messages]
+        ) if messages else ''
+        cache_key = self._generate_cache_key(
+            compound_prompt,
+            {'task_type': task_type, 'complexity': complexity}
+        )
+        
+        # Niveau 1: mémoire locale
+        local = self.local_cache.get(cache_key)
+        if local:
+            value, is_stale = local
+            if not is_stale:
+                self._record_cache_hit('local_hits', task_type)
+                return dict(value, cached=True)
+            if self._allows_stale_while_revalidate(task_type):
+                self._record_cache_hit('stale_hits', task_type)
+                self._schedule_revalidation(cache_key, messages, task_type, complexity, cache_ttl)
+                return dict(value, cached=True, stale=True)
+        
+        # Cache négatif: ne pas relancer aussitôt un prompt qui vient d'échouer
+        failed_until = self.negative_cache.get(cache_key)
+        if failed_until and failed_until > time.monotonic():
+            self.usage_stats['negative_hits'] += 1
+            raise RuntimeError(f"Échec LLM récent pour ce prompt ({task_type}), nouvel essai différé")
+        
+        # Niveau 2: Redis
+        cached_response = await self._get_cached_response(cache_key)
+        if cached_response:
+            self._record_cache_hit('redis_hits', task_type)
+            self.local_cache.set(cache_key, cached_response, self._local_ttl(cache_ttl), self._stale_grace(task_type))
+            return cached_response
+        
+        # Niveau 3: quasi-doublons (prompt identique à une ligne d'historique ou une durée près)
+        near_key = None
+        threshold = NEAR_DUPLICATE_THRESHOLDS.get(near_duplicate) if near_duplicate else None
+        if threshold is not None:
+            near_key = (
+                f"{task_type}|{near_duplicate}|{near_duplicate_scope}",
+                simhash(near_duplicate_text if near_duplicate_text is not None else compound_prompt)
             )
-            
-            cached_response = self._get_cached_response(cache_key)
-            if cached_response:
-                self.usage_stats['cache_hits'] += 1
-                logger.debug(f"✅ Cache hit pour {task_type}")
-                return cached_response
-            else:
-                self.usage_stats['cache_misses'] += 1
+            match = self.near_duplicates.find(near_key[0], near_key[1], threshold)
+            if match:
+                value, similarity = match
+                self._record_cache_hit('near_duplicate_hits', task_type)
+                return dict(value, cached=True, similarity=round(similarity, 3))
+        
+        self.usage_stats['cache_misses'] += 1
+        result = await self._fetch_and_cache(cache_key, messages, task_type, complexity, cache_ttl, near_key)
+        return result
+    
+    def _record_cache_hit(self, tier: str, task_type: str):
+        self.usage_stats['cache_hits'] += 1
+        self.usage_stats[tier] += 1
+        logger.debug(f"✅ Cache hit ({tier}) pour {task_type}")
+    
+    def _local_ttl(self, cache_ttl: int) -> float:
+        return min(cache_ttl, LOCAL_CACHE_MAX_TTL)
+    
+    def _allows_stale_while_revalidate(self, task_type: str) -> bool:
+        return self._get_optimal_temperature(task_type) <= STALE_WHILE_REVALIDATE_MAX_TEMPERATURE
+    
+    def _stale_grace(self, task_type: str) -> float:
+        return STALE_WHILE_REVALIDATE_GRACE if self._allows_stale_while_revalidate(task_type) else 0.0
+    
+    async def _fetch_and_cache(self, cache_key: str, messages: List[Dict[str, str]], task_type: str,
+                               complexity: Dict, cache_ttl: int,
+                               near_key: Optional[tuple] = None) -> Dict[str, Any]:
+        try:
+            result = await self._request_llm(messages, task_type, complexity)
+        except Exception:
+            self.negative_cache[cache_key] = time.monotonic() + NEGATIVE_CACHE_TTL
+            if len(self.negative_cache) > LOCAL_CACHE_MAX_ENTRIES:
+                now = time.monotonic()
+                self.negative_cache = {key: until for key, until in self.negative_cache.items() if until > now}
+            raise
+        
+        self.negative_cache.pop(cache_key, None)
+        self.local_cache.set(cache_key, result, self._local_ttl(cache_ttl), self._stale_grace(task_type))
+        if near_key:
+            self.near_duplicates.add(near_key[0], near_key[1], result, self._local_ttl(cache_ttl))
+        await self._cache_response(cache_key, result, cache_ttl)
+        return result
+    
+    def _schedule_revalidation(self, cache_key: str, messages: List[Dict[str, str]], task_type: str,
+                               complexity: Dict, cache_ttl: int):
+        """Rafraîchit une entrée périmée en arrière-plan (une seule fois par clé)"""
+        if cache_key in self._revalidating:
+            return
+        
+        async def revalidate():
+            try:
+                await self._fetch_and_cache(cache_key, messages, task_type, complexity, cache_ttl)
+                self.usage_stats['revalidations'] += 1
+            except Exception as e:
+                logger.debug(f"⚠️ Rafraîchissement cache échoué ({task_type}): {e}")
+            finally:
+                self._revalidating.pop(cache_key, None)
+        
+        self._revalidating[cache_key] = asyncio.ensure_future(revalidate())
+    
+    async def _request_llm(self, messages: List[Dict[str, str]], task_type: str,
+                           complexity: Dict) -> Dict[str, Any]:
+        """Appel OpenAI avec sélection du modèle et suivi des coûts"""
         
         # Sélection intelligente du modèle
         use_advanced = self._should_use_advanced_model(task_type, complexity)
@@ -133,14 +432,12 @@ class LLMOptimizer:
         optimized_messages = self._optimize_messages(messages, task_type)
         
         try:
-            # Appel API OpenAI
-            client = openai_client.OpenAI(api_key=self.api_key)
-            
             # Paramètres optimisés selon le type de tâche
             temperature = self._get_optimal_temperature(task_type)
             max_tokens = self._get_optimal_max_tokens(task_type)
             
-            response = client.chat.completions.create(
+            # Appel API OpenAI non bloquant (la boucle audio continue de tourner)
+            response = await self.get_client().chat.completions.create(
                 model=model,
                 messages=optimized_messages,
                 temperature=temperature,
@@ -164,7 +461,7 @@ class LLMOptimizer:
                 self.usage_stats['cost_saved'] += cost_difference
                 self.usage_stats['tokens_saved'] += tokens_used
             
-            result = {
+            return {
                 'response': response.choices[0].message.content,
                 'model': model,
                 'task_type': task_type,
@@ -177,16 +474,41 @@ class LLMOptimizer:
                 }
             }
             
-            # Mettre en cache si activé
-            if use_cache and self.redis_client and 'cache_key' in locals():
-                self._cache_response(cache_key, result, cache_ttl)
-            
-            return result
-            
         except Exception as e:
             logger.error(f"❌ Erreur appel LLM optimisé: {e}")
             raise
     
+    async def stream_optimized_response(
+        self,
+        messages: List[Dict[str, str]],
+        task_type: str = 'simple_conversation',
+        complexity: Optional[Dict] = None
+    ) -> AsyncIterator[str]:
+        """
+        Produit la réponse LLM token par token (sans cache), pour alimenter le TTS
+        au fil de la génération. Même sélection de modèle et mêmes paramètres que
+        get_optimized_response.
+        """
+        complexity = complexity or {}
+        use_advanced = self._should_use_advanced_model(task_type, complexity)
+        model = 'gpt-4o-mini' if use_advanced else 'gpt-3.5-turbo'
+        
+        stream = await self.get_client().chat.completions.create(
+            model=model,
+            messages=self._optimize_messages(messages, task_type),
+            temperature=self._get_optimal_temperature(task_type),
+            max_tokens=self._get_optimal_max_tokens(task_type),
+            stream=True
+        )
+        self.usage_stats['gpt_4_mini_calls' if use_advanced else 'gpt_35_calls'] += 1
+        
+        try:
+            async for chunk in stream:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+        finally:
+            await stream.close()
+    
     def _optimize_messages(self, messages: List[Dict[str, str]], task_type: str) -> List[Dict[str, str]]:
         """Optimise les messages pour réduire les tokens"""
         optimized = []
@@ -238,6 +560,7 @@ class LLMOptimizer:
         temperatures = {
             'simple_conversation': 0.7,
             'multi_agent_orchestration': 0.85,  # + créativité orchestrée
+            'multi_agent_reactions': 0.8,       # Plusieurs voix, JSON à respecter
             'personality_simulation': 0.9,
             'complex_reasoning': 0.75,          # Sarah plus créative/affirmée
             'creative_storytelling': 0.9,
@@ -251,6 +574,7 @@ class LLMOptimizer:
         max_tokens = {
             'simple_conversation': 100,      # Réponses courtes
             'multi_agent_orchestration': 200, # Plus de contexte
+            'multi_agent_reactions': 360,     # Une réaction courte par persona
             'personality_simulation': 150,    # Personnalités détaillées
             'complex_reasoning': 300,         # Explications longues
             'creative_storytelling': 250,     # Narration
@@ -259,36 +583,36 @@ class LLMOptimizer:
         }
         return max_tokens.get(task_type, 150)
     
-    def _get_cached_response(self, cache_key: str) -> Optional[Dict[str, Any]]:
+    async def _get_cached_response(self, cache_key: str) -> Optional[Dict[str, Any]]:
         """Récupère une réponse du cache"""
         try:
-            if not self.redis_client:
+            if not self._redis_available():
                 return None
                 
-            cached = self.redis_client.get(cache_key)
+            cached = await self.redis_client.get(cache_key)
             if cached:
                 result = json.loads(cached)
                 result['cached'] = True
                 logger.debug(f"✅ Réponse récupérée du cache: {cache_key[:20]}...")
                 return result
         except Exception as e:
-            logger.warning(f"⚠️ Erreur lecture cache: {e}")
+            self._disable_redis_temporarily(e)
         return None
     
-    def _cache_response(self, cache_key: str, response: Dict[str, Any], ttl: int):
+    async def _cache_response(self, cache_key: str, response: Dict[str, Any], ttl: int):
         """Met en cache une réponse"""
         try:
-            if not self.redis_client:
+            if not self._redis_available():
                 return
                 
-            self.redis_client.setex(
+            await self.redis_client.setex(
                 cache_key,
                 ttl,
                 json.dumps(response)
             )
             logger.debug(f"✅ Réponse mise en cache: {cache_key[:20]}... (TTL: {ttl}s)")
         except Exception as e:
-            logger.warning(f"⚠️ Erreur écriture cache: {e}")
+            self._disable_redis_temporarily(e)
     
     def get_usage_statistics(self) -> Dict[str, Any]:
         """Retourne les statistiques d'utilisation"""
@@ -303,6 +627,17 @@ class LLMOptimizer:
             'cache_hits': self.usage_stats['cache_hits'],
             'cache_misses': self.usage_stats['cache_misses'],
             'cache_hit_rate': f"{cache_rate:.1f}%",
+            'cache_tiers': {
+                'local_hits': self.usage_stats['local_hits'],
+                'redis_hits': self.usage_stats['redis_hits'],
+                'stale_hits': self.usage_stats['stale_hits'],
+                'negative_hits': self.usage_stats['negative_hits'],
+                'near_duplicate_hits': self.usage_stats['near_duplicate_hits'],
+                'revalidations': self.usage_stats['revalidations'],
+                'local_entries': len(self.local_cache),
+                'negative_entries': len(self.negative_cache),
+                'near_duplicate_entries': len(self.near_duplicates)
+            },
             'gpt_35_calls': self.usage_stats['gpt_35_calls'],
             'gpt_4_mini_calls': self.usage_stats['gpt_4_mini_calls'],
             'tokens_saved': self.usage_stats['tokens_saved'],
@@ -315,6 +650,12 @@ class LLMOptimizer:
         self.usage_stats = {
             'cache_hits': 0,
             'cache_misses': 0,
+            'local_hits': 0,
+            'redis_hits': 0,
+            'stale_hits': 0,
+            'negative_hits': 0,
+            'near_duplicate_hits': 0,
+            'revalidations': 0,
             'gpt_35_calls': 0,
             'gpt_4_mini_calls': 0,
             'tokens_saved': 0,
@@ -372,17 +713,16 @@ async def get_optimized_llm_response(
         )
         
         # Log des statistiques périodiquement
-        if llm_optimizer.usage_stats['total_calls'] % 10 == 0:
-            stats = llm_optimizer.get_usage_statistics()
+        stats = llm_optimizer.get_usage_statistics()
+        if stats['total_calls'] and stats['total_calls'] % 10 == 0:
             logger.info(f"📊 Stats LLM: {stats}")
         
         return result['response']
         
     except Exception as e:
         logger.error(f"❌ Erreur optimisation LLM: {e}")
-        # Fallback direct sans optimisation
-        client = openai_client.OpenAI(api_key=os.getenv('OPENAI_API_KEY'))
-        response = client.chat.completions.create(
+        # Fallback direct sans optimisation (même client partagé)
+        response = await llm_optimizer.get_client().chat.completions.create(
             model="gpt-3.5-turbo",
             messages=messages,
             temperature=0.7,
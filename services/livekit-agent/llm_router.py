@@ -0,0 +1,317 @@
+"""
+Routeur de fournisseurs LLM partagé (OpenAI, Mistral) pour Eloquence
+
+- Percentiles de latence par fournisseur (fenêtre glissante)
+- Requête de couverture (hedging) vers le fournisseur suivant dès que le
+  principal dépasse son p90 observé: la première réponse gagne, l'autre
+  est annulée
+- Disjoncteurs pour ignorer les fournisseurs en panne
+"""
+import os
+import time
+import asyncio
+import logging
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional
+
+import aiohttp
+
+logger = logging.getLogger(__name__)
+
+# Délai de couverture: p90 du principal, borné; valeur par défaut sans historique
+HEDGE_MIN_DELAY = float(os.getenv('LLM_HEDGE_MIN_DELAY', '0.25'))
+HEDGE_MAX_DELAY = float(os.getenv('LLM_HEDGE_MAX_DELAY', '3.0'))
+HEDGE_DEFAULT_DELAY = float(os.getenv('LLM_HEDGE_DEFAULT_DELAY', '1.0'))
+HEDGE_MIN_SAMPLES = int(os.getenv('LLM_HEDGE_MIN_SAMPLES', '5'))
+LATENCY_WINDOW = int(os.getenv('LLM_LATENCY_WINDOW', '200'))
+
+# Disjoncteur: ouverture après N échecs consécutifs, nouvel essai après le délai
+BREAKER_FAILURE_THRESHOLD = int(os.getenv('LLM_BREAKER_FAILURE_THRESHOLD', '3'))
+BREAKER_RECOVERY_TIMEOUT = float(os.getenv('LLM_BREAKER_RECOVERY_TIMEOUT', '30'))
+
+ProviderCall = Callable[[List[Dict[str, str]], Dict[str, Any]], Awaitable[str]]
+
+
+class CircuitBreaker:
+    """Disjoncteur fermé / ouvert / semi-ouvert (un seul essai en semi-ouvert)"""
+
+    def __init__(self, failure_threshold: int = BREAKER_FAILURE_THRESHOLD,
+                 recovery_timeout: float = BREAKER_RECOVERY_TIMEOUT):
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.consecutive_failures = 0
+        self.opened_at: Optional[float] = None
+        self.trial_in_flight = False
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return 'closed'
+        if time.monotonic() - self.opened_at >= self.recovery_timeout:
+            return 'half_open'
+        return 'open'
+
+    def allow(self) -> bool:
+        state = self.state
+        if state == 'closed':
+            return True
+        if state == 'half_open' and not self.trial_in_flight:
+            self.trial_in_flight = True
+            return True
+        return False
+
+    def record_success(self):
+        self.consecutive_failures = 0
+        self.opened_at = None
+        self.trial_in_flight = False
+
+    def record_failure(self):
+        self.consecutive_failures += 1
+        self.trial_in_flight = False
+        if self.opened_at is not None or self.consecutive_failures >= self.failure_threshold:
+            self.opened_at = time.monotonic()
+
+    def release_trial(self):
+        """Essai semi-ouvert annulé (perdant d'une course): ni succès ni échec"""
+        self.trial_in_flight = False
+
+
+@dataclass
+class LLMProvider:
+    name: str
+    call: ProviderCall
+    timeout: float
+    latencies: Deque[float] = field(default_factory=lambda: deque(maxlen=LATENCY_WINDOW))
+    breaker: CircuitBreaker = field(default_factory=CircuitBreaker)
+    successes: int = 0
+    failures: int = 0
+
+    def percentile(self, q: float) -> Optional[float]:
+        if not self.latencies:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * q))]
+
+    def hedge_delay(self) -> float:
+        """Délai avant couverture: p90 observé, ou valeur par défaut sans historique suffisant"""
+        if len(self.latencies) < HEDGE_MIN_SAMPLES:
+            return HEDGE_DEFAULT_DELAY
+        return min(max(self.percentile(0.9), HEDGE_MIN_DELAY), HEDGE_MAX_DELAY)
+
+
+class ProviderRouter:
+    """Route un appel LLM vers le meilleur fournisseur disponible, avec couverture et bascule"""
+
+    def __init__(self, providers: Optional[List[LLMProvider]] = None):
+        self.providers: List[LLMProvider] = providers or []
+        self.stats = {
+            'requests': 0,
+            'hedges_fired': 0,
+            'hedge_wins': 0,
+            'failovers': 0,
+            'exhausted': 0
+        }
+
+    def add_provider(self, provider: LLMProvider):
+        self.providers.append(provider)
+
+    async def _attempt(self, provider: LLMProvider, messages: List[Dict[str, str]],
+                       options: Dict[str, Any]) -> str:
+        start = time.monotonic()
+        try:
+            result = await asyncio.wait_for(provider.call(messages, options), timeout=provider.timeout)
+            if not result or not str(result).strip():
+                raise ValueError("réponse vide")
+        except asyncio.CancelledError:
+            # Perdant d'une course: sa latence réelle est au moins le temps écoulé.
+            # Sans cet échantillon, le p90 ne garderait que les appels rapides et
+            # le délai de couverture dériverait vers HEDGE_MIN_DELAY. Une borne
+            # inférieure sous le p90 actuel (couverture annulée tôt) n'apprend rien.
+            elapsed = time.monotonic() - start
+            p90 = provider.percentile(0.9)
+            if p90 is None or elapsed >= p90:
+                provider.latencies.append(elapsed)
+            provider.breaker.release_trial()
+            raise
+        except Exception as e:
+            provider.failures += 1
+            provider.breaker.record_failure()
+            if provider.breaker.state != 'closed':
+                logger.warning(f"⚡ [ROUTER] Disjoncteur ouvert pour {provider.name}")
+            raise RuntimeError(f"{provider.name}: {e or type(e).__name__}") from e
+
+        provider.latencies.append(time.monotonic() - start)
+        provider.successes += 1
+        provider.breaker.record_success()
+        return result
+
+    async def complete(self, messages: List[Dict[str, str]], **options: Any) -> Optional[str]:
+        """
+        Génère une réponse; retourne None si aucun fournisseur n'a répondu.
+
+        Le principal est attendu jusqu'à son p90; au-delà, le suivant est
+        lancé en parallèle. Un échec déclenche immédiatement la bascule.
+        Les options (max_tokens, temperature, models) sont transmises aux fournisseurs.
+        """
+        self.stats['requests'] += 1
+        candidates = [provider for provider in self.providers if provider.breaker.allow()]
+        if not candidates:
+            self.stats['exhausted'] += 1
+            logger.error("❌ [ROUTER] Tous les fournisseurs sont coupés par leur disjoncteur")
+            return None
+
+        pending: Dict[asyncio.Task, LLMProvider] = {}
+        hedges: List[LLMProvider] = []
+        next_index = 0
+
+        def launch() -> LLMProvider:
+            nonlocal next_index
+            provider = candidates[next_index]
+            next_index += 1
+            pending[asyncio.ensure_future(self._attempt(provider, messages, options))] = provider
+            return provider
+
+        launch()
+        try:
+            while pending:
+                # Avec un seul appel en vol, attendre le p90 de ce fournisseur avant de couvrir
+                in_flight = next(iter(pending.values()))
+                hedge_possible = next_index < len(candidates) and len(pending) == 1
+                wait_timeout = in_flight.hedge_delay() if hedge_possible else None
+                done, _ = await asyncio.wait(pending, timeout=wait_timeout, return_when=asyncio.FIRST_COMPLETED)
+
+                if not done:
+                    self.stats['hedges_fired'] += 1
+                    hedge = launch()
+                    hedges.append(hedge)
+                    logger.info(f"🛡️ [ROUTER] {in_flight.name} > p90 ({wait_timeout:.2f}s), couverture vers {hedge.name}")
+                    continue
+
+                for task in done:
+                    provider = pending.pop(task)
+                    if task.exception() is None:
+                        if provider in hedges:
+                            self.stats['hedge_wins'] += 1
+                        elif provider is not candidates[0]:
+                            self.stats['failovers'] += 1
+                        return task.result()
+                    logger.warning(f"⚠️ [ROUTER] Échec {task.exception()}")
+
+                # Bascule immédiate si plus rien n'est en vol
+                if not pending and next_index < len(candidates):
+                    launch()
+
+            self.stats['exhausted'] += 1
+            return None
+        finally:
+            for task in pending:
+                task.cancel()
+            # Rendre l'essai semi-ouvert réservé aux fournisseurs jamais lancés
+            for provider in candidates[next_index:]:
+                provider.breaker.release_trial()
+
+    def get_statistics(self) -> Dict[str, Any]:
+        def ms(value: Optional[float]) -> Optional[float]:
+            return round(value * 1000, 1) if value is not None else None
+
+        return {
+            **self.stats,
+            'providers': {
+                provider.name: {
+                    'state': provider.breaker.state,
+                    'successes': provider.successes,
+                    'failures': provider.failures,
+                    'p50_ms': ms(provider.percentile(0.5)),
+                    'p90_ms': ms(provider.percentile(0.9)),
+                    'p99_ms': ms(provider.percentile(0.99)),
+                    'hedge_delay_ms': ms(provider.hedge_delay())
+                }
+                for provider in self.providers
+            }
+        }
+
+
+# ============================================
+# Fournisseurs par défaut (configurés par l'environnement)
+# ============================================
+
+_http_session: Optional[aiohttp.ClientSession] = None
+
+
+def _get_http_session() -> aiohttp.ClientSession:
+    """Session aiohttp partagée par le processus (connexions réutilisées)"""
+    global _http_session
+    if _http_session is None or _http_session.closed:
+        _http_session = aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit_per_host=16))
+    return _http_session
+
+
+def _openai_provider(api_key: str) -> LLMProvider:
+    from openai import AsyncOpenAI
+    client = AsyncOpenAI(api_key=api_key, max_retries=0)
+
+    async def call(messages: List[Dict[str, str]], options: Dict[str, Any]) -> str:
+        response = await client.chat.completions.create(
+            model=options.get('models', {}).get('openai', 'gpt-4o-mini'),
+            messages=messages,
+            max_tokens=options.get('max_tokens', 150),
+            temperature=options.get('temperature', 0.7)
+        )
+        return response.choices[0].message.content
+
+    return LLMProvider(name='openai', call=call, timeout=float(os.getenv('OPENAI_TIMEOUT', '10')))
+
+
+def _mistral_provider(url: str, api_key: str) -> LLMProvider:
+    async def call(messages: List[Dict[str, str]], options: Dict[str, Any]) -> str:
+        async with _get_http_session().post(
+            url,
+            json={
+                "model": options.get('models', {}).get('mistral', 'mistral-7b-instruct'),
+                "messages": messages,
+                "max_tokens": options.get('max_tokens', 150),
+                "temperature": options.get('temperature', 0.7)
+            },
+            headers={
+                "Authorization": f"Bearer {api_key}",
+                "Content-Type": "application/json"
+            }
+        ) as response:
+            if response.status != 200:
+                raise RuntimeError(f"HTTP {response.status}")
+            data = await response.json()
+            return data['choices'][0]['message']['content']
+
+    return LLMProvider(name='mistral', call=call, timeout=float(os.getenv('MISTRAL_TIMEOUT', '10')))
+
+
+def build_default_router() -> ProviderRouter:
+    """OpenAI en principal si configuré, Mistral en secours"""
+    router = ProviderRouter()
+
+    openai_key = os.getenv('OPENAI_API_KEY')
+    if openai_key and openai_key.startswith('sk-'):
+        try:
+            router.add_provider(_openai_provider(openai_key))
+        except ImportError:
+            logger.warning("⚠️ Module openai non disponible pour le routeur")
+
+    mistral_url = os.getenv('MISTRAL_BASE_URL')
+    mistral_key = os.getenv('MISTRAL_API_KEY')
+    if mistral_url and mistral_key:
+        router.add_provider(_mistral_provider(mistral_url, mistral_key))
+
+    logger.info(f"🔀 Routeur LLM: {[provider.name for provider in router.providers] or 'aucun fournisseur'}")
+    return router
+
+
+_router: Optional[ProviderRouter] = None
+
+
+def get_llm_router() -> ProviderRouter:
+    """Routeur partagé du processus (latences et disjoncteurs communs à tous les appelants)"""
+    global _router
+    if _router is None:
+        _router = build_default_router()
+    return _router
@@ -5,7 +5,7 @@ Utilise directement MultiAgentManager avec les vrais agents configurés
 import asyncio
 import logging
 import os
-from typing import Dict, Any, List, Optional
+from typing import AsyncIterator, Dict, Any, List, Optional, Union
 from dataclasses import dataclass
 from datetime import datetime, timedelta
 from dotenv import load_dotenv
@@ -29,6 +29,7 @@ from multi_agent_config import (
     ExerciseTemplates
 )
 from multi_agent_manager import MultiAgentManager
+from speech_segmenter import SegmentChannel
 from naturalness_monitor import NaturalnessMonitor
 
 # Charger les variables d'environnement
@@ -49,6 +50,8 @@ logger.info(f"   MISTRAL_BASE_URL: {os.getenv('MISTRAL_BASE_URL', 'Non définie'
 # URLs des services
 MISTRAL_API_URL = os.getenv('MISTRAL_BASE_URL', 'http://mistral-conversation:8001/v1/chat/completions')
 VOSK_STT_URL = os.getenv('VOSK_STT_URL', 'http://vosk-stt:8002')
+# Réponse principale envoyée au TTS phrase par phrase pendant la génération LLM
+MULTI_AGENT_STREAM_TTS = os.getenv('MULTI_AGENT_STREAM_TTS', 'true').lower() == 'true'
 
 class MultiAgentLiveKitService:
     """Service LiveKit intégré avec le gestionnaire multi-agents"""
@@ -63,6 +66,8 @@ class MultiAgentLiveKitService:
         self.user_data = user_data or {'user_name': 'Participant', 'user_subject': 'votre présentation'}
         # Cache de TTS par agent pour fiabiliser la voix et réduire la latence
         self.agent_tts: Dict[str, Any] = {}
+        # Parole streamée de la réponse principale du tour en cours
+        self._primary_stream: Optional[Dict[str, Any]] = None
         
         logger.info(f"🎭 MultiAgentLiveKitService initialisé pour: {multi_agent_config.exercise_id}")
         logger.info(f"👤 Utilisateur: {self.user_data['user_name']}, Sujet: {self.user_data['user_subject']}")
@@ -281,8 +286,16 @@ class MultiAgentLiveKitService:
         try:
             logger.info(f"🎭 Orchestration multi-agents pour: {user_message[:50]}...")
             
-            # Utiliser le MultiAgentManager pour orchestrer la réponse
-            response_data = await self.manager.handle_user_input(user_message)
+            # Utiliser le MultiAgentManager pour orchestrer la réponse; la réponse
+            # principale commence à être prononcée pendant sa génération
+            stale, self._primary_stream = self._primary_stream, None
+            if stale:
+                await self._stop_primary_stream(stale)
+            self.manager.primary_segment_sink = self._open_primary_stream if MULTI_AGENT_STREAM_TTS else None
+            try:
+                response_data = await self.manager.handle_user_input(user_message)
+            finally:
+                self.manager.primary_segment_sink = None
             
             # Récupérer l'agent principal qui répond
             primary_agent_id = response_data.get('primary_speaker')
@@ -306,11 +319,12 @@ class MultiAgentLiveKitService:
                     self.manager.set_last_speaker_message("expert_specialise", primary_response)
                     logger.info(f"🔬 EXPERT A PARLÉ: {primary_response[:50]}...")
                 
-                # Ajouter la réponse principale
+                # Ajouter la réponse principale (déjà en cours de diffusion si streamée)
                 responses_to_speak.append({
                     'agent': agent,
                     'text': primary_response,
-                    'delay': 0
+                    'delay': 0,
+                    'stream': await self._take_primary_stream(agent, primary_response)
                 })
 
                 # NOUVEAU: Détecter immédiatement les interpellations dans la sortie de l'agent
@@ -385,6 +399,15 @@ class MultiAgentLiveKitService:
             text = resp_data['text']
             delay = resp_data['delay']
 
+            # Réponse déjà prononcée au fil de la génération: attendre la fin de sa diffusion
+            stream = resp_data.get('stream')
+            if stream:
+                await stream['task']
+                if not stream.get('failed'):
+                    continue
+                logger.warning(f"⚠️ Diffusion streamée échouée pour {agent.name}, reprise complète par la voie classique")
+                delay = 0
+
             # Attendre le délai
             if delay and delay > 0:
                 await asyncio.sleep(delay / 1000.0)
@@ -412,18 +435,95 @@ class MultiAgentLiveKitService:
             if not success:
                 logger.error(f"❌ Impossible de faire parler {agent.name}")
 
-    async def _speak_with_agent_voice_safe(self, agent: AgentPersonality, text: str, force_recreate: bool = False):
-        """Parle avec la voix propre à l'agent en forçant la bonne sélection TTS."""
+    async def _speak_with_agent_voice_safe(self, agent: AgentPersonality, text: Union[str, AsyncIterator[str]],
+                                           force_recreate: bool = False, stream: Optional[Dict[str, Any]] = None):
+        """Parle avec la voix propre à l'agent en forçant la bonne sélection TTS.
+
+        `text` peut être un flux de segments: le TTS les synthétise au fur et à mesure.
+        Si `stream` est fourni, le handle de parole y est conservé pour pouvoir l'interrompre.
+        """
 
         original_tts = getattr(self.session, '_tts', None)
         try:
             agent_tts = await self._get_or_build_agent_tts(agent, force_recreate=force_recreate)
             self.session._tts = agent_tts
-            await self.session.say(text=f"{agent.name}: {text}")
+            if isinstance(text, str):
+                handle = self.session.say(text=f"{agent.name}: {text}")
+            else:
+                handle = self.session.say(text=self._prefixed_segments(agent, text))
+            if stream is not None:
+                stream['handle'] = handle
+            await handle
         finally:
             if original_tts is not None:
                 self.session._tts = original_tts
 
+    async def _prefixed_segments(self, agent: AgentPersonality, segments: AsyncIterator[str]) -> AsyncIterator[str]:
+        yield f"{agent.name}: "
+        async for segment in segments:
+            yield segment
+
+    def _open_primary_stream(self, agent: AgentPersonality) -> SegmentChannel:
+        """Puits de segments du manager: lance la diffusion de la réponse principale dès le premier segment"""
+        channel = SegmentChannel()
+        stream = {'agent_id': agent.agent_id, 'channel': channel, 'handle': None, 'failed': False}
+        stream['task'] = asyncio.create_task(self._speak_primary_stream(agent, channel, stream))
+        self._primary_stream = stream
+        return channel
+
+    async def _speak_primary_stream(self, agent: AgentPersonality, channel: SegmentChannel,
+                                    stream: Dict[str, Any]):
+        spoken: List[str] = []
+
+        async def segments() -> AsyncIterator[str]:
+            async for segment in channel:
+                if not spoken:
+                    segment = self._strip_name_prefix(agent, segment)
+                spoken.append(segment)
+                yield segment + " "
+
+        try:
+            logger.info(f"🔊 {agent.name} commence à parler pendant la génération")
+            await self._speak_with_agent_voice_safe(agent, segments(), stream=stream)
+        except Exception as e:
+            # Le segment en cours de synthèse est perdu: la réponse finale complète sera
+            # prononcée par la voie classique (retries et reconstruction du TTS)
+            logger.warning(f"⚠️ Diffusion streamée interrompue pour {agent.name}: {e}")
+            stream['failed'] = True
+
+    async def _take_primary_stream(self, agent: AgentPersonality, primary_response: str) -> Optional[Dict[str, Any]]:
+        """Retourne la diffusion streamée si elle correspond à la réponse principale finale"""
+        stream, self._primary_stream = self._primary_stream, None
+        if not stream:
+            return None
+        channel: SegmentChannel = stream['channel']
+        streamed = "".join(self._strip_name_prefix(agent, channel.text).split())
+        final = "".join(self._strip_name_prefix(agent, primary_response or "").split())
+        if (stream['agent_id'] == agent.agent_id and not channel.failed and not stream.get('failed')
+                and streamed == final):
+            return stream
+        # Génération interrompue, TTS en échec ou réponse remplacée (fallback): prononcer la version finale
+        if stream.get('failed'):
+            logger.warning(f"⚠️ Diffusion streamée échouée pour {agent.name}, diffusion classique")
+        else:
+            logger.warning(f"⚠️ Réponse streamée différente de la réponse finale pour {agent.name}, diffusion classique")
+        await self._stop_primary_stream(stream)
+        return None
+
+    async def _stop_primary_stream(self, stream: Dict[str, Any]):
+        """Coupe la diffusion streamée et attend la restauration du TTS de session"""
+        handle = stream.get('handle')
+        if handle is not None and not handle.done():
+            handle.interrupt()
+        task: asyncio.Task = stream['task']
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            logger.warning(f"⚠️ Arrêt de la diffusion streamée: {e}")
+
     async def _get_or_build_agent_tts(self, agent: AgentPersonality, force_recreate: bool = False):
         """Retourne le TTS dédié à l'agent, en le créant si besoin (ou en le recréant si demandé)."""
         api_key = os.getenv('OPENAI_API_KEY')
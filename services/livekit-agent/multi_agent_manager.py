@@ -1,12 +1,15 @@
 """
 Gestionnaire des interactions multi-agents pour Studio Situations Pro
 """
+import os
+import re
+import uuid
 import asyncio
 import random
 import json
 import time
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Any
+from typing import Callable, Dict, List, Optional, Any
 from dataclasses import dataclass, asdict
 import logging
 
@@ -15,9 +18,20 @@ from multi_agent_config import (
     AgentPersonality, 
     InteractionStyle
 )
+from speech_segmenter import SegmentChannel, SentenceSegmenter
 
 logger = logging.getLogger(__name__)
 
+# Réponse principale streamée vers le TTS: délai max du premier token, puis de la génération complète
+STREAM_FIRST_TOKEN_TIMEOUT = 2.2
+STREAM_TOTAL_TIMEOUT = 10.0
+
+# Réactions secondaires: un seul appel LLM (JSON) pour toutes les personas, repli par agent si illisible
+BATCH_REACTIONS_ENABLED = os.getenv('MULTI_AGENT_BATCH_REACTIONS', 'true').lower() == 'true'
+REACTIONS_TIMEOUT = 1.8
+# Sans réponse groupée après ce délai, les appels par agent sont lancés en parallèle (même échéance)
+BATCH_REACTIONS_HEDGE_DELAY = 1.0
+
 
 @dataclass
 class ConversationEntry:
@@ -50,6 +64,8 @@ class MultiAgentManager:
         self.conversation_history: List[ConversationEntry] = []
         self.turn_queue: List[str] = []
         self.session_start_time = datetime.now()
+        # Périmètre des caches partagés du processus (quasi-doublons): propre à chaque session
+        self.session_scope = uuid.uuid4().hex[:12]
         self.last_speaker_change = datetime.now()
         self.speaking_times: Dict[str, float] = {agent_id: 0.0 for agent_id in self.agents}
         self.interaction_count: Dict[str, int] = {agent_id: 0 for agent_id in self.agents}
@@ -100,6 +116,10 @@ class MultiAgentManager:
         self.last_speaker = None
         self.last_message = None
         
+        # Puits de segments pour la réponse principale du tour (usage unique):
+        # reçoit l'agent et retourne le canal vers son TTS
+        self.primary_segment_sink: Optional[Callable[[AgentPersonality], SegmentChannel]] = None
+        
         logger.info("🎭 SYSTÈMES DE NATURALITÉ + AUTORITÉ ANIMATEUR initialisés")
 
     def _detect_all_interpellations(self, text: str, source_id: str = None) -> List[str]:
@@ -365,6 +385,7 @@ Dites-moi votre prénom et la lettre de votre choix : A, B, C, D ou E ?"""
         # Réinitialiser les métriques
         self.conversation_history.clear()
         self.session_start_time = datetime.now()
+        self.session_scope = uuid.uuid4().hex[:12]
         self.last_speaker_change = datetime.now()
         self.speaking_times = {agent_id: 0.0 for agent_id in self.agents}
         self.interaction_count = {agent_id: 0 for agent_id in self.agents}
@@ -1052,6 +1073,11 @@ AUTRES PARTICIPANTS:
             elif agent.interaction_style == InteractionStyle.CHALLENGER:
                 task_type = 'complex_reasoning'
             
+            # Réponse principale du tour: streamer les tokens vers le TTS phrase par phrase
+            sink, self.primary_segment_sink = self.primary_segment_sink, None
+            if sink:
+                return await self._stream_agent_response(agent, sink, messages, task_type, complexity)
+            
             # Utiliser l'optimiseur LLM avec cache et sélection intelligente
             # Timeout court pour garder une bonne réactivité en direct
             result = await asyncio.wait_for(
@@ -1075,6 +1101,40 @@ AUTRES PARTICIPANTS:
             # Fallback avec une réponse contextuelle
             return f"Je suis {agent.name}, {agent.role}. {self._get_fallback_response(agent, user_message)}"
     
+    async def _stream_agent_response(self, agent: AgentPersonality, sink: Callable[[AgentPersonality], SegmentChannel],
+                                     messages: List[Dict[str, str]], task_type: str, complexity: Dict[str, Any]) -> str:
+        """Génère la réponse en streaming et pousse chaque phrase complète dans le canal du TTS"""
+        from llm_optimizer import llm_optimizer
+        
+        channel = sink(agent)
+        completed = False
+        segmenter = SentenceSegmenter()
+        parts: List[str] = []
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + STREAM_TOTAL_TIMEOUT
+        stream = llm_optimizer.stream_optimized_response(messages, task_type, complexity)
+        
+        try:
+            while True:
+                timeout = STREAM_FIRST_TOKEN_TIMEOUT if not parts else deadline - loop.time()
+                try:
+                    delta = await asyncio.wait_for(stream.__anext__(), timeout=max(timeout, 0.01))
+                except StopAsyncIteration:
+                    break
+                parts.append(delta)
+                for segment in segmenter.push(delta):
+                    channel.send(segment)
+            
+            tail = segmenter.flush()
+            if tail:
+                channel.send(tail)
+            completed = True
+            logger.info(f"✅ Réponse LLM streamée pour {agent.name} ({len(parts)} fragments)")
+            return "".join(parts)
+        finally:
+            channel.close(failed=not completed)
+            await stream.aclose()
+    
     def _get_style_instructions(self, style: InteractionStyle) -> str:
         """Retourne les instructions de style pour chaque type d'interaction"""
         styles = {
@@ -1183,28 +1243,56 @@ AUTRES PARTICIPANTS:
             f"{[self.agents[aid].name for aid in reacting_agents]}"
         )
 
-        # Générer toutes les réactions EN PARALLÈLE (avec micro-jitter + priorité mention)
         start_parallel = datetime.now()
-        tasks = []
-        for idx, agent_id in enumerate(reacting_agents):
-            agent = self.agents[agent_id]
-            # Petites micro-pauses échelonnées pour désynchroniser légèrement les LLM
-            async def _one(agent_local: AgentPersonality):
-                await asyncio.sleep(0.05 * (idx + 1))
-                return await self.generate_agent_reaction_with_retry(agent_local, primary_response)
-
-            task = _one(agent)
-            tasks.append(task)
-
-        # Attendre toutes les réactions (max 2 secondes pour plus de réactivité)
-        try:
-            reactions_results = await asyncio.wait_for(
-                asyncio.gather(*tasks, return_exceptions=True),
-                timeout=1.8,  # Réduit de 2.5 à 1.8s
-            )
-        except asyncio.TimeoutError:
-            logger.warning("⚠️ Timeout sur génération des réactions")
-            reactions_results = ["Timeout"] * len(tasks)
+        loop = asyncio.get_running_loop()
+        # Échéance unique pour l'appel groupé ET le repli par agent
+        deadline = loop.time() + REACTIONS_TIMEOUT
+        reacting = [self.agents[agent_id] for agent_id in reacting_agents]
+
+        # Un seul appel LLM pour toutes les personas (le modérateur reste sur ses formules sans LLM)
+        batched: Dict[str, str] = {}
+        per_agent_task: Optional[asyncio.Task] = None
+        llm_agents = [agent for agent in reacting if agent.interaction_style != InteractionStyle.MODERATOR]
+        if BATCH_REACTIONS_ENABLED and len(llm_agents) > 1:
+            batch_task = asyncio.ensure_future(self.generate_batch_reactions(llm_agents, primary_response))
+            await asyncio.wait({batch_task}, timeout=BATCH_REACTIONS_HEDGE_DELAY)
+            if not batch_task.done():
+                # Couverture: appels par agent lancés sans annuler le groupé, la première réponse utilisable gagne
+                logger.info("🛡️ Génération groupée lente, appels par agent lancés en parallèle")
+                per_agent_task = asyncio.ensure_future(
+                    self._generate_reactions_per_agent(reacting, primary_response, deadline)
+                )
+                await asyncio.wait(
+                    {batch_task, per_agent_task},
+                    timeout=max(0.0, deadline - loop.time()),
+                    return_when=asyncio.FIRST_COMPLETED,
+                )
+                # Appels par agent tous en échec: laisser au groupé le temps restant
+                if per_agent_task.done() and not batch_task.done() and not any(
+                    isinstance(reaction, str) and reaction and reaction != "Timeout"
+                    for reaction in per_agent_task.result()
+                ):
+                    await asyncio.wait({batch_task}, timeout=max(0.0, deadline - loop.time()))
+            if not batch_task.done():
+                batch_task.cancel()
+                logger.warning("⚠️ Timeout sur génération groupée des réactions")
+            elif batch_task.exception() is not None:
+                logger.warning(f"⚠️ Échec génération groupée des réactions, repli par agent: {batch_task.exception()}")
+            else:
+                batched = batch_task.result()
+
+        # Générer les réactions restantes EN PARALLÈLE (avec micro-jitter), dans le temps restant
+        remaining = [agent for agent in reacting if agent.agent_id not in batched]
+        if per_agent_task is not None and not remaining:
+            per_agent_task.cancel()
+            results: List[Any] = []
+        elif per_agent_task is not None:
+            remaining = reacting
+            results = await per_agent_task
+        else:
+            results = await self._generate_reactions_per_agent(remaining, primary_response, deadline)
+        per_agent = dict(zip([agent.agent_id for agent in remaining], results))
+        reactions_results = [batched.get(agent_id, per_agent.get(agent_id)) for agent_id in reacting_agents]
 
         # Traiter les résultats
         for i, reaction in enumerate(reactions_results):
@@ -1250,6 +1338,114 @@ AUTRES PARTICIPANTS:
         logger.info(f"✅ {len(reactions)} réactions générées en parallèle en {elapsed:.1f}s")
         return reactions
 
+    async def _generate_reactions_per_agent(self, agents: List[AgentPersonality], primary_response: str,
+                                            deadline: float) -> List[Any]:
+        """Un appel LLM par agent, en parallèle jusqu'à `deadline` (horloge de la boucle); résultats alignés sur `agents`"""
+        if not agents:
+            return []
+
+        # Petites micro-pauses échelonnées pour désynchroniser légèrement les LLM
+        async def _one(agent_local: AgentPersonality, idx: int):
+            await asyncio.sleep(0.05 * (idx + 1))
+            return await self.generate_agent_reaction_with_retry(agent_local, primary_response)
+
+        tasks = [asyncio.ensure_future(_one(agent, idx)) for idx, agent in enumerate(agents)]
+        try:
+            _, pending = await asyncio.wait(tasks, timeout=max(0.0, deadline - asyncio.get_running_loop().time()))
+        except asyncio.CancelledError:
+            for task in tasks:
+                task.cancel()
+            raise
+        if pending:
+            logger.warning(f"⚠️ Timeout sur génération des réactions ({len(pending)}/{len(tasks)})")
+            for task in pending:
+                task.cancel()
+        # Les réactions déjà prêtes sont conservées, seules les manquantes passent en "Timeout"
+        return [
+            "Timeout" if task in pending
+            else task.exception() if task.exception() is not None
+            else task.result()
+            for task in tasks
+        ]
+
+    async def generate_batch_reactions(self, agents: List[AgentPersonality], primary_response: str) -> Dict[str, str]:
+        """
+        Génère les réactions de plusieurs personas en un seul appel LLM (réponse JSON).
+
+        Retourne {agent_id: réaction}; les agents absents ou illisibles sont omis
+        (l'appelant les génère alors un par un).
+        """
+        personas = "\n".join(
+            f'- "{agent.agent_id}": {agent.name}, {agent.role}. Style: {agent.interaction_style.value}. '
+            f'Traits: {", ".join(agent.personality_traits[:4])}. Commence par "{agent.name.split()[0]}:"'
+            for agent in agents
+        )
+        recent_lines = []
+        for entry in self.conversation_history[-3:]:
+            role_label = "Utilisateur" if entry.is_user else entry.speaker_name
+            recent_lines.append(f"- {role_label}: {entry.message[:120]}")
+        recent_context = "\n".join(recent_lines) if recent_lines else "(aucun)"
+
+        prompt = f"""Tu écris les réactions de plusieurs participants d'un débat télévisé.
+
+Quelqu'un vient de dire: "{primary_response[:200]}"
+
+PARTICIPANTS QUI RÉAGISSENT:
+{personas}
+
+Pour CHAQUE participant, génère une RÉACTION COURTE (1-2 phrases) qui:
+- Reste fidèle à son style (le challenger questionne et objecte, l'expert nuance et précise)
+- Ne répète pas la phrase d'origine ni la réaction d'un autre participant
+- Ne commence jamais par "Je suis ..."
+
+CONTEXTE RÉCENT:
+{recent_context}
+
+Réponds UNIQUEMENT avec un objet JSON: {{"<identifiant>": "<réaction>", ...}}"""
+
+        from llm_optimizer import llm_optimizer
+
+        result = await llm_optimizer.get_optimized_response(
+            messages=[
+                {"role": "system", "content": prompt},
+                {"role": "user", "content": "Génère les réactions en JSON."},
+            ],
+            task_type='multi_agent_reactions',
+            complexity={'num_agents': len(self.agents), 'context_length': len(primary_response) + len(recent_context), 'interaction_depth': len(self.conversation_history)},
+            use_cache=True,
+            cache_ttl=300,
+        )
+
+        parsed = self._parse_batch_reactions(result.get('response', ''), agents)
+        missing = [agent.name for agent in agents if agent.agent_id not in parsed]
+        if missing:
+            logger.warning(f"⚠️ Réactions groupées illisibles pour {missing}, repli par agent")
+        logger.info(f"🧩 {len(parsed)}/{len(agents)} réactions générées en un seul appel (cache: {result.get('cached')})")
+        return {
+            agent.agent_id: self._sanitize_generation(agent, parsed[agent.agent_id], primary_response)
+            for agent in agents if agent.agent_id in parsed
+        }
+
+    def _parse_batch_reactions(self, raw: str, agents: List[AgentPersonality]) -> Dict[str, str]:
+        """Extrait {agent_id: réaction} d'une sortie JSON (tolère balises ```json et clés par prénom)"""
+        match = re.search(r'\{.*\}', raw or "", re.DOTALL)
+        if not match:
+            return {}
+        try:
+            data = json.loads(match.group(0))
+        except json.JSONDecodeError:
+            return {}
+        if isinstance(data.get('reactions'), dict):
+            data = data['reactions']
+
+        parsed: Dict[str, str] = {}
+        for agent in agents:
+            keys = (agent.agent_id, agent.name, agent.name.split()[0])
+            value = next((data[key] for key in data if str(key).strip().lower() in {k.lower() for k in keys}), None)
+            if isinstance(value, str) and value.strip():
+                parsed[agent.agent_id] = value.strip()
+        return parsed
+
     async def generate_agent_reaction_with_retry(self, agent: AgentPersonality, primary_response: str) -> str:
         """Génération de réaction avec retry automatique"""
 
@@ -1575,7 +1771,10 @@ Exemples selon ton style:
                         task_type=task_type,
                         complexity=complexity,
                         use_cache=True,
-                        cache_ttl=300
+                        cache_ttl=300,
+                        near_duplicate='reaction',
+                        near_duplicate_scope=f"{self.session_scope}:{agent.agent_id}",
+                        near_duplicate_text=primary_response[:200]
                     ),
                     timeout=3.0
                 )
@@ -1676,6 +1875,9 @@ Varie tes formules, ne te présente pas à chaque fois."""
                 complexity={'num_agents': len(self.agents), 'context_length': len(primary_response) + len(recent_context), 'interaction_depth': len(self.conversation_history)},
                 use_cache=True,
                 cache_ttl=300,
+                near_duplicate='reaction',
+                near_duplicate_scope=f"{self.session_scope}:{agent.agent_id}",
+                near_duplicate_text=primary_response[:200],
             )
 
             return self._sanitize_generation(agent, result['response'], primary_response)
@@ -0,0 +1,108 @@
+"""
+Découpage incrémental d'un flux de tokens LLM en segments prononçables
+
+Les segments sont coupés en fin de phrase, ou en fin de proposition (virgule,
+point-virgule, deux-points) dès qu'ils sont assez longs, pour que le TTS puisse
+commencer à parler avant la fin de la génération.
+"""
+import re
+import asyncio
+from typing import AsyncIterator, List
+
+# Fin de phrase: ponctuation forte suivie d'un espace (ou guillemet fermant puis espace)
+SENTENCE_END = re.compile(r'[.!?…]+["»”)]?\s')
+# Fin de proposition: ponctuation faible suivie d'un espace
+CLAUSE_END = re.compile(r'[,;:]\s')
+# Abréviations courantes qui ne terminent pas une phrase
+ABBREVIATIONS = ("m.", "mme.", "dr.", "etc.", "ex.", "p.", "cf.", "vs.", "st.")
+
+
+class SentenceSegmenter:
+    """Accumule les deltas et émet des segments complets"""
+
+    def __init__(self, first_clause_min_chars: int = 25, clause_min_chars: int = 60, max_chars: int = 220):
+        # Le premier segment peut être court: c'est lui qui fixe la latence perçue
+        self.first_clause_min_chars = first_clause_min_chars
+        self.clause_min_chars = clause_min_chars
+        self.max_chars = max_chars
+        self._buffer = ""
+        self._emitted = 0
+
+    def _is_abbreviation(self, end: int) -> bool:
+        words = self._buffer[:end].split()
+        return bool(words) and words[-1].lower() in ABBREVIATIONS
+
+    def _next_cut(self) -> int:
+        """Position de coupe dans le tampon, ou 0 s'il faut attendre"""
+        for match in SENTENCE_END.finditer(self._buffer):
+            if not self._is_abbreviation(match.end()):
+                return match.end()
+
+        clause_min = self.first_clause_min_chars if self._emitted == 0 else self.clause_min_chars
+        for match in CLAUSE_END.finditer(self._buffer):
+            if match.end() >= clause_min:
+                return match.end()
+
+        if len(self._buffer) > self.max_chars:
+            # Phrase interminable: couper au dernier espace
+            space = self._buffer.rfind(" ", 0, self.max_chars)
+            return space + 1 if space > 0 else self.max_chars
+        return 0
+
+    def push(self, delta: str) -> List[str]:
+        """Ajoute un delta; retourne les segments devenus complets"""
+        self._buffer += delta
+        segments = []
+        cut = self._next_cut()
+        while cut:
+            segment = self._buffer[:cut].strip()
+            self._buffer = self._buffer[cut:]
+            if segment:
+                segments.append(segment)
+                self._emitted += 1
+            cut = self._next_cut()
+        return segments
+
+    def flush(self) -> str:
+        """Retourne le reste du tampon en fin de flux"""
+        segment, self._buffer = self._buffer.strip(), ""
+        if segment:
+            self._emitted += 1
+        return segment
+
+
+class SegmentChannel:
+    """
+    File de segments entre le générateur LLM et le TTS.
+
+    Conserve le texte envoyé (pour comparer avec la réponse finale) et
+    l'issue de la génération; le consommateur itère jusqu'à la fermeture.
+    """
+
+    def __init__(self):
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self.segments: List[str] = []
+        self.closed = False
+        self.failed = False
+
+    @property
+    def text(self) -> str:
+        return " ".join(self.segments)
+
+    def send(self, segment: str):
+        if not self.closed:
+            self.segments.append(segment)
+            self._queue.put_nowait(segment)
+
+    def close(self, failed: bool = False):
+        if not self.closed:
+            self.closed = True
+            self.failed = failed
+            self._queue.put_nowait(None)
+
+    async def __aiter__(self) -> AsyncIterator[str]:
+        while True:
+            segment = await self._queue.get()
+            if segment is None:
+                return
+            yield segment
@@ -0,0 +1,69 @@
+"""
+Génération des tokens JWT LiveKit (module partagé)
+
+Utilisé par le service de tokens (main.py) et importé tel quel par
+eloquence-api pour signer les tokens en local: la structure des claims
+reste ainsi identique des deux côtés.
+"""
+import time
+from typing import Any, Dict, Optional, Tuple
+
+import jwt
+
+# Durée de validité des tokens (24h)
+TOKEN_TTL_SECONDS = 86400
+
+# Permissions vidéo par défaut d'un participant
+DEFAULT_VIDEO_GRANTS: Dict[str, Any] = {
+    "roomJoin": True,
+    "canPublish": True,
+    "canSubscribe": True,
+    "canPublishData": True,
+    "canPublishSources": ["camera", "microphone", "screen_share"],
+    "hidden": False,
+    "recorder": False
+}
+
+
+def build_claims(
+    api_key: str,
+    room: str,
+    identity: str,
+    metadata: str = "{}",
+    grants: Optional[Dict[str, Any]] = None,
+    now: Optional[int] = None
+) -> Dict[str, Any]:
+    """
+    Construit les claims LiveKit; `grants` surcharge les permissions par défaut
+    """
+    now = int(time.time()) if now is None else now
+    video = {"room": room, **DEFAULT_VIDEO_GRANTS}
+    if grants:
+        video.update({name: value for name, value in grants.items() if name in DEFAULT_VIDEO_GRANTS})
+
+    return {
+        "iss": api_key,  # Issuer
+        "sub": identity,  # Subject (identity)
+        "iat": now,  # Issued at
+        "exp": now + TOKEN_TTL_SECONDS,  # Expiration (24h)
+        "nbf": now,  # Not before
+        "jti": f"{identity}-{now}",  # JWT ID
+        "video": video,
+        "metadata": metadata
+    }
+
+
+def mint_token(
+    api_key: str,
+    api_secret: str,
+    room: str,
+    identity: str,
+    metadata: str = "{}",
+    grants: Optional[Dict[str, Any]] = None
+) -> Tuple[str, int]:
+    """
+    Signe un token HS256; retourne (token, expiration en secondes epoch)
+    """
+    claims = build_claims(api_key, room, identity, metadata, grants)
+    return jwt.encode(claims, api_secret, algorithm="HS256"), claims["exp"]
+
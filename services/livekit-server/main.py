@@ -2,8 +2,6 @@
 Service de génération de tokens JWT pour LiveKit
 """
 import os
-import time
-import jwt
 import json
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
@@ -12,6 +10,8 @@ from typing import Optional, Dict, Any, Union
 import uvicorn
 import logging
 
+from livekit_tokens import mint_token
+
 # Configuration
 API_KEY = os.getenv("LIVEKIT_API_KEY", "devkey")
 API_SECRET = os.getenv("LIVEKIT_API_SECRET", "devsecret123456789abcdef0123456789abcdef")
@@ -51,32 +51,9 @@ class TokenResponse(BaseModel):
 
 def generate_token(room: str, identity: str, metadata: str = "{}") -> str:
     """
-    Génère un token JWT valide pour LiveKit
+    Génère un token JWT valide pour LiveKit (claims définis dans livekit_tokens)
     """
-    # Structure du token LiveKit
-    claims = {
-        "iss": API_KEY,  # Issuer
-        "sub": identity,  # Subject (identity)
-        "iat": int(time.time()),  # Issued at
-        "exp": int(time.time()) + 86400,  # Expiration (24h)
-        "nbf": int(time.time()),  # Not before
-        "jti": f"{identity}-{int(time.time())}",  # JWT ID
-        "video": {
-            "room": room,
-            "roomJoin": True,
-            "canPublish": True,
-            "canSubscribe": True,
-            "canPublishData": True,
-            "canPublishSources": ["camera", "microphone", "screen_share"],
-            "hidden": False,
-            "recorder": False
-        },
-        "metadata": metadata
-    }
-    
-    # Générer le token JWT avec le secret
-    token = jwt.encode(claims, API_SECRET, algorithm="HS256")
-    
+    token, _ = mint_token(API_KEY, API_SECRET, room, identity, metadata)
     return token
 
 @app.get("/health")
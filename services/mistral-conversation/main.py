@@ -11,10 +11,16 @@ import asyncio
 from typing import Dict, Any, List, Optional
 from dataclasses import dataclass, asdict
 import time
+import hashlib
+import heapq
+import itertools
+from collections import OrderedDict, deque
 
 import aiohttp
-from fastapi import FastAPI, HTTPException, BackgroundTasks
+import redis.asyncio as aioredis
+from fastapi import FastAPI, HTTPException, BackgroundTasks, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 import uvicorn
 
@@ -30,6 +36,36 @@ SCALEWAY_MISTRAL_URL = os.getenv("SCALEWAY_MISTRAL_URL", "https://api.scaleway.a
 MISTRAL_API_KEY = os.getenv("MISTRAL_API_KEY")
 MISTRAL_MODEL = os.getenv("MISTRAL_MODEL", "mistral-nemo-instruct-2407")
 
+# Pool de connexions vers Scaleway (session unique pour la durée de vie du service)
+MISTRAL_REQUEST_TIMEOUT = float(os.getenv("MISTRAL_REQUEST_TIMEOUT", "30"))
+MISTRAL_POOL_LIMIT = int(os.getenv("MISTRAL_POOL_LIMIT", "100"))
+MISTRAL_POOL_LIMIT_PER_HOST = int(os.getenv("MISTRAL_POOL_LIMIT_PER_HOST", "32"))
+MISTRAL_KEEPALIVE_TIMEOUT = float(os.getenv("MISTRAL_KEEPALIVE_TIMEOUT", "75"))
+MISTRAL_DNS_CACHE_TTL = int(os.getenv("MISTRAL_DNS_CACHE_TTL", "300"))
+MISTRAL_PREWARM_CONNECTIONS = int(os.getenv("MISTRAL_PREWARM_CONNECTIONS", "0"))
+
+# Cache des réponses déterministes (mémoire LRU + Redis optionnel)
+RESPONSE_CACHE_ENABLED = os.getenv("RESPONSE_CACHE_ENABLED", "true").lower() == "true"
+RESPONSE_CACHE_MAX_TEMPERATURE = float(os.getenv("RESPONSE_CACHE_MAX_TEMPERATURE", "0.2"))
+RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", "512"))
+RESPONSE_CACHE_TTL = int(os.getenv("RESPONSE_CACHE_TTL", "3600"))
+RESPONSE_CACHE_PREFIX = os.getenv("RESPONSE_CACHE_PREFIX", "mistral:response_cache:")
+# En-tête d'indication: "cache" force la mise en cache, "no-cache" l'interdit
+RESPONSE_CACHE_HINT_HEADER = "X-Cache-Hint"
+REDIS_URL = os.getenv("REDIS_URL")
+
+# Admission des appels amont: concurrence, budget tokens/minute et file à priorités
+MISTRAL_MAX_CONCURRENCY = int(os.getenv("MISTRAL_MAX_CONCURRENCY", "8"))
+MISTRAL_TOKENS_PER_MINUTE = int(os.getenv("MISTRAL_TOKENS_PER_MINUTE", "0"))  # 0 = illimité
+MISTRAL_QUEUE_MAX_SIZE = int(os.getenv("MISTRAL_QUEUE_MAX_SIZE", "200"))
+MISTRAL_QUEUE_DEADLINE = float(os.getenv("MISTRAL_QUEUE_DEADLINE", "30"))
+MISTRAL_MAX_RETRY_AFTER = float(os.getenv("MISTRAL_MAX_RETRY_AFTER", "30"))
+MISTRAL_UPSTREAM_429_RETRIES = int(os.getenv("MISTRAL_UPSTREAM_429_RETRIES", "1"))
+# En-têtes: priorité (live | batch) et délai maximal d'attente en secondes
+PRIORITY_HEADER = "X-Request-Priority"
+DEADLINE_HEADER = "X-Request-Deadline"
+REQUEST_PRIORITIES = {"live": 0, "batch": 1}
+
 # Modèles Pydantic
 class ChatMessage(BaseModel):
     role: str
@@ -70,6 +106,366 @@ class ServiceHealth:
     error_message: Optional[str] = None
     consecutive_failures: int = 0
 
+def estimate_request_tokens(request: ChatCompletionRequest) -> int:
+    """Estimation grossière (~4 caractères par token) du coût d'une requête"""
+    prompt_chars = sum(len(msg.content) for msg in request.messages)
+    return prompt_chars // 4 + (request.max_tokens or 0)
+
+@dataclass
+class AdmissionSlot:
+    priority: str
+    estimated_tokens: int
+    enqueued_at: float
+    deadline: float
+    granted_at: Optional[float] = None
+    released: bool = False
+
+class UpstreamScheduler:
+    """
+    Contrôle d'admission des appels Scaleway.
+    
+    Limite la concurrence et le débit de tokens par minute; les requêtes en
+    attente sont servies par priorité (live avant batch) puis par ordre
+    d'arrivée, et abandonnées si leur délai expire avant leur tour. Un 429
+    amont suspend toute la file pendant la durée Retry-After.
+    """
+    
+    def __init__(self, max_concurrency: int, tokens_per_minute: int, max_queue: int):
+        self.max_concurrency = max_concurrency
+        self.tokens_per_minute = tokens_per_minute
+        self.max_queue = max_queue
+        self.active = 0
+        self.paused_until = 0.0
+        self._tokens = float(tokens_per_minute)
+        self._tokens_updated_at = time.monotonic()
+        self._queue: List[tuple] = []
+        self._sequence = itertools.count()
+        self._wakeup: Optional[asyncio.TimerHandle] = None
+        self._wait_samples: deque = deque(maxlen=200)
+        self.stats = {
+            "admitted": 0,
+            "queued": 0,
+            "dropped_deadline": 0,
+            "rejected_queue_full": 0,
+            "upstream_429": 0
+        }
+    
+    def _refill_tokens(self, now: float):
+        if self.tokens_per_minute <= 0:
+            return
+        elapsed = now - self._tokens_updated_at
+        self._tokens = min(float(self.tokens_per_minute), self._tokens + elapsed * self.tokens_per_minute / 60.0)
+        self._tokens_updated_at = now
+    
+    def _token_wait(self, estimated_tokens: int, now: float) -> float:
+        """Secondes avant que le budget couvre la requête (0 si disponible)"""
+        if self.tokens_per_minute <= 0:
+            return 0.0
+        self._refill_tokens(now)
+        # Une requête plus grosse que le budget entier passe dès que le seau est plein
+        needed = min(float(estimated_tokens), float(self.tokens_per_minute))
+        if self._tokens >= needed:
+            return 0.0
+        return (needed - self._tokens) * 60.0 / self.tokens_per_minute
+    
+    def _grant(self, slot: AdmissionSlot, now: float):
+        self.active += 1
+        if self.tokens_per_minute > 0:
+            self._tokens -= slot.estimated_tokens
+        slot.granted_at = now
+        self.stats["admitted"] += 1
+        self._wait_samples.append(now - slot.enqueued_at)
+    
+    def _schedule_wakeup(self, delay: float):
+        if self._wakeup:
+            self._wakeup.cancel()
+        self._wakeup = asyncio.get_running_loop().call_later(max(delay, 0.01), self._dispatch)
+    
+    def _drop_expired(self, now: float):
+        """Retire de toute la file les requêtes annulées ou expirées, même sans place libre"""
+        kept = []
+        for entry in self._queue:
+            slot, future = entry[2], entry[3]
+            if future.done():
+                continue
+            if slot.deadline <= now:
+                self.stats["dropped_deadline"] += 1
+                future.set_exception(HTTPException(
+                    status_code=503,
+                    detail="Délai d'attente dépassé dans la file Mistral",
+                    headers={"Retry-After": str(max(1, int(self.retry_after_hint())))}
+                ))
+                continue
+            kept.append(entry)
+        if len(kept) != len(self._queue):
+            heapq.heapify(kept)
+            self._queue = kept
+    
+    def _dispatch(self):
+        """Accorde les places libres aux requêtes en tête de file"""
+        if self._wakeup:
+            self._wakeup.cancel()
+        self._wakeup = None
+        now = time.monotonic()
+        self._drop_expired(now)
+        while self._queue and self.active < self.max_concurrency:
+            if now < self.paused_until:
+                self._schedule_wakeup(self.paused_until - now)
+                return
+            _, _, slot, future = self._queue[0]
+            token_wait = self._token_wait(slot.estimated_tokens, now)
+            if token_wait > 0:
+                self._schedule_wakeup(min(token_wait, slot.deadline - now))
+                return
+            heapq.heappop(self._queue)
+            self._grant(slot, now)
+            future.set_result(slot)
+        if self._queue and not self._wakeup:
+            # Surveiller l'expiration de la prochaine échéance même sans libération de place
+            self._schedule_wakeup(min(entry[2].deadline for entry in self._queue) - now)
+    
+    async def acquire(self, priority: str, estimated_tokens: int, deadline: Optional[float] = None) -> AdmissionSlot:
+        now = time.monotonic()
+        slot = AdmissionSlot(
+            priority=priority if priority in REQUEST_PRIORITIES else "live",
+            estimated_tokens=estimated_tokens,
+            enqueued_at=now,
+            deadline=now + (deadline if deadline is not None else MISTRAL_QUEUE_DEADLINE)
+        )
+        
+        # Voie rapide: file vide, place libre, pas de pause et budget suffisant
+        if (not self._queue and self.active < self.max_concurrency
+                and now >= self.paused_until and self._token_wait(estimated_tokens, now) == 0):
+            self._grant(slot, now)
+            return slot
+        
+        if len(self._queue) >= self.max_queue:
+            self.stats["rejected_queue_full"] += 1
+            raise HTTPException(
+                status_code=503,
+                detail="File d'attente Mistral saturée",
+                headers={"Retry-After": str(max(1, int(self.retry_after_hint())))}
+            )
+        
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._queue, (REQUEST_PRIORITIES[slot.priority], next(self._sequence), slot, future))
+        self.stats["queued"] += 1
+        self._dispatch()
+        try:
+            return await future
+        except asyncio.CancelledError:
+            # Client parti: rendre la place si elle venait d'être accordée
+            if future.done() and not future.cancelled() and future.exception() is None:
+                self.release(slot)
+            raise
+    
+    def release(self, slot: AdmissionSlot, actual_tokens: Optional[int] = None):
+        if slot.released:
+            return
+        slot.released = True
+        self.active = max(0, self.active - 1)
+        if self.tokens_per_minute > 0 and actual_tokens is not None:
+            # Corriger le budget avec la consommation réelle
+            self._tokens = min(float(self.tokens_per_minute), self._tokens + slot.estimated_tokens - actual_tokens)
+        self._dispatch()
+    
+    def pause(self, retry_after: float):
+        """Suspend la file après un 429 amont (Retry-After)"""
+        self.stats["upstream_429"] += 1
+        self.paused_until = max(self.paused_until, time.monotonic() + min(retry_after, MISTRAL_MAX_RETRY_AFTER))
+        logger.warning(f"⏸️ [ADMISSION] File suspendue {retry_after:.1f}s (429 Scaleway)")
+    
+    def retry_after_hint(self) -> float:
+        return max(1.0, self.paused_until - time.monotonic())
+    
+    def get_status(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        waits = sorted(self._wait_samples)
+        queued_by_priority = {name: 0 for name in REQUEST_PRIORITIES}
+        for _, _, slot, future in self._queue:
+            if not future.done():
+                queued_by_priority[slot.priority] += 1
+        self._refill_tokens(now)
+        return {
+            **self.stats,
+            "active": self.active,
+            "max_concurrency": self.max_concurrency,
+            "queue_depth": sum(queued_by_priority.values()),
+            "queue_depth_by_priority": queued_by_priority,
+            "max_queue": self.max_queue,
+            "paused_for": round(max(0.0, self.paused_until - now), 2),
+            "tokens_per_minute": self.tokens_per_minute,
+            "tokens_available": round(self._tokens, 1) if self.tokens_per_minute > 0 else None,
+            "queue_wait_avg_ms": round(sum(waits) / len(waits) * 1000, 1) if waits else 0.0,
+            "queue_wait_p95_ms": round(waits[min(len(waits) - 1, int(len(waits) * 0.95))] * 1000, 1) if waits else 0.0
+        }
+
+def parse_retry_after(value: Optional[str], default: float = 1.0) -> float:
+    try:
+        return max(0.0, float(value))
+    except (TypeError, ValueError):
+        return default
+
+class ResponseCache:
+    """
+    Cache des complétions déterministes à deux niveaux (mémoire LRU puis Redis).
+    
+    Les requêtes identiques concurrentes sont fusionnées: un seul appel amont,
+    dont le résultat est partagé par tous les appelants en attente.
+    """
+    
+    def __init__(self, max_size: int, ttl: int, redis_url: Optional[str] = None):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.redis_url = redis_url
+        self._redis: Optional[aioredis.Redis] = None
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self.stats = {
+            "memory_hits": 0,
+            "redis_hits": 0,
+            "merged_requests": 0,
+            "misses": 0,
+            "bypassed": 0,
+            "saved_tokens": 0,
+            "redis_errors": 0
+        }
+    
+    async def start(self):
+        if not self.redis_url:
+            return
+        try:
+            self._redis = aioredis.from_url(self.redis_url, decode_responses=True)
+            await self._redis.ping()
+            logger.info("✅ [CACHE] Niveau Redis connecté")
+        except Exception as e:
+            logger.warning(f"⚠️ [CACHE] Redis indisponible, cache mémoire seul: {e}")
+            self._redis = None
+    
+    async def close(self):
+        if self._redis:
+            await self._redis.close()
+            self._redis = None
+    
+    @staticmethod
+    def is_cacheable(request: ChatCompletionRequest, hint: Optional[str]) -> bool:
+        """Seules les requêtes déterministes (température basse ou indication explicite) sont mises en cache"""
+        if not RESPONSE_CACHE_ENABLED or request.stream:
+            return False
+        hint = (hint or "").strip().lower()
+        if hint in ("no-cache", "no-store", "0", "false"):
+            return False
+        if hint in ("cache", "1", "true"):
+            return True
+        return request.temperature is not None and request.temperature <= RESPONSE_CACHE_MAX_TEMPERATURE
+    
+    @staticmethod
+    def make_key(payload: Dict[str, Any]) -> str:
+        fingerprint = json.dumps(
+            {name: payload.get(name) for name in ("model", "messages", "temperature", "max_tokens")},
+            sort_keys=True,
+            ensure_ascii=False
+        )
+        return hashlib.sha256(fingerprint.encode("utf-8")).hexdigest()
+    
+    def _get_memory(self, key: str) -> Optional[Dict[str, Any]]:
+        entry = self._entries.get(key)
+        if not entry:
+            return None
+        expires_at, value = entry
+        if expires_at <= time.time():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+    
+    def _set_memory(self, key: str, value: Dict[str, Any], ttl: Optional[float] = None):
+        self._entries[key] = (time.time() + (ttl or self.ttl), value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+    
+    async def _get_redis(self, key: str) -> Optional[Dict[str, Any]]:
+        if not self._redis:
+            return None
+        try:
+            async with self._redis.pipeline(transaction=False) as pipe:
+                pipe.get(RESPONSE_CACHE_PREFIX + key)
+                pipe.ttl(RESPONSE_CACHE_PREFIX + key)
+                raw, remaining = await pipe.execute()
+        except Exception as e:
+            self.stats["redis_errors"] += 1
+            logger.warning(f"⚠️ [CACHE] Lecture Redis échouée: {e}")
+            return None
+        if not raw:
+            return None
+        value = json.loads(raw)
+        # Promotion en mémoire sans dépasser l'expiration Redis
+        self._set_memory(key, value, remaining if remaining and remaining > 0 else None)
+        return value
+    
+    async def _set_redis(self, key: str, value: Dict[str, Any]):
+        if not self._redis:
+            return
+        try:
+            await self._redis.set(RESPONSE_CACHE_PREFIX + key, json.dumps(value, ensure_ascii=False), ex=self.ttl)
+        except Exception as e:
+            self.stats["redis_errors"] += 1
+            logger.warning(f"⚠️ [CACHE] Écriture Redis échouée: {e}")
+    
+    def _record_saved(self, value: Dict[str, Any]):
+        self.stats["saved_tokens"] += (value.get("usage") or {}).get("total_tokens") or 0
+    
+    async def get_or_compute(self, key: str, compute) -> tuple:
+        """Retourne (réponse, source) où source vaut memory, redis, merged ou upstream"""
+        value = self._get_memory(key)
+        if value is not None:
+            self.stats["memory_hits"] += 1
+            self._record_saved(value)
+            return value, "memory"
+        
+        task = self._inflight.get(key)
+        if task:
+            self.stats["merged_requests"] += 1
+            value, _ = await asyncio.shield(task)
+            self._record_saved(value)
+            return value, "merged"
+        
+        async def fill():
+            cached = await self._get_redis(key)
+            if cached is not None:
+                return cached, "redis"
+            result = await compute()
+            self._set_memory(key, result)
+            await self._set_redis(key, result)
+            return result, "upstream"
+        
+        task = asyncio.ensure_future(fill())
+        self._inflight[key] = task
+        task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        
+        value, source = await asyncio.shield(task)
+        if source == "redis":
+            self.stats["redis_hits"] += 1
+            self._record_saved(value)
+        else:
+            self.stats["misses"] += 1
+        return value, source
+    
+    def get_status(self) -> Dict[str, Any]:
+        hits = self.stats["memory_hits"] + self.stats["redis_hits"] + self.stats["merged_requests"]
+        lookups = hits + self.stats["misses"]
+        return {
+            **self.stats,
+            "enabled": RESPONSE_CACHE_ENABLED,
+            "hit_ratio": round(hits / lookups, 3) if lookups else 0.0,
+            "memory_entries": len(self._entries),
+            "max_size": self.max_size,
+            "ttl": self.ttl,
+            "redis_connected": self._redis is not None,
+            "max_temperature": RESPONSE_CACHE_MAX_TEMPERATURE
+        }
+
 class ScalewayMistralService:
     """Service wrapper pour l'API Mistral Scaleway"""
     
@@ -87,83 +483,193 @@ class ScalewayMistralService:
             response_time=0.0
         )
         
+        self._session: Optional[aiohttp.ClientSession] = None
+        self.pool_stats = {
+            "requests": 0,
+            "connections_created": 0,
+            "connections_reused": 0,
+            "prewarmed_connections": 0
+        }
+        self.usage_totals = {
+            "prompt_tokens": 0,
+            "completion_tokens": 0,
+            "total_tokens": 0,
+            "streamed_requests": 0,
+            "estimated_usage_streams": 0
+        }
+        self.response_cache = ResponseCache(RESPONSE_CACHE_SIZE, RESPONSE_CACHE_TTL, REDIS_URL)
+        self.scheduler = UpstreamScheduler(MISTRAL_MAX_CONCURRENCY, MISTRAL_TOKENS_PER_MINUTE, MISTRAL_QUEUE_MAX_SIZE)
+        
         logger.info(f"🚀 Service Mistral Scaleway initialisé")
         logger.info(f"📍 Base URL: {self.base_url}")
         logger.info(f"🤖 Modèle: {self.model}")
     
-    async def chat_completion(self, request: ChatCompletionRequest) -> ChatCompletionResponse:
-        """Génère une réponse via l'API Scaleway Mistral"""
+    def _build_trace_config(self) -> aiohttp.TraceConfig:
+        """Compte les connexions ouvertes et réutilisées par le connecteur"""
+        trace_config = aiohttp.TraceConfig()
+        
+        async def on_connection_create_end(session, context, params):
+            self.pool_stats["connections_created"] += 1
+        
+        async def on_connection_reuseconn(session, context, params):
+            self.pool_stats["connections_reused"] += 1
+        
+        async def on_request_start(session, context, params):
+            self.pool_stats["requests"] += 1
+        
+        trace_config.on_connection_create_end.append(on_connection_create_end)
+        trace_config.on_connection_reuseconn.append(on_connection_reuseconn)
+        trace_config.on_request_start.append(on_request_start)
+        return trace_config
+    
+    async def start(self):
+        """Ouvre la session HTTP partagée (keep-alive, cache DNS, limites de connexions)"""
+        if self._session and not self._session.closed:
+            return
+        
+        connector = aiohttp.TCPConnector(
+            limit=MISTRAL_POOL_LIMIT,
+            limit_per_host=MISTRAL_POOL_LIMIT_PER_HOST,
+            ttl_dns_cache=MISTRAL_DNS_CACHE_TTL,
+            keepalive_timeout=MISTRAL_KEEPALIVE_TIMEOUT,
+            enable_cleanup_closed=True
+        )
+        self._session = aiohttp.ClientSession(
+            connector=connector,
+            timeout=aiohttp.ClientTimeout(total=MISTRAL_REQUEST_TIMEOUT),
+            headers={"Authorization": f"Bearer {self.api_key}"},
+            trace_configs=[self._build_trace_config()]
+        )
+        logger.info(f"🔌 [SCALEWAY] Session HTTP partagée ouverte (limite {MISTRAL_POOL_LIMIT_PER_HOST}/hôte)")
+    
+    async def close(self):
+        if self._session and not self._session.closed:
+            await self._session.close()
+        self._session = None
+    
+    async def _get_session(self) -> aiohttp.ClientSession:
+        if not self._session or self._session.closed:
+            await self.start()
+        return self._session
+    
+    async def prewarm(self, connections: int):
+        """Ouvre `connections` connexions TLS en parallèle pour qu'elles restent en keep-alive"""
+        session = await self._get_session()
+        
+        async def open_connection():
+            try:
+                async with session.get(f"{self.base_url}/models") as response:
+                    await response.read()
+                    return True
+            except aiohttp.ClientError as e:
+                logger.warning(f"⚠️ [SCALEWAY] Pré-chauffage échoué: {e}")
+                return False
+        
+        results = await asyncio.gather(*[open_connection() for _ in range(connections)])
+        self.pool_stats["prewarmed_connections"] = sum(results)
+        logger.info(f"🔥 [SCALEWAY] {sum(results)}/{connections} connexions pré-chauffées")
+    
+    async def chat_completion(
+        self,
+        request: ChatCompletionRequest,
+        priority: str = "live",
+        deadline: Optional[float] = None
+    ) -> ChatCompletionResponse:
+        """
+        Génère une réponse via l'API Scaleway Mistral.
+        
+        L'appel passe par le contrôle d'admission; sur 429 amont, la file est
+        suspendue le temps du Retry-After et la requête est rejouée si son
+        délai le permet.
+        """
+        estimated_tokens = estimate_request_tokens(request)
+        deadline_at = time.monotonic() + (deadline if deadline is not None else MISTRAL_QUEUE_DEADLINE)
+        retries = 0
+        
+        while True:
+            slot = await self.scheduler.acquire(priority, estimated_tokens, deadline_at - time.monotonic())
+            actual_tokens = None
+            try:
+                result = await self._send_completion(request)
+                actual_tokens = result.usage.total_tokens
+                return result
+            except HTTPException as e:
+                if e.status_code != 429:
+                    raise
+                retry_after = parse_retry_after((e.headers or {}).get("Retry-After"))
+                self.scheduler.pause(retry_after)
+                if retries >= MISTRAL_UPSTREAM_429_RETRIES or deadline_at - time.monotonic() <= retry_after:
+                    raise
+                retries += 1
+                logger.info(f"🔁 [ADMISSION] Requête {priority} remise en file après 429 (Retry-After {retry_after:.1f}s)")
+            finally:
+                self.scheduler.release(slot, actual_tokens)
+    
+    async def _send_completion(self, request: ChatCompletionRequest) -> ChatCompletionResponse:
+        """Appel unique à l'API Scaleway Mistral"""
         
         start_time = time.time()
         
         try:
-            # Utiliser le modèle configuré si non spécifié
-            model = request.model or self.model
-            
-            # Préparer la requête pour Scaleway
-            payload = {
-                "model": model,
-                "messages": [{"role": msg.role, "content": msg.content} for msg in request.messages],
-                "temperature": request.temperature,
-                "max_tokens": request.max_tokens,
-                "stream": request.stream
-            }
-            
-            headers = {
-                "Authorization": f"Bearer {self.api_key}",
-                "Content-Type": "application/json"
-            }
+            # Préparer la requête pour Scaleway (modèle configuré si non spécifié)
+            payload = self._build_payload(request)
+            payload["stream"] = False
+            model = payload["model"]
             
             logger.info(f"🔵 [SCALEWAY] Envoi requête - Modèle: {model}, Messages: {len(request.messages)}")
             logger.debug(f"🔍 [SCALEWAY] Payload: {payload}")
             
-            # Appel à l'API Scaleway
-            timeout = aiohttp.ClientTimeout(total=30.0)
-            async with aiohttp.ClientSession(timeout=timeout) as session:
-                async with session.post(
-                    f"{self.base_url}/chat/completions",
-                    json=payload,
-                    headers=headers
-                ) as response:
+            # Appel à l'API Scaleway via la session partagée (connexion réutilisée)
+            session = await self._get_session()
+            async with session.post(
+                f"{self.base_url}/chat/completions",
+                json=payload
+            ) as response:
+                
+                processing_time = time.time() - start_time
+                
+                if response.status == 200:
+                    result_data = await response.json()
+                    
+                    # Enregistrer le succès
+                    self._record_success(processing_time)
+                    
+                    logger.info(f"✅ [SCALEWAY] Réponse reçue en {processing_time:.2f}s")
                     
-                    processing_time = time.time() - start_time
+                    # Formater la réponse avec le modèle UsageInfo
+                    usage_data = result_data.get("usage", {})
+                    self._record_usage(usage_data)
+                    usage_info = UsageInfo(
+                        prompt_tokens=usage_data.get("prompt_tokens", 0),
+                        completion_tokens=usage_data.get("completion_tokens", 0),
+                        total_tokens=usage_data.get("total_tokens", 0),
+                        prompt_tokens_details=usage_data.get("prompt_tokens_details")
+                    )
                     
-                    if response.status == 200:
-                        result_data = await response.json()
-                        
-                        # Enregistrer le succès
-                        self._record_success(processing_time)
-                        
-                        logger.info(f"✅ [SCALEWAY] Réponse reçue en {processing_time:.2f}s")
-                        
-                        # Formater la réponse avec le modèle UsageInfo
-                        usage_data = result_data.get("usage", {})
-                        usage_info = UsageInfo(
-                            prompt_tokens=usage_data.get("prompt_tokens", 0),
-                            completion_tokens=usage_data.get("completion_tokens", 0),
-                            total_tokens=usage_data.get("total_tokens", 0),
-                            prompt_tokens_details=usage_data.get("prompt_tokens_details")
-                        )
-                        
-                        chat_response = ChatCompletionResponse(
-                            id=result_data.get("id", f"chat-{int(time.time())}"),
-                            created=int(time.time()),
-                            model=model,
-                            choices=result_data.get("choices", []),
-                            usage=usage_info
-                        )
-                        
-                        return chat_response
+                    chat_response = ChatCompletionResponse(
+                        id=result_data.get("id", f"chat-{int(time.time())}"),
+                        created=int(time.time()),
+                        model=model,
+                        choices=result_data.get("choices", []),
+                        usage=usage_info
+                    )
                     
-                    else:
-                        error_text = await response.text()
-                        self._record_failure(f"http_{response.status}", processing_time)
-                        
-                        logger.error(f"❌ [SCALEWAY] Erreur HTTP {response.status}: {error_text}")
-                        raise HTTPException(
-                            status_code=response.status,
-                            detail=f"Erreur API Scaleway: {error_text}"
-                        )
+                    return chat_response
+                
+                else:
+                    error_text = await response.text()
+                    self._record_failure(f"http_{response.status}", processing_time)
+                    
+                    logger.error(f"❌ [SCALEWAY] Erreur HTTP {response.status}: {error_text}")
+                    retry_after = response.headers.get("Retry-After")
+                    raise HTTPException(
+                        status_code=response.status,
+                        detail=f"Erreur API Scaleway: {error_text}",
+                        headers={"Retry-After": retry_after} if retry_after else None
+                    )
+        
+        except HTTPException:
+            raise
         
         except aiohttp.ClientError as e:
             processing_time = time.time() - start_time
@@ -177,6 +683,157 @@ class ScalewayMistralService:
             logger.error(f"❌ [SCALEWAY] Erreur inattendue: {e}")
             raise HTTPException(status_code=500, detail=f"Erreur interne: {str(e)}")
     
+    async def cached_chat_completion(
+        self,
+        request: ChatCompletionRequest,
+        hint: Optional[str] = None,
+        priority: str = "live",
+        deadline: Optional[float] = None
+    ) -> tuple:
+        """
+        Complétion avec cache des requêtes déterministes.
+        
+        Retourne (réponse, source); source vaut bypass si la requête n'est pas éligible.
+        """
+        if not ResponseCache.is_cacheable(request, hint):
+            self.response_cache.stats["bypassed"] += 1
+            return await self.chat_completion(request, priority, deadline), "bypass"
+        
+        async def compute() -> Dict[str, Any]:
+            return (await self.chat_completion(request, priority, deadline)).model_dump()
+        
+        key = ResponseCache.make_key(self._build_payload(request))
+        return await self.response_cache.get_or_compute(key, compute)
+    
+    def _build_payload(self, request: ChatCompletionRequest) -> Dict[str, Any]:
+        return {
+            "model": request.model or self.model,
+            "messages": [{"role": msg.role, "content": msg.content} for msg in request.messages],
+            "temperature": request.temperature,
+            "max_tokens": request.max_tokens,
+            "stream": request.stream
+        }
+    
+    def _record_usage(self, usage_data: Dict[str, Any]):
+        for field in ("prompt_tokens", "completion_tokens", "total_tokens"):
+            self.usage_totals[field] += usage_data.get(field) or 0
+    
+    async def open_stream(
+        self,
+        request: ChatCompletionRequest,
+        priority: str = "live",
+        deadline: Optional[float] = None
+    ) -> tuple:
+        """
+        Ouvre la requête streamée vers Scaleway; retourne (réponse, place d'admission).
+        
+        Les erreurs HTTP sont levées ici, avant le début de la réponse SSE,
+        pour que l'appelant reçoive le vrai code de statut. La place reste
+        occupée jusqu'à la fin du relais (relay_stream).
+        """
+        payload = self._build_payload(request)
+        payload["stream"] = True
+        payload["stream_options"] = {"include_usage": True}
+        
+        slot = await self.scheduler.acquire(priority, estimate_request_tokens(request), deadline)
+        logger.info(f"🔵 [SCALEWAY] Envoi requête streamée - Modèle: {payload['model']}, Messages: {len(request.messages)}")
+        
+        start_time = time.time()
+        try:
+            session = await self._get_session()
+            response = await session.post(
+                f"{self.base_url}/chat/completions",
+                json=payload,
+                # Pas de limite globale: seule l'attente entre deux fragments est bornée
+                timeout=aiohttp.ClientTimeout(total=None, sock_read=MISTRAL_REQUEST_TIMEOUT)
+            )
+        except aiohttp.ClientError as e:
+            self.scheduler.release(slot)
+            self._record_failure("network_error", time.time() - start_time)
+            logger.error(f"❌ [SCALEWAY] Erreur réseau: {e}")
+            raise HTTPException(status_code=502, detail=f"Erreur réseau: {str(e)}")
+        except BaseException:
+            self.scheduler.release(slot)
+            raise
+        
+        if response.status != 200:
+            error_text = await response.text()
+            response.release()
+            self.scheduler.release(slot)
+            retry_after = response.headers.get("Retry-After")
+            if response.status == 429:
+                self.scheduler.pause(parse_retry_after(retry_after))
+            self._record_failure(f"http_{response.status}", time.time() - start_time)
+            logger.error(f"❌ [SCALEWAY] Erreur HTTP {response.status}: {error_text}")
+            raise HTTPException(
+                status_code=response.status,
+                detail=f"Erreur API Scaleway: {error_text}",
+                headers={"Retry-After": retry_after} if retry_after else None
+            )
+        
+        return response, slot
+    
+    async def relay_stream(self, response: aiohttp.ClientResponse, model: str, slot: AdmissionSlot):
+        """
+        Relaie les événements SSE de Scaleway tels quels, au fil de l'eau.
+        
+        L'usage est comptabilisé à la fin du flux; si l'amont ne l'a pas
+        fourni, un dernier fragment avec un usage estimé est ajouté.
+        """
+        start_time = time.time()
+        usage_data: Optional[Dict[str, Any]] = None
+        completion_chars = 0
+        stream_id = f"chat-{int(start_time)}"
+        
+        try:
+            async for raw_line in response.content:
+                line = raw_line.decode("utf-8").strip()
+                if not line.startswith("data:"):
+                    continue
+                data = line[len("data:"):].strip()
+                if data == "[DONE]":
+                    break
+                
+                try:
+                    chunk = json.loads(data)
+                    stream_id = chunk.get("id", stream_id)
+                    usage_data = chunk.get("usage") or usage_data
+                    for choice in chunk.get("choices") or []:
+                        completion_chars += len((choice.get("delta") or {}).get("content") or "")
+                except json.JSONDecodeError:
+                    pass
+                
+                yield f"data: {data}\n\n"
+            
+            if usage_data is None:
+                # Estimation grossière (~4 caractères par token) faute d'usage amont
+                completion_tokens = completion_chars // 4
+                usage_data = {"prompt_tokens": 0, "completion_tokens": completion_tokens, "total_tokens": completion_tokens, "estimated": True}
+                self.usage_totals["estimated_usage_streams"] += 1
+                yield "data: " + json.dumps({
+                    "id": stream_id,
+                    "object": "chat.completion.chunk",
+                    "created": int(time.time()),
+                    "model": model,
+                    "choices": [],
+                    "usage": usage_data
+                }) + "\n\n"
+            
+            yield "data: [DONE]\n\n"
+            
+            self._record_usage(usage_data)
+            self.usage_totals["streamed_requests"] += 1
+            self._record_success(time.time() - start_time)
+            logger.info(f"✅ [SCALEWAY] Flux terminé en {time.time() - start_time:.2f}s - {usage_data.get('total_tokens', 0)} tokens")
+        
+        except aiohttp.ClientError as e:
+            self._record_failure("stream_interrupted", time.time() - start_time)
+            logger.error(f"❌ [SCALEWAY] Flux interrompu: {e}")
+        
+        finally:
+            response.release()
+            self.scheduler.release(slot, (usage_data or {}).get("total_tokens"))
+    
     async def health_check(self) -> Dict[str, Any]:
         """Vérifie la santé du service"""
         
@@ -238,11 +895,27 @@ class ScalewayMistralService:
             self.health_status.is_healthy = False
             logger.warning(f"⚠️ [HEALTH] Service marqué non sain après {self.health_status.consecutive_failures} échecs")
     
+    def get_pool_status(self) -> Dict[str, Any]:
+        """Métriques de réutilisation des connexions du pool"""
+        opened = self.pool_stats["connections_created"] + self.pool_stats["connections_reused"]
+        return {
+            **self.pool_stats,
+            "reuse_ratio": round(self.pool_stats["connections_reused"] / opened, 3) if opened else 0.0,
+            "session_open": bool(self._session and not self._session.closed),
+            "limit": MISTRAL_POOL_LIMIT,
+            "limit_per_host": MISTRAL_POOL_LIMIT_PER_HOST,
+            "keepalive_timeout": MISTRAL_KEEPALIVE_TIMEOUT
+        }
+    
     def get_status(self) -> Dict[str, Any]:
         """Retourne le statut du service"""
         return {
             "service_name": "Scaleway Mistral API",
             "health": asdict(self.health_status),
+            "connection_pool": self.get_pool_status(),
+            "usage": dict(self.usage_totals),
+            "response_cache": self.response_cache.get_status(),
+            "admission": self.scheduler.get_status(),
             "config": {
                 "base_url": self.base_url,
                 "model": self.model,
@@ -274,6 +947,22 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.on_event("startup")
+async def startup_event():
+    """Ouvre la session HTTP partagée et pré-chauffe les connexions si demandé"""
+    if not mistral_service:
+        return
+    await mistral_service.start()
+    await mistral_service.response_cache.start()
+    if MISTRAL_PREWARM_CONNECTIONS > 0:
+        await mistral_service.prewarm(MISTRAL_PREWARM_CONNECTIONS)
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    if mistral_service:
+        await mistral_service.close()
+        await mistral_service.response_cache.close()
+
 @app.get("/health")
 async def health_endpoint():
     """Endpoint de santé"""
@@ -290,14 +979,59 @@ async def status_endpoint():
     
     return mistral_service.get_status()
 
+async def start_relay(stream) -> Any:
+    """
+    Démarre le relais avant de construire la StreamingResponse.
+    
+    La place d'admission et la réponse amont ne sont libérées que par le
+    finally du générateur; un générateur jamais démarré (client parti avant
+    le premier octet) ne l'exécuterait jamais. Une fois le premier fragment
+    lu, la fermeture ou la collecte du générateur libère toujours la place.
+    """
+    try:
+        first_chunk = await stream.__anext__()
+    except StopAsyncIteration:
+        first_chunk = None
+    
+    async def chained():
+        try:
+            if first_chunk is not None:
+                yield first_chunk
+            async for chunk in stream:
+                yield chunk
+        finally:
+            await stream.aclose()
+    
+    return chained()
+
 @app.post("/v1/chat/completions")
-async def chat_completions(request: ChatCompletionRequest):
+async def chat_completions(request: ChatCompletionRequest, http_request: Request, http_response: Response):
     """Endpoint principal pour les completions de chat"""
     if not mistral_service:
         raise HTTPException(status_code=503, detail="Service non initialisé")
     
+    # Priorité (live par défaut, batch pour les analyses différées) et délai d'attente maximal
+    priority = (http_request.headers.get(PRIORITY_HEADER) or "live").lower()
+    deadline_header = http_request.headers.get(DEADLINE_HEADER)
+    deadline = parse_retry_after(deadline_header, MISTRAL_QUEUE_DEADLINE) if deadline_header else None
+    
     try:
-        response = await mistral_service.chat_completion(request)
+        if request.stream:
+            # Streaming SSE compatible OpenAI: fragments relayés dès leur arrivée
+            upstream, slot = await mistral_service.open_stream(request, priority, deadline)
+            relay = await start_relay(
+                mistral_service.relay_stream(upstream, request.model or mistral_service.model, slot)
+            )
+            return StreamingResponse(
+                relay,
+                media_type="text/event-stream",
+                headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+            )
+        
+        response, source = await mistral_service.cached_chat_completion(
+            request, http_request.headers.get(RESPONSE_CACHE_HINT_HEADER), priority, deadline
+        )
+        http_response.headers["X-Cache"] = source.upper()
         return response
     except HTTPException:
         raise